@@ -0,0 +1,234 @@
+"""
+Per-action record deltas, derived from the change journal (tracked_data.py).
+
+A journal entry says which container changed and what it held before.
+DeltaIndex maps every container of a session's data to where it lives
+(table, record id, top-level field), so an action's entries translate to:
+
+    {"table": "users", "id": "12", "op": "update", "fields": ["status"],
+     "values": {"status": "inactive"}}
+
+op is "insert", "update" or "delete"; values (new values of the listed
+fields; the whole record for an insert) are copied when the action ends.
+Tables are dicts keyed by record id, or lists of records (the record's
+"id"/"<x>_id" field, or else its position, identifies it).
+"""
+import copy
+from typing import Any, Dict, List, Optional, Tuple
+
+from tracked_data import Entry, _MISSING
+
+# (table, record id, top-level field); None where not applicable
+Location = Tuple[Optional[str], Any, Optional[str]]
+
+
+def record_id(record: Any, position: Any) -> Any:
+    """How a record of a list table is identified in deltas."""
+    if isinstance(record, dict):
+        if 'id' in record:
+            return record['id']
+        for key, value in record.items():
+            if key.endswith('_id') and isinstance(value, (str, int)):
+                return value
+    return position
+
+
+class DeltaIndex:
+    """
+    id(container) -> Location for a session's data. Built on first use and
+    extended with the containers each action stores. Entries for replaced
+    containers are kept: undo can bring them back.
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        self._locations: Optional[Dict[int, Location]] = None
+
+    def locate(self, container: Any) -> Optional[Location]:
+        if container is self.data:
+            return (None, None, None)
+        if self._locations is None:
+            self._locations = {}
+            for table, records in dict.items(self.data):
+                self.add_table(table, records)
+        return self._locations.get(id(container))
+
+    def table_loaded(self, table: str, records: Any):
+        """A lazily loaded table (tracked_data.LazyTrackedDict) came in."""
+        if self._locations is not None:
+            self.add_table(table, records)
+
+    def add_table(self, table: str, records: Any):
+        if not isinstance(records, (dict, list)):
+            return
+        self._locations[id(records)] = (table, None, None)
+        items = dict.items(records) if isinstance(records, dict) else enumerate(records)
+        for key, record in items:
+            rid = key if isinstance(records, dict) else record_id(record, key)
+            self.add_record(table, rid, record)
+
+    def add_record(self, table: str, rid: Any, record: Any):
+        if not isinstance(record, (dict, list)):
+            return
+        self._locations[id(record)] = (table, rid, None)
+        if isinstance(record, dict):
+            for field, value in dict.items(record):
+                self._add_nested(table, rid, field, value)
+
+    def _add_nested(self, table: str, rid: Any, field: str, value: Any):
+        stack = [value]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, dict):
+                self._locations[id(item)] = (table, rid, field)
+                stack.extend(dict.values(item))
+            elif isinstance(item, list):
+                self._locations[id(item)] = (table, rid, field)
+                stack.extend(item)
+
+    def add_value(self, location: Location, key: Any, value: Any):
+        """Index a value stored at container[key] by the action."""
+        if self._locations is None:
+            return
+        table, rid, field = location
+        if table is None:
+            self.add_table(key, value)
+        elif rid is None:
+            self.add_record(table, key, value)
+        else:
+            self._add_nested(table, rid, field if field is not None else key, value)
+
+
+class _Collector:
+    def __init__(self):
+        self.deltas: Dict[Tuple[str, Any], Dict[str, Any]] = {}
+        self.order: List[Tuple[str, Any]] = []
+
+    def note(self, table: str, rid: Any, op: str, field: Optional[str] = None):
+        key = (table, _hashable(rid))
+        delta = self.deltas.get(key)
+        if delta is None:
+            delta = {'table': table, 'id': rid, 'op': op, 'fields': []}
+            self.deltas[key] = delta
+            self.order.append(key)
+        elif op != 'update':
+            delta['op'] = op
+        if field is not None and field not in delta['fields']:
+            delta['fields'].append(field)
+
+
+def _hashable(value: Any) -> Any:
+    return value if isinstance(value, (str, int, float, bool, type(None))) else repr(value)
+
+
+def compute_delta(index: DeltaIndex, entries: List[Entry]) -> List[Dict[str, Any]]:
+    """The records an action's journal entries inserted, updated or deleted."""
+    collector = _Collector()
+    for container, key, previous in entries:
+        location = index.locate(container)
+        if location is None:
+            continue
+        table, rid, field = location
+        if key is None:
+            _list_entry(index, collector, location, container, previous)
+            continue
+        present = key in container
+        if present:
+            index.add_value(location, key, dict.__getitem__(container, key))
+        if table is None:
+            # A whole table added or removed
+            collector.note(key, None, 'insert' if previous is _MISSING else ('update' if present else 'delete'))
+        elif rid is None:
+            if previous is _MISSING:
+                collector.note(table, key, 'insert')
+            elif not present:
+                collector.note(table, key, 'delete')
+            else:
+                for changed in _changed_fields(previous, dict.__getitem__(container, key)):
+                    collector.note(table, key, 'update', changed)
+        else:
+            collector.note(table, rid, 'update', field if field is not None else key)
+
+    deltas = [collector.deltas[key] for key in collector.order]
+    for delta in deltas:
+        record = _current_record(index.data, delta)
+        if delta['op'] == 'insert':
+            if isinstance(record, dict):
+                delta['fields'] = list(record)
+            delta['values'] = copy.deepcopy(record)
+        elif delta['op'] == 'update' and isinstance(record, dict):
+            delta['values'] = {field: copy.deepcopy(record.get(field)) for field in delta['fields']}
+    return deltas
+
+
+def _list_entry(index: DeltaIndex, collector: _Collector, location: Location, container: list, previous: list):
+    table, rid, field = location
+    if table is None:
+        return
+    if rid is not None:
+        # A list inside a record changed
+        collector.note(table, rid, 'update', field)
+        index.add_value(location, None, container)
+        return
+    # A list table: match records by identity
+    before = {id(record) for record in previous}
+    after = {id(record) for record in container}
+    for position, record in enumerate(container):
+        if id(record) not in before:
+            rid = record_id(record, position)
+            collector.note(table, rid, 'insert')
+            index.add_record(table, rid, record)
+    for position, record in enumerate(previous):
+        if id(record) not in after:
+            collector.note(table, record_id(record, position), 'delete')
+
+
+def _changed_fields(old: Any, new: Any) -> List[str]:
+    if isinstance(old, dict) and isinstance(new, dict):
+        return [field for field in {**old, **new} if old.get(field, _MISSING) != new.get(field, _MISSING)]
+    return [] if old == new else [None]
+
+
+def _current_record(data: Dict[str, Any], delta: Dict[str, Any]) -> Any:
+    records = data.get(delta['table'])
+    if delta['id'] is None:
+        return records
+    if isinstance(records, dict):
+        return records.get(delta['id'])
+    if isinstance(records, list):
+        for position, record in enumerate(records):
+            if record_id(record, position) == delta['id']:
+                return record
+    return None
+
+
+def merge_deltas(step_deltas: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Net effect of consecutive steps' deltas: an insert later updated stays
+    an insert, an insert later deleted disappears, fields accumulate.
+    """
+    merged: Dict[Tuple[str, Any], Dict[str, Any]] = {}
+    for deltas in step_deltas:
+        for delta in deltas:
+            key = (delta['table'], _hashable(delta['id']))
+            current = merged.get(key)
+            if current is None:
+                merged[key] = {**delta, 'fields': list(delta['fields']),
+                               **({'values': dict(delta['values'])} if isinstance(delta.get('values'), dict) else {})}
+                continue
+            if delta['op'] == 'delete':
+                if current['op'] == 'insert':
+                    del merged[key]
+                else:
+                    merged[key] = {'table': delta['table'], 'id': delta['id'], 'op': 'delete', 'fields': []}
+                continue
+            if delta['op'] == 'insert' and current['op'] == 'delete':
+                current['op'] = 'update'
+            for field in delta['fields']:
+                if field not in current['fields']:
+                    current['fields'].append(field)
+            if isinstance(delta.get('values'), dict):
+                current.setdefault('values', {}).update(delta['values'])
+            elif 'values' in delta:
+                current['values'] = delta['values']
+    return list(merged.values())
@@ -2,14 +2,24 @@
 """ Flask Application """
 import json
 import os
-from flask import Flask, render_template, jsonify, request
+import gzip
+import zlib
+import contextlib
+import time
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, render_template, jsonify, request, Response, stream_with_context
 from flask_cors import CORS
 import ast
 from typing import Dict, Any
-import re
 from flask import Flask, session, g
-from flask_session import Session
 from dotenv import load_dotenv
+from action_deltas import compute_delta, merge_deltas
+from environment_store import EnvironmentStore
+from tool_registry import ToolRegistry
+from warm_up import WarmUp
+import metrics
+from metrics import CACHE_REQUESTS, REQUEST_SECONDS, TOOL_SECONDS
 load_dotenv()
 
 
@@ -18,137 +28,96 @@ app = Flask(__name__ , static_url_path='')
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "super-secret-key")
 cors = CORS(app)
 app.config["SESSION_PERMANENT"] = False
-app.config['SESSION_TYPE'] = 'filesystem'
-Session(app)
 
 ###################### GLOBAL ENVIRONMENTS ##################################
-# last_environment = None
-# last_interface = None
-# data = dict()
+# Live environment data stays in this process; the cookie session only
+# holds the handle ("env_handle") of the caller's environment.
+# Evicted sessions are rebuilt by replaying their actions (replay_action).
+environments = EnvironmentStore(replay_action=lambda live, api_name, parameters:
+                                replay_action(live, api_name, parameters))
+# Compiled Tools classes per (environment, interface, source hash).
+tool_registry = ToolRegistry()
+# Set TASK_FRAMEWORK_WARM_UP=1 to pre-load every environment and interface
+# in the background when the server starts (progress on /health).
+warm_up = WarmUp(environments, tool_registry)
 
-@app.before_request
-def load_session_data():
-    g.environment = session.get("environment")
-    # print(g.environment)
-    g.interface = session.get("interface")
-    g.data = session.get("data", {})
-    # print(g.data)
-
-######################## UTILITY FUNCTIONS ##################################
-def ast_to_python_value(node):
-    """Convert AST node to Python value."""
-    if isinstance(node, ast.Constant):  # Python 3.8+
-        return node.value
-    elif isinstance(node, ast.Str):  # Python < 3.8
-        return node.s
-    elif isinstance(node, ast.Num):  # Python < 3.8
-        return node.n
-    elif isinstance(node, ast.List):
-        return [ast_to_python_value(item) for item in node.elts]
-    elif isinstance(node, ast.Dict):
-        result = {}
-        for key, value in zip(node.keys, node.values):
-            result[ast_to_python_value(key)] = ast_to_python_value(value)
-        return result
-    elif isinstance(node, ast.Name):
-        # For variable names, we can't resolve them without execution
-        # Return the name as a string for now
-        return f"<variable: {node.id}>"
-    else:
-        # For other node types, return a string representation
-        return f"<{type(node).__name__}>"
+# Tool calls run on this bounded pool. Requests of different sessions run
+# concurrently; each session's lock keeps its own actions in order.
+TOOL_WORKERS = int(os.environ.get("TASK_FRAMEWORK_TOOL_WORKERS", "8"))
+tool_executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
 
+# Responses at least this large are gzip/deflate compressed when the
+# client accepts it.
+COMPRESS_MIN_BYTES = int(os.environ.get("TASK_FRAMEWORK_COMPRESS_MIN_BYTES", "2048"))
 
-def extract_method_from_ast(source_code: str, method_name: str) -> str:
-    tree = ast.parse(source_code)
-    for node in ast.walk(tree):
-        if isinstance(node, ast.FunctionDef) and node.name == method_name:
-            start = node.lineno - 1
-            end = node.end_lineno
-            return '\n'.join(source_code.splitlines()[start:end])
-    return None
+def bind_session(live):
+    g.live = live
+    g.environment = live.environment if live else None
+    g.interface = live.interface if live else None
+    g.data = live.data if live else {}
 
+@app.before_request
+def load_session_data():
+    g.request_start = time.perf_counter()
+    bind_session(environments.get(session.get("env_handle")))
 
-def extract_file_info(file_path: str) -> Dict[str, Any]:
+@contextlib.contextmanager
+def session_lock():
     """
-    Extract function information from a Python file containing a Tool class with get_info method.
+    Hold the caller's session lock (a no-op without a session).
+    The environment can be evicted or replaced between before_request and
+    taking its lock, so it is looked up again under the lock and, if it
+    changed, the lock of the current one is taken instead.
     """
-    try:
-        # Read the file content
-        with open(file_path, "r") as file:
-            content = file.read()
-        
-        imports = []
-        import_pattern = re.compile(r'^\s*import\s+(\w+)', re.MULTILINE)
-        from_import_pattern =  re.compile(r'^\s*from\s+([\w\.]+)\s+import\s+((?:\w+\s*,\s*)*\w+)', re.MULTILINE)
-        
-        for match in import_pattern.finditer(content):
-            imports.append(match.group(0).strip())
-        for match in from_import_pattern.finditer(content):
-            if match.group(1) == "tau_bench.envs.tool":
-                # Skip tau_bench.envs.tool import
-                continue
-            imports.append(match.group(0).strip())
-        
-        tree = ast.parse(content)
-        
-        tool_class = None
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef):
-                for base in node.bases:
-                    if isinstance(base, ast.Name) and base.id == 'Tool':
-                        tool_class = node
-                        # break
-            if isinstance(node, ast.FunctionDef) and node.name == "invoke":
-                start = node.lineno - 1
-                end = node.end_lineno
-                invoke_method = '\n'.join(content.splitlines()[start:end])
-                # if tool_class:
-                #     break
-        
-        if not tool_class:
-            return {"error": "No Tool class found"}
-        
-        if not invoke_method:
-            return {"error": "No invoke method found in Tool class"}
-        
-        # Find the get_info method
-        get_info_method = None
-        for node in tool_class.body:
-            if isinstance(node, ast.FunctionDef) and node.name == 'get_info':
-                get_info_method = node
-                break
-        
-        if not get_info_method:
-            return {"error": "No get_info method found"}
-        
-        return_dict = None
-        for node in ast.walk(get_info_method):
-            if isinstance(node, ast.Return):
-                return_dict = node.value
-                break
-        
-        if not return_dict:
-            return {"error": "No return dictionary found in get_info method"}
-        
-        parsed_dict = ast_to_python_value(return_dict)
-        function_info = {}
-        
-        if isinstance(parsed_dict, dict) and 'function' in parsed_dict:
-            func_info = parsed_dict['function']
-            if isinstance(func_info, dict):
-                function_info = {
-                    'name': func_info.get('name', ''),
-                    'description': func_info.get('description', ''),
-                    'parameters': func_info.get('parameters', {}).get('properties', {}),
-                    'required': func_info.get('parameters', {}).get('required', [])
-                }
-
-        return function_info, invoke_method, imports
-        
-    except Exception as e:
-        return {"error": f"Failed to process file: {str(e)}"}
-######################## END UTILITY FUNCTIONS ##############################
+    while g.live is not None:
+        live = g.live
+        with live.lock:
+            current = environments.get(live.handle)
+            if current is live:
+                yield
+                return
+        bind_session(current)
+    yield
+
+
+def serialized(view):
+    """Run a view holding the caller's session lock."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with session_lock():
+            return view(*args, **kwargs)
+    return wrapper
+
+@app.after_request
+def record_request_metrics(response):
+    if 'request_start' in g:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_SECONDS.observe(time.perf_counter() - g.request_start,
+                                route=route, method=request.method, status=response.status_code)
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Compress large JSON/text bodies (not streams or static files)."""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or not (response.mimetype or '').startswith(('application/json', 'text/'))):
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    accepted = request.headers.get('Accept-Encoding', '').lower()
+    if 'gzip' in accepted:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    elif 'deflate' in accepted:
+        response.set_data(zlib.compress(body, 6))
+        response.headers['Content-Encoding'] = 'deflate'
+    else:
+        return response
+    response.vary.add('Accept-Encoding')
+    return response
 
 
 @app.route('/', strict_slashes=False, methods=["POST", "GET"])
@@ -156,6 +125,7 @@ def index():
     return render_template('index.html')
 
 @app.route('/choose_env_interface', strict_slashes=False, methods=["POST", "GET"])
+@serialized
 def env_interface():
     """ Endpoint to handle environment and interface selection """
     if request.method == "POST":
@@ -168,64 +138,36 @@ def env_interface():
             # global last_environment, last_interface, data
             
             # print(environment, session.get("environment"))
-            if environment != session.get("environment"):
-                g.data.clear()
-                ENVS_PATH = "envs"
-                DATA_PATH = f"{ENVS_PATH}/{environment}/data"
-                data_files = os.listdir(DATA_PATH)
-                # print("Loaded data:")
-                for data_file in data_files:
-                    if data_file.endswith(".json"):
-                        data_file_path = os.path.join(DATA_PATH, data_file)
-                        with open(data_file_path, "r") as file:
-                            g.data[data_file.split('.')[0]] = json.load(file)
-                session["environment"] = environment
-                session["interface"] = interface
-                session["data"] = g.data
-                # print("data", g.data)
+            # Compiled before a new environment is published, so concurrent
+            # requests on the handle never see it without tools
+            tools = tool_registry.get(environment, interface) if environment and interface else None
+            if environment != g.environment:
+                g.live = environments.open(session.get("env_handle"), environment, interface, tools)
+                g.data = g.live.data
+                session["env_handle"] = g.live.handle
+            elif g.live:
+                g.live.interface = interface
             
             # print(session["environment"], session["interface"])
             if environment and interface:
                 # last_interface = interface
                 # last_environment = environment
-                ENVS_PATH = "envs"
-                TOOLS_PATH = f"{ENVS_PATH}/{environment}/tools"
-                INTERFACE_PATH = f"{TOOLS_PATH}/interface_{interface}"
-                API_files = os.listdir(INTERFACE_PATH)
-                invoke_methods = []
-                functionsInfo = []
-                importsSet = set()
-                for api_file in API_files:
-                    if api_file.endswith(".py") and not api_file.startswith("__"):
-                        file_path = os.path.join(INTERFACE_PATH, api_file)
-                        # print(f"Processing file: {file_path}")
-                        try:
-                            function_info, invoke_method, imports = extract_file_info(file_path)
-                            # print(f"Extracted function info: {function_info}")
-                            # if not function_info:
-                            #     print(f"No function info found in {api_file}, skipping.")
-                            #     continue
-                            importsSet.update(imports)
-                            invoke_method = invoke_method.replace("invoke", function_info.get('name', 'invoke')+"_invoke")
-                            invoke_methods.append(invoke_method)
-                            functionsInfo.append(function_info)
-
-                        except SyntaxError as e:
-                            print(f"Syntax error in {api_file}: {e}")
-                        except Exception as e:
-                            print(f"Error processing {api_file}: {e}")
+                g.live.tools = tools
                 
-                with open("tools.py", "w") as new_file:
-                    new_file.write('\n'.join(sorted(importsSet)) + "\n\n")
-                    new_file.write("class Tools:\n")
-                    for invoke_method in invoke_methods:
-                        new_file.write("    @staticmethod\n" + invoke_method + "\n\n")
+                # functions_info only changes with the tool sources
+                etag = f'"{g.live.tools.source_hash}"'
+                if etag in request.headers.get('If-None-Match', ''):
+                    CACHE_REQUESTS.inc(cache='functions_info_etag', result='hit')
+                    return Response(status=304, headers={'ETag': etag})
+                CACHE_REQUESTS.inc(cache='functions_info_etag', result='miss')
                 
-                return jsonify({
+                response = jsonify({
                     'status': 'success',
                     'message': 'Environment and interface selected successfully',
-                    'functions_info': functionsInfo,
-                }), 200
+                    'functions_info': g.live.tools.functions_info,
+                })
+                response.headers['ETag'] = etag
+                return response, 200
             else:
                 return jsonify({
                     'status': 'error',
@@ -247,82 +189,540 @@ def env_interface():
         })
 
 
-@app.route('/execute_api', strict_slashes=False, methods=["GET", "POST"])
-def execute_api():
-    # global data, last_environment, last_interface  # Add global declaration
-    passed_data = request.get_json()
-    api_name = passed_data.get('api_name')
-    api_name = api_name + "_invoke" if api_name else None
-    if not api_name:
-        return jsonify({
-            'status': 'error',
-            'message': 'API name is required'
-        }), 400
+def guess_argument(argument: str, argument_value: Any) -> Any:
+    """
+    Coerce a UI text input from its name and content alone. Used for
+    arguments the tool's schema gives no usable type for.
+    """
+    # Skip IDs (do not modify or parse)
+    if "id" == argument.lower() or "_id" in argument.lower() or "by" in argument.lower() or "name" in argument.lower() or "_to" in argument.lower():
+        return argument_value
+
+    if isinstance(argument_value, str) and (argument_value.startswith('{') or argument_value.startswith('[')):
+        try:
+            return json.loads(argument_value)
+        except (json.JSONDecodeError, ValueError):
+            pass  # Fall through to literal_eval
     
-    arguments = passed_data.get('parameters', {})
-    cleaned_arguments = {}
+    # Try to evaluate literal (e.g., convert "True" → True, "123" → 123)
+    try:
+        return ast.literal_eval(argument_value)
+    except (ValueError, SyntaxError):
+        return argument_value
 
 
+def clean_arguments(arguments: Dict[str, Any], plan: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    Coerce the UI's text inputs to Python values. Shared by every
+    execution endpoint so single and batch runs behave the same.
+    plan is the tool's compiled coercion plan ({argument: converter});
+    arguments it does not cover, or cannot convert, are guessed.
+    """
+    cleaned_arguments = {}
+    plan = plan or {}
 
     for argument, argument_value in arguments.items():
         # Skip empty values
         if argument_value == '':
             continue
 
-        # Skip IDs (do not modify or parse)
-        if "id" == argument.lower() or "_id" in argument.lower() or "by" in argument.lower() or "name" in argument.lower() or "_to" in argument.lower():
-            cleaned_arguments[argument] = argument_value
-            continue
-
-        if isinstance(argument_value, str) and (argument_value.startswith('{') or argument_value.startswith('[')):
+        converter = plan.get(argument)
+        if converter is not None:
             try:
-                cleaned_arguments[argument] = json.loads(argument_value)
+                cleaned_arguments[argument] = converter(argument_value)
                 continue
-            except (json.JSONDecodeError, ValueError):
-                pass  # Fall through to literal_eval
-        
-        # Try to evaluate literal (e.g., convert "True" → True, "123" → 123)
-        try:
-            cleaned_arguments[argument] = ast.literal_eval(argument_value)
-        except (ValueError, SyntaxError):
-            cleaned_arguments[argument] = argument_value
+            except (ValueError, TypeError):
+                pass
+        cleaned_arguments[argument] = guess_argument(argument, argument_value)
 
-    # Replace original dict
-    arguments = cleaned_arguments
-            
-    
-    # print("Received data for API execution:", passed_data)
+    return cleaned_arguments
+
+
+def paginate_output(output: Any, page: int, page_size: int):
+    """
+    One page of a list output: the list itself, or the only list value of
+    a dict output. Returns (output page, pagination info or None).
+    """
+    if isinstance(output, list):
+        items, key = output, None
+    elif isinstance(output, dict):
+        lists = [k for k, v in output.items() if isinstance(v, list)]
+        if len(lists) != 1:
+            return output, None
+        key = lists[0]
+        items = output[key]
+    else:
+        return output, None
     
-    import importlib
-    import tools  
-    importlib.reload(tools) 
+    page_size = max(1, int(page_size))
+    total_pages = max(1, -(-len(items) // page_size))
+    page = min(max(1, int(page)), total_pages)
+    page_items = items[(page - 1) * page_size:page * page_size]
+    pagination = {
+        'page': page,
+        'page_size': page_size,
+        'total_items': len(items),
+        'total_pages': total_pages,
+    }
+    if key is None:
+        return page_items, pagination
+    return {**output, key: page_items}, pagination
+
+
+def paginated_body(body: Dict[str, Any], page: Any, page_size: Any) -> Dict[str, Any]:
+    """Apply optional page/page_size to a successful action body."""
+    if not page_size or 'output' not in body:
+        return body
+    output, pagination = paginate_output(body['output'], page or 1, page_size)
+    if pagination is None:
+        return body
+    return {**body, 'output': output, 'pagination': pagination}
 
-    tools_instance = tools.Tools()
+
+def run_action(api_name: str, arguments: Dict[str, Any]):
+    """
+    Execute one tool against the session's environment.
+    Returns (response body, status code), as /execute_api answers it.
+    """
+    api_name = api_name + "_invoke" if api_name else None
+    if not api_name:
+        return {
+            'status': 'error',
+            'message': 'API name is required'
+        }, 400
+    
+    if not g.live or not g.live.tools:
+        return {
+            'status': 'error',
+            'message': 'No environment and interface selected'
+        }, 400
     
-    if hasattr(tools_instance, api_name):
+    arguments = clean_arguments(arguments or {}, g.live.tools.coercion_plan(api_name))
+    
+    if g.live.tools.has_api(api_name):
+        tool_labels = {'environment': g.environment, 'interface': g.interface,
+                       'tool': api_name[:-len("_invoke")]}
+        start = time.perf_counter()
         try:
-            # print(g.data)
-            # Dynamically call the method with the provided arguments
-            result = getattr(tools_instance, api_name)(data=g.data, **arguments)
-            # print(f"Result from API {api_name}: {result}")
-            return jsonify({
+            # Dynamically call the method with the provided arguments,
+            # on the tool pool
+            result = tool_executor.submit(g.live.tools.call, api_name, g.data, arguments).result()
+            TOOL_SECONDS.observe(time.perf_counter() - start, outcome='ok', **tool_labels)
+            return {
                 'output': json.loads(result) if isinstance(result, str) else result
-            }), 200
+            }, 200
         except Exception as e:
+            TOOL_SECONDS.observe(time.perf_counter() - start, outcome='error', **tool_labels)
             print(f"Error executing API {api_name}: {str(e)}")
-            return jsonify({
+            return {
                 'status': 'error',
                 'message': f'Failed to execute API: {str(e)}'
-            }), 500
+            }, 500
     else:
-        return jsonify({
+        return {
             'status': 'error',
             'message': f'API {api_name} not found'
+        }, 404
+
+
+def canonical_arguments(tools, api_name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """The arguments as the tool receives them (what export writes)."""
+    if not tools or not api_name:
+        return parameters or {}
+    return clean_arguments(parameters or {}, tools.coercion_plan(api_name))
+
+
+def replay_action(live, api_name: str, parameters: Dict[str, Any]):
+    """Re-run a logged action on a rebuilt session (see EnvironmentStore)."""
+    arguments = canonical_arguments(live.tools, api_name, parameters)
+    api_name = api_name + "_invoke" if api_name else None
+    output = ''
+    if api_name and live.tools.has_api(api_name):
+        result = live.tools.call(api_name, live.data, arguments)
+        output = json.loads(result) if isinstance(result, str) else result
+    return {'arguments': arguments, 'output': output}
+
+
+def move_history(move):
+    """Undo/redo/rewind through move(), then drop the indexes of the tables it touched."""
+    history = g.live.history
+    before = history.position
+    move()
+    low, high = sorted((before, history.position))
+    g.live.indexes.invalidate(item['table'] for step in history.steps[low:high] for item in step['delta'])
+
+
+def run_step(api_name: str, parameters: Dict[str, Any], step: int = None):
+    """
+    Run an action as a step of the session's history: with `step`, the
+    environment is first rewound to the state after `step` actions and
+    the action replaces that step (later steps are dropped); otherwise it
+    is appended. Failed actions are recorded too, so step k is always the
+    k-th action of the list. The step keeps the canonical arguments and
+    the output for export. The body gets the action's record "delta".
+    Returns (response body, status code, step index, later steps dropped).
+    """
+    if not g.live:
+        body, status_code = run_action(api_name, parameters)
+        return body, status_code, None, 0
+    
+    history = g.live.history
+    dropped = 0
+    if step is not None:
+        move_history(lambda: history.rewind(int(step)))
+        dropped = max(0, len(history.steps) - history.position - 1)
+    
+    g.live.journal.begin()
+    try:
+        body, status_code = run_action(api_name, parameters)
+    finally:
+        changes = g.live.journal.end()
+    delta = compute_delta(g.live.deltas, changes)
+    g.live.indexes.invalidate(item['table'] for item in delta)
+    index = history.record(api_name, parameters, changes, delta,
+                           canonical_arguments(g.live.tools, api_name, parameters),
+                           body.get('output', '') if status_code == 200 else '', g.live.tools)
+    return {**body, 'delta': delta}, status_code, index, dropped
+
+
+@app.route('/execute_api', strict_slashes=False, methods=["GET", "POST"])
+@serialized
+def execute_api():
+    """
+    Optional "step": run the action as that step, rewinding first.
+    Optional "page_size" (and "page", from 1): return one page of a list
+    output plus "pagination"; other pages come from /action_output.
+    """
+    passed_data = request.get_json()
+    body, status_code, index, dropped = run_step(passed_data.get('api_name'),
+                                                 passed_data.get('parameters', {}),
+                                                 passed_data.get('step'))
+    response = jsonify(paginated_body(body, passed_data.get('page'), passed_data.get('page_size')))
+    if index is not None:
+        response.headers['X-Action-Step'] = str(index)
+        response.headers['X-Dropped-Steps'] = str(dropped)
+    return response, status_code
+
+
+@app.route('/execute_actions', strict_slashes=False, methods=["POST"])
+@serialized
+def execute_actions():
+    """
+    Run an ordered list of actions in one request.
+    Body: {"actions": [{"api_name": ..., "parameters": {...}}, ...],
+           "start_step": optional step to rewind to first (0 = fresh data)}
+    Every action runs, in order, even after a failed one (like running
+    them one by one).
+    Returns {"results": [{"status_code", "response", "step"}]}.
+    """
+    passed_data = request.get_json() or {}
+    actions = passed_data.get('actions')
+    if not isinstance(actions, list):
+        return jsonify({
+            'status': 'error',
+            'message': 'A list of actions is required'
+        }), 400
+    
+    start_step = passed_data.get('start_step')
+    results = []
+    for offset, action in enumerate(actions):
+        body, status_code, index, _ = run_step(action.get('api_name'), action.get('parameters', {}),
+                                               start_step if offset == 0 else None)
+        results.append({'status_code': status_code, 'response': body, 'step': index})
+    return jsonify({'results': results}), 200
+
+
+@app.route('/execute_actions_stream', strict_slashes=False, methods=["POST"])
+def execute_actions_stream():
+    """
+    Same body as /execute_actions, but every result is sent as a
+    server-sent event as soon as the action finishes:
+        event: action  data: {"index", "status_code", "response", "step"}
+        event: done    data: {"count"}
+    """
+    passed_data = request.get_json() or {}
+    actions = passed_data.get('actions')
+    if not isinstance(actions, list):
+        return jsonify({
+            'status': 'error',
+            'message': 'A list of actions is required'
+        }), 400
+    
+    start_step = passed_data.get('start_step')
+    
+    def generate():
+        # The whole batch runs in order, without other requests of the session in between
+        with session_lock():
+            for index, action in enumerate(actions):
+                body, status_code, step, _ = run_step(action.get('api_name'), action.get('parameters', {}),
+                                                      start_step if index == 0 else None)
+                event = {'index': index, 'status_code': status_code, 'response': body, 'step': step}
+                yield f"event: action\ndata: {json.dumps(event)}\n\n"
+        yield f"event: done\ndata: {json.dumps({'count': len(actions)})}\n\n"
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/import_task', strict_slashes=False, methods=["POST"])
+@serialized
+def import_task():
+    """
+    Load a task in one request. Body: the task JSON (env, interface_num,
+    actions, edges; top level or under "task"), plus optional
+    "environment"/"interface" (the UI's selection, taking precedence) and
+    "start_step" (actions already in the UI to keep, when the environment
+    is unchanged). Sets up the environment, replays every action in order
+    and returns their results with the interface's functions_info and the
+    effective start_step (0 when a fresh environment was opened).
+    """
+    task_json = request.get_json() or {}
+    task = task_json.get('task') if isinstance(task_json.get('task'), dict) else task_json
+    actions = task_json.get('actions') if isinstance(task_json.get('actions'), list) else task.get('actions')
+    edges = task_json.get('edges') or task.get('edges') or []
+    environment = task_json.get('environment') or task_json.get('env')
+    task_interface = task_json.get('interface_num')
+    interface = task_json.get('interface') or task_interface
+
+    if not isinstance(actions, list):
+        return jsonify({
+            'status': 'error',
+            'message': 'The task has no list of actions'
+        }), 400
+    if not environment or not interface:
+        return jsonify({
+            'status': 'error',
+            'message': 'Missing environment or interface data'
+        }), 400
+    if task_interface and str(task_interface) != str(interface):
+        return jsonify({
+            'status': 'error',
+            'message': f'The imported actions are for the interface: {task_interface} whereas the environment is using interface: {interface}. Please select the correct interface first.'
+        }), 400
+    if os.sep in str(environment) or '..' in str(environment) or not os.path.isdir(environments.data_path(environment)):
+        return jsonify({
+            'status': 'error',
+            'message': f'Environment {environment} not found'
+        }), 404
+    if os.sep in str(interface) or '..' in str(interface) or not os.path.isdir(tool_registry.interface_path(environment, interface)):
+        return jsonify({
+            'status': 'error',
+            'message': f'Interface {interface} not found for environment {environment}'
+        }), 404
+
+    start_step = int(task_json.get('start_step') or 0)
+    tools = tool_registry.get(environment, interface)
+    live = g.live
+    if not (live and start_step and live.environment == environment and str(live.interface) == str(interface)):
+        live = environments.open(session.get("env_handle"), environment, interface, tools)
+        session["env_handle"] = live.handle
+        start_step = 0
+    live.interface = interface
+    live.tools = tools
+    g.live, g.environment, g.interface, g.data = live, environment, interface, live.data
+
+    results = []
+    # A newly opened environment has its own lock; the caller's is already held
+    with live.lock:
+        for index, action in enumerate(actions):
+            body, status_code, step, _ = run_step(action.get('name'), action.get('arguments', {}),
+                                                  start_step if index == 0 else None)
+            results.append({'name': action.get('name'), 'status_code': status_code, 'response': body, 'step': step})
+    error_count = sum(1 for result in results if result['status_code'] != 200)
+    return jsonify({
+        'status': 'success',
+        'environment': environment,
+        'interface': interface,
+        'functions_info': live.tools.functions_info,
+        'edges': edges,
+        'start_step': start_step,
+        'results': results,
+        'success_count': len(results) - error_count,
+        'error_count': error_count,
+    }), 200
+
+
+@app.route('/export_task', strict_slashes=False, methods=["GET"])
+@serialized
+def export_task():
+    """
+    The applied actions of the session, in submission format:
+    {"actions": [{"name", "arguments", "output"}]}, output '' for a
+    failed action.
+    """
+    if not g.live:
+        return jsonify({
+            'status': 'error',
+            'message': 'No environment and interface selected'
+        }), 400
+    history = g.live.history
+    actions = [{
+        'name': step['api_name'],
+        'arguments': step['arguments'],
+        'output': step['output'],
+    } for step in history.steps[:history.position]]
+    return jsonify({'actions': actions}), 200
+
+
+@app.route('/action_output', strict_slashes=False, methods=["POST"])
+@serialized
+def action_output():
+    """
+    Body: {"step", "page", "page_size"}. A page of the stored output of
+    a step.
+    """
+    passed_data = request.get_json() or {}
+    steps = g.live.history.steps if g.live else []
+    step = passed_data.get('step')
+    if not isinstance(step, int) or not 0 <= step < len(steps):
+        return jsonify({
+            'status': 'error',
+            'message': 'No stored output for this step'
+        }), 404
+    body = paginated_body({'output': steps[step]['output']},
+                          passed_data.get('page'), passed_data.get('page_size') or 100)
+    return jsonify(body), 200
+
+
+@app.route('/browse_table', strict_slashes=False, methods=["POST"])
+@serialized
+def browse_table():
+    """
+    Read-only view of the session's data. Body:
+        {"table", "page": 1, "page_size": 50, "fields": [...],
+         "filters": {field: value | {"gte"|"gt"|"lte"|"lt"|"ne"|"in"|"contains": value}},
+         "sort": "field" | "-field"}
+    Without "table", lists the tables and their record counts.
+    """
+    if not g.live:
+        return jsonify({
+            'status': 'error',
+            'message': 'No environment and interface selected'
+        }), 400
+    passed_data = request.get_json() or {}
+    table = passed_data.get('table')
+    if not table:
+        return jsonify({'status': 'success', 'tables': g.live.indexes.tables()}), 200
+    if table not in g.live.data:
+        return jsonify({
+            'status': 'error',
+            'message': f'Table {table} not found'
         }), 404
+    try:
+        page = g.live.indexes.browse(table, passed_data.get('filters'), passed_data.get('sort'),
+                                     passed_data.get('fields'), passed_data.get('page', 1),
+                                     passed_data.get('page_size', 50))
+    except (TypeError, ValueError) as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Invalid browse request: {str(e)}'
+        }), 400
+    return jsonify({'status': 'success', **page}), 200
+
+
+@app.route('/deltas', strict_slashes=False, methods=["GET"])
+@serialized
+def cumulative_deltas():
+    """
+    Net record changes of the applied steps: all of them, or those from
+    step ?since=k on. ?per_step=1 lists each step's delta instead.
+    """
+    if not g.live:
+        return jsonify({
+            'status': 'error',
+            'message': 'No environment and interface selected'
+        }), 400
+    history = g.live.history
+    since = max(0, request.args.get('since', 0, type=int))
+    steps = history.steps[since:history.position]
+    if request.args.get('per_step'):
+        deltas = [{'step': since + offset, 'api_name': step['api_name'], 'delta': step['delta']}
+                  for offset, step in enumerate(steps)]
+    else:
+        deltas = merge_deltas([step['delta'] for step in steps])
+    return jsonify({'status': 'success', **history.state(), 'since': since, 'deltas': deltas}), 200
+
+
+def history_response():
+    if not g.live:
+        return jsonify({
+            'status': 'error',
+            'message': 'No environment and interface selected'
+        }), 400
+    return jsonify({'status': 'success', **g.live.history.state()}), 200
+
+
+@app.route('/undo', strict_slashes=False, methods=["POST"])
+@serialized
+def undo_action():
+    """Revert the last applied action."""
+    if g.live:
+        move_history(g.live.history.undo)
+    return history_response()
+
+
+@app.route('/redo', strict_slashes=False, methods=["POST"])
+@serialized
+def redo_action():
+    """Re-apply the last undone action."""
+    if g.live:
+        move_history(g.live.history.redo)
+    return history_response()
+
+
+@app.route('/rewind', strict_slashes=False, methods=["POST"])
+@serialized
+def rewind_actions():
+    """Body: {"step": k}. Move to the state after the first k actions."""
+    passed_data = request.get_json() or {}
+    if g.live:
+        move_history(lambda: g.live.history.rewind(int(passed_data.get('step', 0))))
+    return history_response()
+
+
+@app.route('/admin/sessions', strict_slashes=False, methods=["GET"])
+def admin_sessions():
+    """Memory budget, estimated use and the state of every session."""
+    return jsonify({'status': 'success', **environments.usage()}), 200
+
+
+metrics.Gauge('task_framework_sessions', 'Sessions by state (live/evicted).',
+              lambda: [({'state': state}, count) for state, count in environments.counts().items()])
+metrics.Gauge('task_framework_session_data_bytes', 'Estimated size of the tables each live session has loaded.',
+              lambda: [({'session': live.handle[:8], 'environment': live.environment}, live.size)
+                       for live in environments.sessions().values()])
+metrics.Gauge('task_framework_session_data_used_bytes', 'Estimated size of all live session data.',
+              lambda: [({}, sum(live.size for live in environments.sessions().values()))])
+metrics.Gauge('task_framework_memory_budget_bytes', 'Session data memory budget.',
+              lambda: [({}, environments.memory_budget)])
+metrics.Gauge('task_framework_session_evictions_total', 'Sessions evicted since start.',
+              lambda: [({}, environments.evictions)], kind='counter')
+metrics.Gauge('task_framework_session_rebuilds_total', 'Evicted sessions rebuilt since start.',
+              lambda: [({}, environments.rebuilds)], kind='counter')
+metrics.Gauge('task_framework_compiled_interfaces', 'Tool interfaces compiled in memory.',
+              lambda: [({}, tool_registry.count())])
+
+
+@app.route('/metrics', strict_slashes=False, methods=["GET"])
+def metrics_endpoint():
+    """Prometheus text exposition format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/health', strict_slashes=False, methods=["GET"])
+def health():
+    """200 once ready (warm-up finished or disabled), 503 while warming up."""
+    ready = warm_up.ready
+    return jsonify({
+        'status': 'ready' if ready else 'warming_up',
+        'warm_up': warm_up.state(),
+    }), 200 if ready else 503
 
 
 if __name__ == "__main__":
     """ Main Function """
     host = '0.0.0.0'
     port = 5000
-    app.run(host=host, port=port)
+    if os.environ.get("TASK_FRAMEWORK_WARM_UP", "").lower() in ("1", "true", "yes"):
+        warm_up.start(int(os.environ.get("TASK_FRAMEWORK_WARM_UP_WORKERS", "4")))
+    app.run(host=host, port=port, threaded=True)
@@ -0,0 +1,116 @@
+"""
+Schema-driven coercion of tool arguments for app.py.
+
+The UI sends every argument as text. A tool's get_info parameter schema
+says what each one should be, so it is compiled once (with the tool, in
+tool_registry) into a plan: {parameter: converter}. Converters raise
+ValueError for a value they cannot convert; the caller then falls back
+to guessing from the value itself, as before plans existed.
+"""
+import ast
+import json
+from typing import Any, Callable, Dict, Optional
+
+Converter = Callable[[Any], Any]
+
+_TRUE = ('true', '1', 'yes')
+_FALSE = ('false', '0', 'no')
+
+
+def to_string(value: Any) -> Any:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise ValueError(f"not a string: {value!r}")
+
+
+def to_integer(value: Any) -> int:
+    if isinstance(value, bool):
+        raise ValueError(f"not an integer: {value!r}")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        return int(value.strip())
+    raise ValueError(f"not an integer: {value!r}")
+
+
+def to_number(value: Any) -> Any:
+    if isinstance(value, bool):
+        raise ValueError(f"not a number: {value!r}")
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        text = value.strip()
+        try:
+            return int(text)
+        except ValueError:
+            return float(text)
+    raise ValueError(f"not a number: {value!r}")
+
+
+def to_boolean(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in _TRUE:
+            return True
+        if text in _FALSE:
+            return False
+    raise ValueError(f"not a boolean: {value!r}")
+
+
+def _container(expected: type) -> Converter:
+    def convert(value: Any) -> Any:
+        if isinstance(value, expected):
+            return value
+        if isinstance(value, str):
+            try:
+                parsed = json.loads(value)
+            except ValueError:
+                # Python literals ("{'a': 1}") as the old coercion accepted
+                try:
+                    parsed = ast.literal_eval(value)
+                except (ValueError, SyntaxError):
+                    raise ValueError(f"not JSON: {value!r}")
+            if isinstance(parsed, expected):
+                return parsed
+        raise ValueError(f"not a {expected.__name__}: {value!r}")
+    return convert
+
+
+CONVERTERS: Dict[str, Converter] = {
+    'string': to_string,
+    'integer': to_integer,
+    'int': to_integer,
+    'number': to_number,
+    'float': to_number,
+    'boolean': to_boolean,
+    'bool': to_boolean,
+    'object': _container(dict),
+    'array': _container(list),
+}
+
+
+def converter_for(schema: Any) -> Optional[Converter]:
+    """The converter for one parameter schema, or None to keep guessing."""
+    if not isinstance(schema, dict):
+        return None
+    declared = schema.get('type')
+    if isinstance(declared, list):
+        # ["string", "null"]: the first real type
+        declared = next((t for t in declared if t != 'null'), None)
+    return CONVERTERS.get(declared) if isinstance(declared, str) else None
+
+
+def compile_plan(parameters: Dict[str, Any]) -> Dict[str, Converter]:
+    """{parameter: converter} for the parameters with a known type."""
+    plan = {}
+    for name, schema in (parameters or {}).items():
+        converter = converter_for(schema)
+        if converter is not None:
+            plan[name] = converter
+    return plan
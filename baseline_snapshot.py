@@ -0,0 +1,105 @@
+"""
+Read-only, memory-mapped snapshots of environment baselines.
+
+All data files of an environment are packed into one snapshot file,
+named after the environment and the files' (name, mtime, size)
+signature, under TASK_FRAMEWORK_SNAPSHOT_DIR. Every server process maps
+the same file read-only, so the baseline bytes live once in the page
+cache however many worker processes there are; a process only holds the
+tables its sessions have actually loaded.
+
+Layout: MAGIC, 8-byte big-endian header length, JSON header
+{"tables": {table: [offset, length]}}, then the raw table files.
+Snapshots are written atomically, so processes racing to build the same
+one all end up mapping a complete file.
+"""
+import os
+import json
+import mmap
+import hashlib
+import tempfile
+from typing import Dict, List, Tuple
+
+from task_file_io import atomic_write_bytes
+
+SNAPSHOT_DIR = os.environ.get("TASK_FRAMEWORK_SNAPSHOT_DIR",
+                              os.path.join(tempfile.gettempdir(), "task_framework_snapshots"))
+MAGIC = b"TFSNAP1\n"
+
+
+def snapshot_path(data_path: str, environment: str, signature: Tuple, snapshot_dir: str = SNAPSHOT_DIR) -> str:
+    key = repr((os.path.abspath(data_path), signature)).encode('utf-8')
+    return os.path.join(snapshot_dir, f"{environment}-{hashlib.sha256(key).hexdigest()[:16]}.snapshot")
+
+
+def build_snapshot(data_path: str, tables: List[Tuple[str, str]], path: str) -> int:
+    """Pack [(table, file name)] from data_path into path. Returns its size."""
+    contents = []
+    for table, data_file in tables:
+        with open(os.path.join(data_path, data_file), "rb") as file:
+            contents.append((table, file.read()))
+
+    # Offsets depend on the header length, which depends on the offsets:
+    # lay out with a fixed-width placeholder first.
+    index = {table: [0, len(content)] for table, content in contents}
+    header = json.dumps({'tables': index}).encode('utf-8')
+    header = header + b" " * 32 * len(index)
+    offset = len(MAGIC) + 8 + len(header)
+    for table, content in contents:
+        index[table][0] = offset
+        offset += len(content)
+    final_header = json.dumps({'tables': index}).encode('utf-8').ljust(len(header))
+
+    return atomic_write_bytes(path, b"".join(
+        [MAGIC, len(final_header).to_bytes(8, 'big'), final_header] + [content for _, content in contents]
+    ))
+
+
+class BaselineSnapshot:
+    """A mapped snapshot of one environment's data files."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a baseline snapshot")
+        start = len(MAGIC) + 8
+        header_length = int.from_bytes(self._map[len(MAGIC):start], 'big')
+        header = json.loads(self._map[start:start + header_length])
+        self.index: Dict[str, Tuple[int, int]] = {table: tuple(span) for table, span in header['tables'].items()}
+
+    def tables(self) -> List[str]:
+        return list(self.index)
+
+    def load(self, table: str) -> bytes:
+        """The table's bytes, copied out of the mapping for json.loads."""
+        offset, length = self.index[table]
+        return self._map[offset:offset + length]
+
+    def size(self) -> int:
+        return len(self._map)
+
+
+def open_snapshot(data_path: str, environment: str, signature: Tuple,
+                  snapshot_dir: str = SNAPSHOT_DIR) -> BaselineSnapshot:
+    """Map the snapshot for this signature, building it first if needed."""
+    path = snapshot_path(data_path, environment, signature, snapshot_dir)
+    if not os.path.exists(path):
+        tables = [(data_file.split('.')[0], data_file) for data_file, _, _ in signature]
+        build_snapshot(data_path, tables, path)
+        _remove_stale(path, environment, snapshot_dir)
+    return BaselineSnapshot(path)
+
+
+def _remove_stale(current: str, environment: str, snapshot_dir: str):
+    """Older snapshots of the environment (unlinking is safe while mapped)."""
+    for name in os.listdir(snapshot_dir):
+        path = os.path.join(snapshot_dir, name)
+        digest = name[len(environment) + 1:-len(".snapshot")]
+        if (name.startswith(f"{environment}-") and name.endswith(".snapshot") and len(digest) == 16
+                and path != current):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
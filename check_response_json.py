@@ -5,6 +5,7 @@ import sys
 import io
 import re
 from contextlib import redirect_stdout, redirect_stderr
+from embedded_json import NOT_JSON, decode_cached
 # Ensure running_tasks is accessible
 from running_tasks import *
 
@@ -14,14 +15,17 @@ def find_all_result_files(base_path="batch_Batch_version_control_system_20260108
     files = glob.glob(pattern, recursive=True)
     return files
 
+def _parsed_or_same(text):
+    """A JSON-encoded string's value (parsed once per distinct string), else the string."""
+    value = decode_cached(text, containers_only=False)
+    return text if value is NOT_JSON else value
+
 def strict_equal(obj1, obj2):
     """Check equality allowing for JSON string parsing."""
     if isinstance(obj1, str) and not isinstance(obj2, str):
-        try: obj1 = json.loads(obj1)
-        except: pass
+        obj1 = _parsed_or_same(obj1)
     if isinstance(obj2, str) and not isinstance(obj1, str):
-        try: obj2 = json.loads(obj2)
-        except: pass
+        obj2 = _parsed_or_same(obj2)
 
     if type(obj1) != type(obj2): return False
     
@@ -158,8 +162,7 @@ def run_trial_replay(trial_data, env_name, interface_num):
         expected_raw = step.get("content")
         expected = expected_raw
         if isinstance(expected_raw, str):
-            try: expected = json.loads(expected_raw)
-            except: pass
+            expected = _parsed_or_same(expected_raw)
 
         # Execution
         actual = None
@@ -0,0 +1,97 @@
+"""
+JSON documents stored as strings inside other JSON (tool outputs in
+result.json trajectory `content`, recorded outputs, ...).
+
+- decode() parses such a string once, cheaply rejecting plain text.
+- decode_cached() memoizes that for read-only use (comparisons), so a
+  string probed several times is parsed once.
+- detect_style() / encode_like() re-encode a modified tree with the
+  separators, indent and escaping the original string used; key order is
+  kept by the dicts themselves. Unmodified strings are never re-encoded.
+"""
+import re
+import json
+from functools import lru_cache
+from typing import Any, Callable, Dict
+
+# Returned by decode() / decode_cached() for strings that are not JSON containers.
+NOT_JSON = object()
+
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[,:]|\n[ \t]*')
+
+
+def decode(text: Any, containers_only: bool = True) -> Any:
+    """
+    Parse a JSON object/array held in a string, or return NOT_JSON.
+    With containers_only=False scalars ("12", "true", ...) are decoded too.
+    """
+    if not isinstance(text, str):
+        return NOT_JSON
+    stripped = text.lstrip()
+    if containers_only and (not stripped or stripped[0] not in '{['):
+        return NOT_JSON
+    try:
+        return json.loads(text)
+    except ValueError:
+        return NOT_JSON
+
+
+@lru_cache(maxsize=4096)
+def decode_cached(text: str, containers_only: bool = True) -> Any:
+    """decode() memoized per string. The returned tree is shared: do not mutate it."""
+    return decode(text, containers_only)
+
+
+def detect_style(text: str) -> Dict[str, Any]:
+    """
+    json.dumps keyword arguments that reproduce the formatting of text.
+    Only the first separators outside string literals are looked at.
+    """
+    indent = None
+    item_separator = None
+    key_separator = None
+    for match in _TOKEN.finditer(text):
+        token = match.group()
+        if token[0] == '"':
+            continue
+        end = match.end()
+        following = text[end:end + 1]
+        if token == ',':
+            if item_separator is None:
+                item_separator = ', ' if following == ' ' else ','
+        elif token == ':':
+            if key_separator is None:
+                key_separator = ': ' if following == ' ' else ':'
+        elif indent is None and len(token) > 1:
+            indent = token[1:]
+        if item_separator is not None and key_separator is not None and indent is not None:
+            break
+
+    if indent is not None:
+        # json.dumps puts the newline after ',' itself
+        item_separator = ','
+    elif '\n' in text:
+        indent = 0
+        item_separator = ','
+    return {
+        'indent': indent,
+        'separators': (item_separator or ', ', key_separator or ': '),
+        'ensure_ascii': text.isascii(),
+    }
+
+
+def encode_like(value: Any, original_text: str) -> str:
+    """Encode value the way original_text was encoded."""
+    return json.dumps(value, **detect_style(original_text))
+
+
+def rewrite(text: str, edit: Callable[[Any], bool]) -> str:
+    """
+    Decode text once, let edit() modify the tree in place (returning True
+    if it changed anything) and re-encode once in the original style.
+    Text that is not JSON, or that edit() left alone, is returned as is.
+    """
+    value = decode(text)
+    if value is NOT_JSON or not edit(value):
+        return text
+    return encode_like(value, text)
@@ -0,0 +1,350 @@
+"""
+Server-side registry of live environments for app.py.
+
+The Flask cookie session only carries a handle; the environment's tables
+live here, in process memory, so a request costs a dict lookup instead of
+(un)pickling the whole dataset. Baseline data files are packed once into
+a read-only memory-mapped snapshot (baseline_snapshot.py) that every
+server process shares. A session's tables are its private overlay: each
+is parsed from the snapshot the first time the session touches it, so
+trainers never see each other's changes and untouched tables cost
+nothing. Session data is loaded as change-tracked containers
+(tracked_data.py), so every session also has an undo/redo history of
+its actions.
+
+Live sessions are kept in least-recently-used order. A session idle for
+longer than TASK_FRAMEWORK_IDLE_TIMEOUT seconds, or the least recently
+used ones once the estimated total passes TASK_FRAMEWORK_MEMORY_BUDGET_MB,
+are evicted: their tables are freed and only the action log (tool name,
+parameters and compiled interface of each applied step) is kept. The next
+request on an evicted handle rebuilds it from the baseline by replaying
+that log, each step with the interface it originally ran with.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from action_deltas import DeltaIndex, compute_delta
+from baseline_snapshot import BaselineSnapshot, open_snapshot
+from metrics import CACHE_REQUESTS, ENVIRONMENT_LOAD_SECONDS, REPLAY_FAILURES
+from table_indexes import TableIndexes
+from tracked_data import ActionHistory, Journal, LazyTrackedDict, loads_tracked
+
+ENVS_PATH = "envs"
+MEMORY_BUDGET_MB = int(os.environ.get("TASK_FRAMEWORK_MEMORY_BUDGET_MB", "2048"))
+IDLE_TIMEOUT = int(os.environ.get("TASK_FRAMEWORK_IDLE_TIMEOUT", "3600"))
+# Idle sessions are looked for at most this often (seconds)
+SWEEP_INTERVAL = 30
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory held by a JSON-like tree, in bytes."""
+    seen = set()
+    total = 0
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+    return total
+
+
+class LiveEnvironment:
+    """One trainer's working copy of an environment."""
+
+    def __init__(self, handle: str, environment: str, interface: Any, data: Dict[str, Any],
+                 journal: Journal):
+        self.handle = handle
+        self.environment = environment
+        self.interface = interface
+        self.data = data
+        self.journal = journal
+        self.history = ActionHistory(journal)
+        self.deltas = DeltaIndex(data)
+        self.indexes = TableIndexes(data)
+        self.tools = None  # CompiledInterface from tool_registry
+        # Held by every request on this session, so its actions apply in order
+        self.lock = threading.RLock()
+        self.last_used = time.time()
+        self.size = 0  # estimated bytes of the loaded tables
+        self.replay_failures: List[str] = []  # steps that raised when rebuilt
+
+
+class EvictedEnvironment:
+    """What is left of an evicted session: enough to replay it."""
+
+    def __init__(self, live: LiveEnvironment):
+        self.handle = live.handle
+        self.environment = live.environment
+        self.interface = live.interface
+        self.tools = live.tools
+        self.last_used = live.last_used
+        history = live.history
+        # (api_name, parameters, tools it ran with); the session can switch
+        # interface within an environment, so tools are kept per step
+        self.actions: List[Tuple[str, Dict[str, Any], Any]] = [
+            (step['api_name'], step['parameters'], step.get('tools'))
+            for step in history.steps[:history.position]
+        ]
+
+
+class EnvironmentStore:
+    """
+    replay_action(live, api_name, parameters) runs one logged action
+    against live.data when an evicted session is rebuilt, and returns
+    {'arguments', 'output'} for the step.
+    """
+
+    def __init__(self, envs_path: str = ENVS_PATH,
+                 replay_action: Optional[Callable[[LiveEnvironment, str, Dict[str, Any]], Any]] = None,
+                 memory_budget_mb: int = MEMORY_BUDGET_MB, idle_timeout: int = IDLE_TIMEOUT):
+        self.envs_path = envs_path
+        self.replay_action = replay_action
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.idle_timeout = idle_timeout
+        self._lock = threading.RLock()
+        # environment -> (signature of the data files, mapped snapshot)
+        self._baselines: Dict[str, Tuple[Tuple, BaselineSnapshot]] = {}
+        # snapshot path -> {table: estimated size of one loaded copy}
+        self._table_sizes: Dict[str, Dict[str, int]] = {}
+        # least recently used first
+        self._live: "OrderedDict[str, LiveEnvironment]" = OrderedDict()
+        self._evicted: Dict[str, EvictedEnvironment] = {}
+        self._rebuild_locks: Dict[str, threading.Lock] = {}
+        self._last_sweep = time.time()
+        self.evictions = 0
+        self.rebuilds = 0
+
+    def data_path(self, environment: str) -> str:
+        return f"{self.envs_path}/{environment}/data"
+
+    def _signature(self, environment: str) -> Tuple:
+        data_path = self.data_path(environment)
+        signature = []
+        for data_file in sorted(os.listdir(data_path)):
+            if data_file.endswith(".json"):
+                stat = os.stat(os.path.join(data_path, data_file))
+                signature.append((data_file, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def baseline(self, environment: str) -> BaselineSnapshot:
+        """
+        The mapped snapshot of every data file. Rebuilt only when a file in
+        the data directory was added, removed or modified.
+        """
+        signature = self._signature(environment)
+        cached = self._baselines.get(environment)
+        if cached and cached[0] == signature:
+            CACHE_REQUESTS.inc(cache='baseline', result='hit')
+            return cached[1]
+
+        CACHE_REQUESTS.inc(cache='baseline', result='miss')
+        with ENVIRONMENT_LOAD_SECONDS.time(environment=environment, step='snapshot'):
+            snapshot = open_snapshot(self.data_path(environment), environment, signature)
+        with self._lock:
+            self._baselines[environment] = (signature, snapshot)
+        return snapshot
+
+    def fresh_data(self, environment: str, journal: Optional[Journal] = None) -> Dict[str, Any]:
+        """
+        A private, mutable copy of the environment's baseline data; with a
+        journal, as tracked containers that record their changes in it,
+        each table loaded from the snapshot on first access.
+        """
+        snapshot = self.baseline(environment)
+        if journal is None:
+            return {table: json.loads(snapshot.load(table)) for table in snapshot.tables()}
+        def load_table(table):
+            with ENVIRONMENT_LOAD_SECONDS.time(environment=environment, step='table'):
+                return loads_tracked(snapshot.load(table), journal)
+        return LazyTrackedDict(journal, load_table, snapshot.tables())
+
+    def _table_size(self, snapshot: BaselineSnapshot, table: str, value: Any) -> int:
+        """Estimated size of a loaded table, measured once per snapshot."""
+        sizes = self._table_sizes.setdefault(snapshot.path, {})
+        if table not in sizes:
+            sizes[table] = estimate_size(value)
+        return sizes[table]
+
+    def warm(self, environment: str):
+        """Map the snapshot and measure every table ahead of the first session."""
+        snapshot = self.baseline(environment)
+        journal = Journal()
+        for table in snapshot.tables():
+            self._table_size(snapshot, table, loads_tracked(snapshot.load(table), journal))
+
+    def _new_live(self, handle: str, environment: str, interface: Any) -> LiveEnvironment:
+        journal = Journal()
+        snapshot = self.baseline(environment)
+        live = LiveEnvironment(handle, environment, interface, self.fresh_data(environment, journal), journal)
+        live.data.on_load = lambda table, value: self._table_loaded(live, snapshot, table, value)
+        return live
+
+    def _table_loaded(self, live: LiveEnvironment, snapshot: BaselineSnapshot, table: str, value: Any):
+        live.deltas.table_loaded(table, value)
+        live.size += self._table_size(snapshot, table, value)
+        with self._lock:
+            if live.handle in self._live:
+                self._enforce_budget(keep=live.handle)
+
+    def get(self, handle: Optional[str]) -> Optional[LiveEnvironment]:
+        if not handle:
+            return None
+        self._sweep()
+        rebuild_lock = None
+        with self._lock:
+            live = self._live.get(handle)
+            if live is not None:
+                self._live.move_to_end(handle)
+            elif handle in self._evicted:
+                rebuild_lock = self._rebuild_locks.setdefault(handle, threading.Lock())
+        if rebuild_lock is not None:
+            # Concurrent requests on an evicted session rebuild it once
+            with rebuild_lock:
+                with self._lock:
+                    live = self._live.get(handle)
+                    evicted = self._evicted.pop(handle, None) if live is None else None
+                if evicted is not None:
+                    live = self._rebuild(evicted)
+            with self._lock:
+                self._rebuild_locks.pop(handle, None)
+        if live is not None:
+            live.last_used = time.time()
+        return live
+
+    def open(self, handle: Optional[str], environment: str, interface: Any, tools: Any = None) -> LiveEnvironment:
+        """
+        Start (or restart) a session on environment with fresh data.
+        The existing handle is reused so the cookie does not need to change.
+        tools are set before the session becomes visible to other requests.
+        """
+        live = self._new_live(handle or uuid.uuid4().hex, environment, interface)
+        live.tools = tools
+        self._add(live)
+        return live
+
+    def _add(self, live: LiveEnvironment):
+        with self._lock:
+            self._evicted.pop(live.handle, None)
+            self._live[live.handle] = live
+            self._live.move_to_end(live.handle)
+            self._enforce_budget(keep=live.handle)
+
+    def _rebuild(self, evicted: EvictedEnvironment) -> LiveEnvironment:
+        """Fresh baseline data plus a replay of the logged actions."""
+        live = self._new_live(evicted.handle, evicted.environment, evicted.interface)
+        journal = live.journal
+        for api_name, parameters, tools in evicted.actions:
+            details = {}
+            live.tools = tools
+            journal.begin()
+            try:
+                if self.replay_action is not None and tools is not None:
+                    details = self.replay_action(live, api_name, parameters) or {}
+            except Exception as e:
+                # It failed the first time too; it is still a step
+                REPLAY_FAILURES.inc(environment=live.environment, tool=api_name)
+                live.replay_failures.append(f"step {live.history.position}: {api_name}: {e}")
+            finally:
+                changes = journal.end()
+            live.history.record(api_name, parameters, changes, compute_delta(live.deltas, changes),
+                                details.get('arguments'), details.get('output', ''), tools)
+        live.tools = evicted.tools
+        self.rebuilds += 1
+        self._add(live)
+        return live
+
+    def _evict(self, handle: str) -> bool:
+        """Evict a session unless a request is using it right now."""
+        live = self._live.get(handle)
+        if live is None or not live.lock.acquire(blocking=False):
+            return False
+        try:
+            del self._live[handle]
+            self._evicted[handle] = EvictedEnvironment(live)
+            self.evictions += 1
+        finally:
+            live.lock.release()
+        return True
+
+    def _enforce_budget(self, keep: Optional[str] = None):
+        """Evict least recently used sessions until the total fits the budget."""
+        used = sum(live.size for live in self._live.values())
+        for handle in list(self._live):
+            if used <= self.memory_budget:
+                break
+            if handle == keep:
+                continue
+            size = self._live[handle].size
+            if self._evict(handle):
+                used -= size
+
+    def _sweep(self):
+        now = time.time()
+        if now - self._last_sweep < SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        with self._lock:
+            for handle, live in list(self._live.items()):
+                if now - live.last_used > self.idle_timeout:
+                    self._evict(handle)
+
+    def drop(self, handle: str):
+        with self._lock:
+            self._live.pop(handle, None)
+            self._evicted.pop(handle, None)
+
+    def sessions(self) -> Dict[str, LiveEnvironment]:
+        return dict(self._live)
+
+    def counts(self) -> Dict[str, int]:
+        """Number of live and evicted sessions."""
+        with self._lock:
+            return {'live': len(self._live), 'evicted': len(self._evicted)}
+
+    def usage(self) -> Dict[str, Any]:
+        """Budget, current use and per-session state, for the admin endpoint."""
+        now = time.time()
+        with self._lock:
+            sessions = [{
+                'handle': live.handle[:8],
+                'environment': live.environment,
+                'interface': live.interface,
+                'state': 'live',
+                'estimated_mb': round(live.size / (1024 * 1024), 2),
+                'idle_seconds': round(now - live.last_used),
+                'steps': live.history.position,
+                'replay_failures': live.replay_failures,
+            } for live in reversed(self._live.values())]
+            sessions += [{
+                'handle': evicted.handle[:8],
+                'environment': evicted.environment,
+                'interface': evicted.interface,
+                'state': 'evicted',
+                'estimated_mb': 0,
+                'idle_seconds': round(now - evicted.last_used),
+                'steps': len(evicted.actions),
+            } for evicted in self._evicted.values()]
+            used = sum(live.size for live in self._live.values())
+        return {
+            'memory_budget_mb': self.memory_budget // (1024 * 1024),
+            'idle_timeout_seconds': self.idle_timeout,
+            'estimated_used_mb': round(used / (1024 * 1024), 2),
+            'live_sessions': len(self._live),
+            'evicted_sessions': len(self._evicted),
+            'evictions': self.evictions,
+            'rebuilds': self.rebuilds,
+            'sessions': sessions,
+        }
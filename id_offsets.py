@@ -0,0 +1,273 @@
+"""
+Derive the ID field -> table mapping and the per-table ID offsets used by
+the ID shifting scripts, instead of maintaining them by hand.
+
+- The field mapping comes from the DBML schema: every primary key maps to
+  its own table, every `Ref: a.field > b.pk` maps `field` to b's table.
+  Field names that reference different tables are treated as polymorphic.
+- Offsets come from scanning the data directory of the environment the
+  tasks were written against (folder1) and of the refreshed one (folder2).
+
+The result is written as a versioned artifact (id_offsets/v0001.json,
+v0002.json, ...) that shift_ids_task_json.py and shift_ids_response_json.py
+load on start-up.
+
+Usage:
+    python id_offsets.py --schema domain_context/schema.txt \\
+        --old old_envs/<env>/data --new envs/<env>/data [--out id_offsets]
+"""
+import os
+import re
+import json
+import argparse
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from task_file_io import atomic_write_json
+
+DEFAULT_ARTIFACT_DIR = os.environ.get("ID_OFFSETS_PATH", "id_offsets")
+
+# API parameter aliases that never appear in the schema.
+# Format: 'alias': 'canonical_field'
+FIELD_ALIASES = {
+    'org_id': 'organization_id',
+    'ws_id': 'workspace_id',
+    'proj_id': 'project_id',
+    'repo_id': 'repository_id',
+    'dir_id': 'directory_id',
+    'pr_id': 'pull_request_id',
+    'pr_number': 'pull_request_id',
+    'pull_request_number': 'pull_request_id',
+    'issue_number': 'issue_id',
+    'work_item_id': 'issue_id',
+}
+
+# Fields whose table depends on a sibling *_type field; the shift scripts
+# resolve these from context, so they always map to None.
+POLYMORPHIC_FIELDS = {'owner_id', 'commentable_id', 'reference_id', 'entity_id'}
+
+_TABLE_RE = re.compile(r'^\s*Table\s+"?(\w+)"?(?:\s+as\s+\w+)?\s*\{')
+_FIELD_RE = re.compile(r'^\s*"?(\w+)"?\s+[\w\(\),\'" ]+?(?:\[(.*)\])?\s*(?://.*)?$')
+_REF_RE = re.compile(r'^\s*Ref(?:\s+\w+)?\s*:\s*"?(\w+)"?\."?(\w+)"?\s*([<>-]|<>)\s*"?(\w+)"?\."?(\w+)"?')
+_INLINE_REF_RE = re.compile(r'ref:\s*([<>-]|<>)\s*"?(\w+)"?\."?(\w+)"?')
+
+
+def parse_schema(schema_path: str) -> Tuple[Dict[str, List[str]], List[Tuple[str, str, str, str]]]:
+    """
+    Parse a DBML schema file.
+    Returns (primary_keys, refs):
+        primary_keys: {table: [pk_field, ...]}
+        refs: [(table, field, referenced_table, referenced_field), ...]
+    Commented-out lines are ignored.
+    """
+    primary_keys = {}
+    refs = []
+    current_table = None
+
+    with open(schema_path, 'r', encoding='utf-8') as f:
+        for raw_line in f:
+            line = raw_line.strip()
+            if not line or line.startswith('//'):
+                continue
+
+            table_match = _TABLE_RE.match(line)
+            if table_match:
+                current_table = table_match.group(1)
+                primary_keys.setdefault(current_table, [])
+                continue
+
+            ref_match = _REF_RE.match(line)
+            if ref_match:
+                left_table, left_field, direction, right_table, right_field = ref_match.groups()
+                if direction == '<':
+                    refs.append((right_table, right_field, left_table, left_field))
+                else:
+                    refs.append((left_table, left_field, right_table, right_field))
+                continue
+
+            if current_table is None:
+                continue
+            if line.startswith('}'):
+                current_table = None
+                continue
+
+            field_match = _FIELD_RE.match(line)
+            if not field_match:
+                continue
+            field, settings = field_match.group(1), (field_match.group(2) or '')
+            settings_lower = settings.lower()
+            if 'primary key' in settings_lower or re.search(r'\bpk\b', settings_lower):
+                primary_keys[current_table].append(field)
+            inline_ref = _INLINE_REF_RE.search(settings)
+            if inline_ref:
+                _, ref_table, ref_field = inline_ref.groups()
+                refs.append((current_table, field, ref_table, ref_field))
+
+    return primary_keys, refs
+
+
+def derive_field_mapping(schema_path: str, aliases: Optional[Dict[str, str]] = None,
+                         polymorphic: Optional[set] = None) -> Dict[str, Optional[str]]:
+    """
+    Build {'field_name': 'table.json' or None} from the schema.
+    A field that references more than one table maps to None.
+    """
+    aliases = FIELD_ALIASES if aliases is None else aliases
+    polymorphic = POLYMORPHIC_FIELDS if polymorphic is None else polymorphic
+    primary_keys, refs = parse_schema(schema_path)
+
+    targets = {}
+    for table, fields in primary_keys.items():
+        for field in fields:
+            targets.setdefault(field, set()).add(f"{table}.json")
+    for _, field, ref_table, _ in refs:
+        targets.setdefault(field, set()).add(f"{ref_table}.json")
+
+    mapping = {}
+    for field, tables in sorted(targets.items()):
+        mapping[field] = next(iter(tables)) if len(tables) == 1 else None
+    for alias, canonical in aliases.items():
+        if mapping.get(canonical):
+            mapping.setdefault(alias, mapping[canonical])
+    for field in polymorphic:
+        mapping[field] = None
+    return mapping
+
+
+def _numeric_ids(records: Any) -> List[int]:
+    keys = records.keys() if isinstance(records, dict) else []
+    ids = []
+    for key in keys:
+        try:
+            ids.append(int(key))
+        except (ValueError, TypeError):
+            pass
+    return ids
+
+
+def scan_data_dir(data_dir: str) -> Dict[str, Dict[str, int]]:
+    """
+    Count records per table file.
+    Returns {filename: {'records': n, 'max_id': m or None}}
+    """
+    stats = {}
+    for filename in sorted(os.listdir(data_dir)):
+        if not filename.endswith(".json"):
+            continue
+        with open(os.path.join(data_dir, filename), 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        ids = _numeric_ids(records)
+        stats[filename] = {
+            'records': len(records) if isinstance(records, (dict, list)) else 0,
+            'max_id': max(ids) if ids else None,
+        }
+    return stats
+
+
+def compute_offsets(old_data_dir: str, new_data_dir: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Compare two environment data directories.
+    threshold is the largest numeric ID in the old data (record count when
+    IDs are not numeric); IDs above it were created by task actions and
+    must move by offset, the growth of the table between the two folders.
+    """
+    old_stats = scan_data_dir(old_data_dir)
+    new_stats = scan_data_dir(new_data_dir)
+    offsets = {}
+    for filename in sorted(set(old_stats) | set(new_stats)):
+        old = old_stats.get(filename)
+        new = new_stats.get(filename)
+        if old and new:
+            status = "Found in both"
+            if old['max_id'] is not None and new['max_id'] is not None:
+                offset = new['max_id'] - old['max_id']
+            else:
+                offset = new['records'] - old['records']
+        else:
+            status = "Only in folder1" if old else "Only in folder2"
+            offset = 0
+        folder1_records = old['records'] if old else 0
+        offsets[filename] = {
+            'folder1_records': folder1_records,
+            'folder2_records': new['records'] if new else 0,
+            'threshold': old['max_id'] if old and old['max_id'] is not None else folder1_records,
+            'offset': offset,
+            'status': status,
+        }
+    return offsets
+
+
+def _artifact_versions(artifact_dir: str) -> List[int]:
+    if not os.path.isdir(artifact_dir):
+        return []
+    versions = []
+    for name in os.listdir(artifact_dir):
+        match = re.fullmatch(r'v(\d+)\.json', name)
+        if match:
+            versions.append(int(match.group(1)))
+    return sorted(versions)
+
+
+def write_offsets_artifact(artifact_dir: str, field_to_table: Dict[str, Optional[str]],
+                           offsets: Dict[str, Dict[str, Any]], sources: Dict[str, str]) -> str:
+    """Write the next version of the artifact. Returns its path."""
+    versions = _artifact_versions(artifact_dir)
+    version = (versions[-1] + 1) if versions else 1
+    path = os.path.join(artifact_dir, f"v{version:04d}.json")
+    atomic_write_json(path, {
+        'version': version,
+        'generated_at': datetime.now().isoformat(),
+        'sources': sources,
+        'field_to_table': field_to_table,
+        'offsets': offsets,
+    })
+    return path
+
+
+def load_offsets_artifact(artifact_dir: str = DEFAULT_ARTIFACT_DIR,
+                          version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Load a given (default: latest) artifact version, or None if there is none."""
+    versions = _artifact_versions(artifact_dir)
+    if not versions:
+        return None
+    if version is None:
+        version = versions[-1]
+    elif version not in versions:
+        raise FileNotFoundError(f"No offsets artifact v{version:04d} in {artifact_dir}")
+    with open(os.path.join(artifact_dir, f"v{version:04d}.json"), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def offsets_from_artifact(artifact: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+    """Artifact offsets in the shape the shift engine takes (threshold as folder1_records)."""
+    return {
+        filename: {'folder1_records': info['threshold'], 'offset': info['offset']}
+        for filename, info in artifact['offsets'].items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a versioned ID offsets artifact")
+    parser.add_argument("--schema", default="domain_context/schema.txt")
+    parser.add_argument("--old", required=True, help="data directory the tasks were written against")
+    parser.add_argument("--new", required=True, help="refreshed data directory")
+    parser.add_argument("--out", default=DEFAULT_ARTIFACT_DIR)
+    args = parser.parse_args()
+
+    field_to_table = derive_field_mapping(args.schema)
+    offsets = compute_offsets(args.old, args.new)
+    path = write_offsets_artifact(args.out, field_to_table, offsets, {
+        'schema': args.schema,
+        'folder1': args.old,
+        'folder2': args.new,
+    })
+
+    print(f"Mapped {len(field_to_table)} ID fields from {args.schema}")
+    print(f"{'filename':<32}{'folder1':>10}{'folder2':>10}{'offset':>8}")
+    for filename, info in offsets.items():
+        print(f"{filename:<32}{info['folder1_records']:>10}{info['folder2_records']:>10}{info['offset']:>8}")
+    print(f"\nWrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Shared ID-shift engine for task.json and result.json files.
+
+The engine compiles, per dict key layout, a rewrite plan that lists which
+keys of that dict hold IDs of which table (or which polymorphic rule
+resolves them). Plans are cached, so shifting a batch
+costs a plan lookup per dict plus a dict lookup per ID value, instead of
+re-deciding every key against the mapping.
+
+Every shift is recorded as (path, old, new, table) in `changes`, with old
+and new string forms in `id_mapping` for the task outputs array.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+import embedded_json
+
+# Segment used in change paths where a JSON-encoded string was decoded.
+EMBEDDED_JSON = "$json"
+
+# field: (type_field, {type_value: table_file}, fallback table for unknown types)
+POLYMORPHIC_RULES = {
+    'owner_id': ('owner_type', {
+        'user': 'users.json',
+        'organization': 'organizations.json',
+    }, 'users.json'),
+    'commentable_id': ('commentable_type', {
+        'issue': 'issues.json',
+        'pull_request': 'pull_requests.json',
+    }, None),
+    'reference_id': ('reference_type', {
+        'issue': 'issues.json',
+        'pull_request': 'pull_requests.json',
+        'commit': 'commits.json',
+        'release': 'releases.json',
+    }, None),
+    'entity_id': ('entity_type', {
+        'label': 'labels.json',
+        'issue': 'issues.json',
+        'pull_request': 'pull_requests.json',
+        'repository': 'repositories.json',
+        'user': 'users.json',
+        'commit': 'commits.json',
+        'organization': 'organizations.json',
+        'project': 'projects.json',
+        'workspace': 'workspaces.json',
+        'file': 'files.json',
+        'branch': 'branches.json',
+        'code_review': 'code_reviews.json',
+        'comment': 'comments.json',
+        'release': 'releases.json',
+        'star': 'stars.json',
+        'access_token': 'access_tokens.json',
+    }, None),
+}
+
+_ID = 0
+_POLY = 1
+
+
+def should_adjust_id(value: Any, threshold: int) -> bool:
+    """IDs above the old table's threshold were created by task actions."""
+    if not isinstance(value, (int, str)) or isinstance(value, bool):
+        return False
+    try:
+        return int(value) > threshold
+    except (ValueError, TypeError):
+        return False
+
+
+def adjust_id_value(value: Any, offset: int) -> Any:
+    """Adjust an ID value by the offset, maintaining the original type."""
+    if isinstance(value, str):
+        try:
+            return str(int(value) + offset)
+        except ValueError:
+            return value
+    elif isinstance(value, int):
+        return value + offset
+    return value
+
+
+def format_path(path: Tuple) -> str:
+    rendered = ""
+    for part in path:
+        if isinstance(part, int):
+            rendered += f"[{part}]"
+        else:
+            rendered += f".{part}" if rendered else str(part)
+    return rendered
+
+
+class IdShiftEngine:
+    """
+    field_to_table: {'field': 'table.json' or None for polymorphic}
+    offsets:        {'table.json': {'folder1_records': threshold, 'offset': n}}
+    decode_embedded_json: also shift IDs inside JSON-encoded string values
+                          (tool outputs in result.json trajectories).
+    """
+
+    def __init__(self, field_to_table: Dict[str, Optional[str]], offsets: Dict[str, Dict[str, int]],
+                 decode_embedded_json: bool = False):
+        self.field_to_table = field_to_table
+        # Only tables that actually move matter at apply time.
+        self.active_offsets = {
+            table: (info['folder1_records'], info['offset'])
+            for table, info in offsets.items() if info['offset'] != 0
+        }
+        self.decode_embedded_json = decode_embedded_json
+        self._plans: Dict[Tuple, Tuple] = {}
+        self.reset()
+
+    def reset(self):
+        """Clear per-file results (plans are kept)."""
+        self.changes: List[Tuple[Tuple, Any, Any, str]] = []
+        self.id_mapping: Dict[str, str] = {}
+        self.id_mapping_tables: Dict[str, str] = {}
+        self.modifications: List[str] = []
+
+    # ------------------------------------------------------------------ plans
+    def compile_plan(self, keys: Tuple) -> Tuple:
+        """
+        Plan for a dict with this key layout: ((key, kind, target), ...)
+        for the ID-holding keys only. Cached per key layout: which keys
+        hold IDs depends on the mapping alone, not on the tool.
+        """
+        plan = self._plans.get(keys)
+        if plan is None:
+            entries = []
+            for key in keys:
+                if key not in self.field_to_table:
+                    continue
+                table_file = self.field_to_table[key]
+                if table_file is not None:
+                    if table_file in self.active_offsets:
+                        entries.append((key, _ID, table_file))
+                elif key in POLYMORPHIC_RULES:
+                    entries.append((key, _POLY, POLYMORPHIC_RULES[key]))
+            plan = (tuple(entries), frozenset(entry[0] for entry in entries))
+            self._plans[keys] = plan
+        return plan
+
+    # ------------------------------------------------------------------ apply
+    def shift(self, data: Any, path: Tuple = ()) -> Any:
+        """
+        Shift IDs in data (containers are updated in place).
+        Returns the (possibly new) value, so scalars and JSON strings work too.
+        """
+        if isinstance(data, dict):
+            self._shift_dict(data, path)
+        elif isinstance(data, list):
+            for idx, item in enumerate(data):
+                if isinstance(item, (dict, list)):
+                    self.shift(item, path + (idx,))
+                elif self.decode_embedded_json and isinstance(item, str):
+                    data[idx] = self._shift_embedded(item, path + (idx,))
+        elif self.decode_embedded_json and isinstance(data, str):
+            return self._shift_embedded(data, path)
+        return data
+
+    def _shift_dict(self, data: Dict, path: Tuple):
+        entries, id_keys = self.compile_plan(tuple(data))
+        for key, kind, target in entries:
+            value = data[key]
+            if value is None or isinstance(value, (dict, list)):
+                continue
+            if kind == _ID:
+                table_file = target
+            else:
+                type_field, table_by_type, fallback = target
+                if type_field not in data:
+                    continue
+                table_file = table_by_type.get(data[type_field], fallback)
+                if table_file is None or table_file not in self.active_offsets:
+                    continue
+            threshold, offset = self.active_offsets[table_file]
+            if should_adjust_id(value, threshold):
+                new_value = adjust_id_value(value, offset)
+                data[key] = new_value
+                self._record(path + (key,), key, value, new_value, table_file)
+
+        for key, value in data.items():
+            if isinstance(value, (dict, list)):
+                self.shift(value, path + (key,))
+            elif self.decode_embedded_json and isinstance(value, str) and key not in id_keys:
+                data[key] = self._shift_embedded(value, path + (key,))
+
+    def _shift_embedded(self, text: str, path: Tuple) -> str:
+        # Parsed once; re-encoded once, in the string's own style, only if shifted.
+        def edit(parsed):
+            before = len(self.changes)
+            self.shift(parsed, path + (EMBEDDED_JSON,))
+            return len(self.changes) != before
+        return embedded_json.rewrite(text, edit)
+
+    def _record(self, path: Tuple, field: str, old: Any, new: Any, table_file: str):
+        self.changes.append((path, old, new, table_file))
+        self.id_mapping[str(old)] = str(new)
+        self.id_mapping_tables[str(old)] = table_file
+        self.modifications.append(f"  Adjusted {field}: {old} -> {new} (using {table_file})")
+
+    def shift_outputs(self, outputs: List[Any], path: Tuple = ('task', 'outputs')) -> List[Any]:
+        """
+        Apply the ID changes seen so far to a task's outputs array: any
+        entry equal to a shifted ID (as a string) gets the new value.
+        """
+        adjusted = []
+        for idx, value in enumerate(outputs):
+            new_value = self.id_mapping.get(str(value))
+            if new_value is None:
+                adjusted.append(value)
+                continue
+            adjusted.append(new_value)
+            self.changes.append((path + (idx,), value, new_value, self.id_mapping_tables[str(value)]))
+            self.modifications.append(f"  Adjusted outputs[{idx}]: {value} -> {new_value} (matched from actions)")
+        return adjusted
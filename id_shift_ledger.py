@@ -0,0 +1,242 @@
+"""
+Persisted ledger of the ID shifts applied to an output tree.
+
+The shift scripts write <output_root>/id_shift_ledger.json next to the
+shifted files. It records the offsets (and offsets artifact version) used
+and, per file, every change as [path, old, new, table]. With it:
+
+- reverse_tree() puts every shifted value back to its original, in place,
+  without going back to the input folder.
+- reshift_tree() moves an already shifted tree to another offsets version.
+  When only the offsets grew (same thresholds, no table newly shifted) the
+  delta is applied to the recorded values only; otherwise each file is
+  reversed in memory and shifted again with the new offsets.
+
+Paths are the engine's change paths: keys and list indexes from the file
+root, with "$json" where a JSON-encoded string was decoded.
+"""
+import os
+import json
+import hashlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from embedded_json import encode_like
+from id_shift_engine import EMBEDDED_JSON, IdShiftEngine
+from task_file_io import atomic_write_json, render_task_json, write_if_changed
+
+LEDGER_FILENAME = "id_shift_ledger.json"
+
+Change = Tuple[Tuple, Any, Any, str]
+
+
+def mapping_fingerprint(field_to_table: Dict[str, Optional[str]]) -> str:
+    return hashlib.sha256(json.dumps(field_to_table, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class IdShiftLedger:
+    """
+    In-memory view of id_shift_ledger.json.
+
+    offsets:         {'table.json': {'folder1_records': threshold, 'offset': n}}
+                     ({} means the tree holds unshifted IDs)
+    offsets_version: artifact version, or None for the embedded offsets
+    files:           {relative_path: [[path, old, new, table], ...]}
+    """
+
+    def __init__(self, output_root: str, file_name: str, field_to_table: Dict[str, Optional[str]],
+                 decode_embedded_json: bool = False):
+        self.output_root = output_root
+        self.path = os.path.join(output_root, LEDGER_FILENAME)
+        self.file_name = file_name
+        self.mapping = mapping_fingerprint(field_to_table)
+        self.decode_embedded_json = decode_embedded_json
+        self.offsets: Dict[str, Dict[str, int]] = {}
+        self.offsets_version: Optional[int] = None
+        self.files: Dict[str, List[List[Any]]] = {}
+
+    @classmethod
+    def load(cls, output_root: str) -> 'IdShiftLedger':
+        path = os.path.join(output_root, LEDGER_FILENAME)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No {LEDGER_FILENAME} in {output_root}")
+        with open(path, 'r', encoding='utf-8') as f:
+            raw = json.load(f)
+        ledger = cls(output_root, raw['file_name'], {}, raw['decode_embedded_json'])
+        ledger.mapping = raw['field_to_table_sha256']
+        ledger.offsets = raw['offsets']
+        ledger.offsets_version = raw['offsets_version']
+        ledger.files = raw['files']
+        return ledger
+
+    def save(self):
+        atomic_write_json(self.path, {
+            'file_name': self.file_name,
+            'decode_embedded_json': self.decode_embedded_json,
+            'field_to_table_sha256': self.mapping,
+            'offsets_version': self.offsets_version,
+            'offsets': self.offsets,
+            'files': dict(sorted(self.files.items())),
+        })
+
+    def record(self, relative_path: str, changes: List[Change]):
+        if changes:
+            self.files[relative_path] = [[list(path), old, new, table] for path, old, new, table in changes]
+        else:
+            self.files.pop(relative_path, None)
+
+
+def apply_values(data: Any, items: List[Tuple[Tuple, Any]]) -> Any:
+    """
+    Set each (path, value) in data. Paths through "$json" decode the
+    string once, apply every item below it and re-encode it in its own style.
+    Returns data (or the new value for a root path).
+    """
+    embedded: Dict[Tuple, List[Tuple[Tuple, Any]]] = {}
+    for path, value in items:
+        path = tuple(path)
+        if EMBEDDED_JSON in path:
+            split = path.index(EMBEDDED_JSON)
+            embedded.setdefault(path[:split], []).append((path[split + 1:], value))
+        elif not path:
+            data = value
+        else:
+            _resolve(data, path[:-1])[path[-1]] = value
+
+    for prefix, sub_items in embedded.items():
+        if prefix:
+            parent = _resolve(data, prefix[:-1])
+            text = parent[prefix[-1]]
+            parent[prefix[-1]] = encode_like(apply_values(json.loads(text), sub_items), text)
+        else:
+            data = encode_like(apply_values(json.loads(data), sub_items), data)
+    return data
+
+
+def _resolve(data: Any, path: Tuple) -> Any:
+    for part in path:
+        data = data[part]
+    return data
+
+
+def reverse_changes(data: Any, changes: List[List[Any]]) -> Any:
+    """Put every recorded value back to its original."""
+    return apply_values(data, [(path, old) for path, old, _, _ in reversed(changes)])
+
+
+def can_apply_delta(old_offsets: Dict[str, Dict[str, int]], new_offsets: Dict[str, Dict[str, int]]) -> bool:
+    """
+    The recorded changes are enough to move to new_offsets when no table
+    changes threshold while shifted, and no table that was left alone
+    (offset 0, so its IDs were never recorded) starts shifting.
+    """
+    for table in set(old_offsets) | set(new_offsets):
+        old = old_offsets.get(table, {})
+        new = new_offsets.get(table, {})
+        old_offset, new_offset = old.get('offset', 0), new.get('offset', 0)
+        if new_offset == 0:
+            continue
+        if old_offset == 0 or old.get('folder1_records') != new.get('folder1_records'):
+            return False
+    return True
+
+
+def delta_changes(changes: List[List[Any]], new_offsets: Dict[str, Dict[str, int]]) -> Tuple[List, List[Change]]:
+    """
+    Re-offset recorded changes. Returns (items to apply, changes to record).
+    A new value keeps the type the recorded one had, as a full shift would.
+    """
+    items = []
+    new_changes = []
+    for path, old, new, table in changes:
+        offset = new_offsets.get(table, {}).get('offset', 0)
+        if offset == 0:
+            items.append((path, old))
+            continue
+        value = int(old) + offset
+        value = str(value) if isinstance(new, str) else value
+        items.append((path, value))
+        new_changes.append((tuple(path), old, value, table))
+    return items, new_changes
+
+
+def _rewrite(path: str, original_text: str, data: Any) -> int:
+    return write_if_changed(path, render_task_json(data, original_text))
+
+
+def _tree_files(ledger: IdShiftLedger) -> List[str]:
+    found = []
+    for dirpath, _, filenames in os.walk(ledger.output_root):
+        if ledger.file_name in filenames:
+            found.append(os.path.relpath(os.path.join(dirpath, ledger.file_name), ledger.output_root))
+    return sorted(found)
+
+
+def reverse_tree(output_root: str) -> Tuple[int, int]:
+    """
+    Undo every recorded shift in output_root (atomically, minimal diff).
+    Returns (files_rewritten, values_restored).
+    """
+    ledger = IdShiftLedger.load(output_root)
+    files = 0
+    values = 0
+    for relative_path, changes in ledger.files.items():
+        file_path = os.path.join(output_root, relative_path)
+        with open(file_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        data = reverse_changes(json.loads(text), changes)
+        _rewrite(file_path, text, data)
+        files += 1
+        values += len(changes)
+    ledger.files = {}
+    ledger.offsets = {}
+    ledger.offsets_version = None
+    ledger.save()
+    return files, values
+
+
+def reshift_tree(output_root: str, new_offsets: Dict[str, Dict[str, int]], offsets_version: Optional[int],
+                 field_to_table: Dict[str, Optional[str]],
+                 shift_data: Callable[[Any, IdShiftEngine], Any]) -> Dict[str, int]:
+    """
+    Move a shifted output_root to new_offsets in place.
+    shift_data(data, engine) shifts one loaded file and returns it; it is
+    only used when the delta cannot be derived from the ledger.
+    Returns {'mode', 'files', 'values', 'bytes_written'}.
+    """
+    ledger = IdShiftLedger.load(output_root)
+    stats = {'files': 0, 'values': 0, 'bytes_written': 0}
+
+    if ledger.mapping == mapping_fingerprint(field_to_table) and can_apply_delta(ledger.offsets, new_offsets):
+        stats['mode'] = 'delta'
+        for relative_path, changes in list(ledger.files.items()):
+            file_path = os.path.join(output_root, relative_path)
+            with open(file_path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            items, new_changes = delta_changes(changes, new_offsets)
+            data = apply_values(json.loads(text), items)
+            stats['bytes_written'] += _rewrite(file_path, text, data)
+            stats['files'] += 1
+            stats['values'] += len(new_changes)
+            ledger.record(relative_path, new_changes)
+    else:
+        stats['mode'] = 'full'
+        engine = IdShiftEngine(field_to_table, new_offsets, ledger.decode_embedded_json)
+        for relative_path in _tree_files(ledger):
+            file_path = os.path.join(output_root, relative_path)
+            with open(file_path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            data = json.loads(text)
+            if relative_path in ledger.files:
+                data = reverse_changes(data, ledger.files[relative_path])
+            engine.reset()
+            data = shift_data(data, engine)
+            stats['bytes_written'] += _rewrite(file_path, text, data)
+            stats['files'] += 1
+            stats['values'] += len(engine.changes)
+            ledger.record(relative_path, engine.changes)
+        ledger.mapping = mapping_fingerprint(field_to_table)
+
+    ledger.offsets = new_offsets
+    ledger.offsets_version = offsets_version
+    ledger.save()
+    return stats
@@ -0,0 +1,134 @@
+"""
+Minimal-diff rewriting of JSON files.
+
+render_minimal_diff() takes the original file text plus the old and new
+data, finds the smallest set of values that differ, and splices only those
+value spans in the original text. Whitespace, key order and untouched
+values stay byte-for-byte identical, which keeps git diffs down to the
+IDs/outputs that really changed.
+"""
+import re
+import json
+from json.decoder import scanstring
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_INDENT = re.compile(r'\n([ \t]+)\S')
+_decoder = json.JSONDecoder()
+
+Path = Tuple[Any, ...]
+
+
+def changed_paths(old: Any, new: Any, path: Path = ()) -> Iterator[Path]:
+    """
+    Yield the outermost paths whose value must be rewritten to turn old
+    into new. A dict whose key set changed, or a list whose length changed,
+    is replaced as a whole; otherwise we recurse into it.
+    """
+    if type(old) is not type(new):
+        yield path
+    elif isinstance(old, dict):
+        if old.keys() != new.keys():
+            yield path
+            return
+        for key in old:
+            yield from changed_paths(old[key], new[key], path + (key,))
+    elif isinstance(old, list):
+        if len(old) != len(new):
+            yield path
+            return
+        for idx, (old_item, new_item) in enumerate(zip(old, new)):
+            yield from changed_paths(old_item, new_item, path + (idx,))
+    elif old != new:
+        yield path
+
+
+def locate_value_spans(text: str, paths: List[Path]) -> Dict[Path, Tuple[int, int]]:
+    """
+    Find the (start, end) character span of each requested path's value.
+    Only containers on the way to a requested path are walked key by key;
+    everything else is skipped with the C decoder.
+    """
+    targets = set(paths)
+    prefixes = {path[:i] for path in targets for i in range(len(path))}
+    spans = {}
+
+    def skip_ws(pos):
+        return _WHITESPACE.match(text, pos).end()
+
+    def walk(pos, path):
+        pos = skip_ws(pos)
+        if path in targets or path not in prefixes:
+            _, end = _decoder.raw_decode(text, pos)
+            if path in targets:
+                spans[path] = (pos, end)
+            return end
+
+        opener = text[pos]
+        if opener not in '{[':
+            _, end = _decoder.raw_decode(text, pos)
+            return end
+        closer = '}' if opener == '{' else ']'
+        pos = skip_ws(pos + 1)
+        if text[pos] == closer:
+            return pos + 1
+        idx = 0
+        while True:
+            if opener == '{':
+                key, pos = scanstring(text, skip_ws(pos) + 1)
+                pos = skip_ws(pos) + 1  # ':'
+                pos = walk(pos, path + (key,))
+            else:
+                pos = walk(pos, path + (idx,))
+                idx += 1
+            pos = skip_ws(pos)
+            if text[pos] == ',':
+                pos += 1
+                continue
+            return pos + 1
+
+    walk(0, ())
+    return spans
+
+
+def detect_indent(text: str) -> Optional[str]:
+    """The indent unit used by the file, or None for single-line JSON."""
+    match = _INDENT.search(text)
+    return match.group(1) if match else None
+
+
+def _render_value(value: Any, text: str, start: int, indent: Optional[str]) -> str:
+    if indent is None:
+        return json.dumps(value)
+    line_start = text.rfind('\n', 0, start) + 1
+    base = text[line_start:start]
+    base = base[:len(base) - len(base.lstrip(' \t'))]
+    return json.dumps(value, indent=indent).replace('\n', '\n' + base)
+
+
+def render_minimal_diff(original_text: str, old_data: Any, new_data: Any) -> str:
+    """
+    Return original_text with only the changed values replaced.
+    Returns original_text itself when nothing changed.
+    """
+    paths = list(changed_paths(old_data, new_data))
+    if not paths:
+        return original_text
+    if paths == [()]:
+        indent = detect_indent(original_text)
+        return json.dumps(new_data, indent=indent)
+
+    spans = locate_value_spans(original_text, paths)
+    indent = detect_indent(original_text)
+    pieces = []
+    cursor = 0
+    for path in sorted(paths, key=lambda p: spans[p][0]):
+        start, end = spans[path]
+        value = new_data
+        for part in path:
+            value = value[part]
+        pieces.append(original_text[cursor:start])
+        pieces.append(_render_value(value, original_text, start, indent))
+        cursor = end
+    pieces.append(original_text[cursor:])
+    return ''.join(pieces)
@@ -0,0 +1,150 @@
+"""
+In-process metrics for app.py, rendered in the Prometheus text
+exposition format (version 0.0.4) by render().
+
+Counters and histograms are updated where things happen; gauges are
+callbacks read at scrape time, so they always report current state.
+No client library is needed.
+"""
+import time
+import threading
+import contextlib
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[Tuple[str, str], ...]
+
+_registry: List[Any] = []
+
+
+def _labels(labels: Dict[str, Any]) -> LabelValues:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    labels = list(labels)
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, float] = {}
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(key)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._lock = threading.Lock()
+        # labels -> ([count per bucket], sum, count)
+        self._values: Dict[LabelValues, List[Any]] = {}
+        _registry.append(self)
+
+    def observe(self, value: float, **labels):
+        key = _labels(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    labels = key + (('le', _format_value(bound)),)
+                    lines.append(f'{self.name}_bucket{_format_labels(labels)} {cumulative}')
+                lines.append(f'{self.name}_sum{_format_labels(key)} {_format_value(total)}')
+                lines.append(f'{self.name}_count{_format_labels(key)} {count}')
+        return lines
+
+
+class Gauge:
+    """
+    callback() returns [(labels dict, value)], read at every scrape.
+    kind="counter" exposes a total kept elsewhere (e.g. an attribute).
+    """
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], Iterable[Tuple[Dict[str, Any], float]]],
+                 kind: str = 'gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.kind = kind
+        _registry.append(self)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for labels, value in self.callback():
+            lines.append(f'{self.name}{_format_labels(_labels(labels))} {_format_value(value)}')
+        return lines
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# Shared by the server modules
+REQUEST_SECONDS = Histogram('task_framework_request_duration_seconds',
+                            'HTTP request latency by route.')
+TOOL_SECONDS = Histogram('task_framework_tool_duration_seconds',
+                         'Tool execution time by environment, interface and tool.')
+ENVIRONMENT_LOAD_SECONDS = Histogram('task_framework_environment_load_seconds',
+                                     'Time to build/map a baseline snapshot (step="snapshot") '
+                                     'or parse a table into a session (step="table").')
+TOOL_COMPILE_SECONDS = Histogram('task_framework_tool_compile_seconds',
+                                 'Time to compile a tool interface.')
+CACHE_REQUESTS = Counter('task_framework_cache_requests_total',
+                         'Cache lookups by cache and result (hit/miss).')
+REPLAY_FAILURES = Counter('task_framework_replay_failures_total',
+                          'Logged actions that raised when an evicted session was rebuilt.')
@@ -0,0 +1,212 @@
+"""
+Provenance tracking for created IDs when repairing task outputs.
+
+When a data refresh shifts auto-generated IDs, an action that creates a
+record (issue, pull request, incident, commit, ...) returns a different ID
+on re-run, and every later action that was written against the old ID
+breaks. ProvenanceTracker notices when re-running a creating action
+changed an ID in its output and rewrites later action arguments that
+carried the old value for the same field, all in one forward pass.
+
+Remaps are keyed by (field, value): a changed issue_id "12" rewrites
+issue_id/issue_ids arguments, never an unrelated user_id "12". Only
+creating actions (create_issue, add_comment, push_files, ...) register
+remaps; read and discover outputs are not matched by position, since
+their records can legitimately come back in another order.
+
+Argument keys are resolved with the action's own entity, so a bare id in
+update_issue refers to issue_id, and through aliases: the API aliases of
+id_offsets.py plus the schema's foreign keys (reporter_id -> user_id,
+see field_aliases). An ID-like key that still names no known field
+(a bare id, assigned_to, created_by, ...) falls back to the value alone,
+when exactly one field has a remap for it.
+"""
+import os
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from id_offsets import FIELD_ALIASES, parse_schema
+
+CREATE_VERBS = ("create", "add", "insert", "new", "open", "register", "record", "log",
+                "submit", "post", "upload", "generate", "commit", "push", "merge", "fork")
+
+
+def is_identifier_key(key: Any) -> bool:
+    """Check if a field name looks like it holds a record identifier."""
+    if not isinstance(key, str):
+        return False
+    key = key.lower()
+    return (
+        key == "id"
+        or key.endswith("_id")
+        or key.endswith("_ids")
+        or "sha" in key
+        or key.endswith("_by")
+        or key.endswith("_to")
+    )
+
+
+def is_create_action(action_name: Any) -> bool:
+    """Check if an action name looks like it creates records."""
+    if not isinstance(action_name, str):
+        return False
+    return action_name.lower().split("_")[0] in CREATE_VERBS
+
+
+def entity_of(action_name: Any) -> Optional[str]:
+    """create_pull_request -> pull_request, update_issues -> issue"""
+    if not isinstance(action_name, str):
+        return None
+    parts = action_name.lower().split("_")[1:]
+    if not parts:
+        return None
+    entity = "_".join(parts)
+    return entity[:-1] if entity.endswith("s") and not entity.endswith("ss") else entity
+
+
+def field_aliases(schema_path: Optional[str] = None) -> Dict[str, str]:
+    """
+    {key: canonical field}: FIELD_ALIASES plus, when schema_path exists,
+    every foreign key whose name differs from the key it references
+    (escalated_by_id -> user_id). Keys referencing several fields are left out.
+    """
+    aliases = dict(FIELD_ALIASES)
+    if schema_path and os.path.exists(schema_path):
+        targets: Dict[str, Set[str]] = {}
+        for _, field, _, ref_field in parse_schema(schema_path)[1]:
+            if field != ref_field:
+                targets.setdefault(field, set()).add(ref_field)
+        for field, refs in targets.items():
+            if len(refs) == 1:
+                aliases.setdefault(field, next(iter(refs)))
+    return aliases
+
+
+def field_of(key: str, entity: Optional[str] = None, aliases: Optional[Dict[str, str]] = None) -> str:
+    """
+    The field an ID-like key refers to: issue_ids -> issue_id, any *sha*
+    key -> sha, a bare id -> <entity>_id of the action it belongs to, and
+    aliases (pr_id -> pull_request_id) to their canonical field.
+    """
+    key = key.lower()
+    if "sha" in key:
+        return "sha"
+    if key.endswith("_ids"):
+        key = key[:-1]
+    if key == "id" and entity:
+        return f"{entity}_id"
+    return (aliases or {}).get(key, key)
+
+
+def _names_no_field(field: str) -> bool:
+    """A bare id (no entity) or a role key like assigned_to / created_by."""
+    return field == "id" or field.endswith("_by") or field.endswith("_to")
+
+
+def _format_path(path: Tuple) -> str:
+    """Render a path tuple as output.a.b[0].c"""
+    rendered = ""
+    for part in path:
+        if isinstance(part, int):
+            rendered += f"[{part}]"
+        else:
+            rendered += f".{part}" if rendered else str(part)
+    return rendered
+
+
+def _is_trackable(value: Any) -> bool:
+    return isinstance(value, (str, int, float)) and not isinstance(value, bool)
+
+
+def _coerce_like(new_value: Any, old_value: Any) -> Any:
+    """Give new_value the type old_value had (IDs are often "12" vs 12)."""
+    if isinstance(old_value, str):
+        return str(new_value)
+    if isinstance(old_value, int):
+        try:
+            return int(new_value)
+        except (ValueError, TypeError):
+            return new_value
+    return new_value
+
+
+class ProvenanceTracker:
+    """
+    Forward-pass engine over a task's actions.
+
+    remap:    (field, str(old_value)) -> (new_value, action_index, path) for
+              IDs a creating action returned differently on re-run, with
+              the output path that produced them. Each argument is one lookup.
+    by_value: str(old_value) -> fields with a remap for it, for keys that
+              name no field (see _names_no_field).
+    aliases:  {key: canonical field}, see field_aliases().
+    """
+
+    def __init__(self, aliases: Optional[Dict[str, str]] = None):
+        self.aliases = FIELD_ALIASES if aliases is None else aliases
+        self.remap: Dict[Tuple[str, str], Tuple[Any, int, Tuple]] = {}
+        self.by_value: Dict[str, Set[str]] = {}
+
+    def rewrite_arguments(self, arguments: Dict[str, Any], action_name: Optional[str] = None) -> List[str]:
+        """
+        Replace, in place, every ID-like argument whose value came from an
+        earlier created output that changed. Returns modification messages.
+        """
+        modifications = []
+        if self.remap and isinstance(arguments, dict):
+            self._rewrite(arguments, ("arguments",), modifications, entity_of(action_name))
+        return modifications
+
+    def _lookup(self, field: str, value: Any) -> Optional[Tuple[Any, int, Tuple]]:
+        hit = self.remap.get((field, str(value)))
+        if hit is None and _names_no_field(field):
+            # Match on the value alone when that is unambiguous
+            fields = self.by_value.get(str(value), ())
+            if len(fields) == 1:
+                hit = self.remap[(next(iter(fields)), str(value))]
+        return hit
+
+    def _rewrite(self, container, path, modifications, entity, field=None):
+        items = container.items() if isinstance(container, dict) else enumerate(container)
+        for key, value in list(items):
+            if isinstance(container, dict):
+                field = field_of(key, entity, self.aliases) if is_identifier_key(key) else None
+            if isinstance(value, (dict, list)):
+                self._rewrite(value, path + (key,), modifications, entity, field)
+            elif field and _is_trackable(value):
+                hit = self._lookup(field, value)
+                if hit is None:
+                    continue
+                new_value, source_idx, source_path = hit
+                new_value = _coerce_like(new_value, value)
+                if new_value == value:
+                    continue
+                container[key] = new_value
+                modifications.append(
+                    f"  Rewrote {_format_path(path + (key,))}: {value} -> {new_value} "
+                    f"(from action {source_idx} {_format_path(source_path)})"
+                )
+
+    def record_output(self, action_index: int, action_name: str, expected_output: Any, actual_output: Any):
+        """
+        For a creating action, register a remap for every ID-like value of
+        the recorded (expected) output that differs in the actual output at
+        the same path. Other actions' outputs are ignored.
+        """
+        if is_create_action(action_name):
+            self._record(action_index, entity_of(action_name), expected_output, actual_output, ("output",), None)
+
+    def _record(self, action_index, entity, expected, actual, path, field):
+        if isinstance(expected, dict):
+            actual_dict = actual if isinstance(actual, dict) else {}
+            for key, value in expected.items():
+                self._record(action_index, entity, value, actual_dict.get(key), path + (key,),
+                             field_of(key, entity, self.aliases) if is_identifier_key(key) else None)
+        elif isinstance(expected, list):
+            actual_list = actual if isinstance(actual, list) else []
+            for idx, value in enumerate(expected):
+                actual_item = actual_list[idx] if idx < len(actual_list) else None
+                self._record(action_index, entity, value, actual_item, path + (idx,), field)
+        elif field and _is_trackable(expected):
+            if _is_trackable(actual) and str(actual) != str(expected):
+                self.remap[(field, str(expected))] = (actual, action_index, path)
+                self.by_value.setdefault(str(expected), set()).add(field)
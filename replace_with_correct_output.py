@@ -1,16 +1,10 @@
 import os
 import json
-import glob
 import sys
 import io
 from contextlib import redirect_stdout, redirect_stderr
 from running_tasks import *
-
-def find_all_task_files(base_path="week_10"):
-    """Find all task.json files."""
-    pattern = os.path.join(base_path, "**", "task.json")
-    task_files = glob.glob(pattern, recursive=True)
-    return task_files
+from task_file_io import repair_main, write_task_json
 
 def strict_equal(obj1, obj2):
     """Check if two objects are equal."""
@@ -159,10 +153,14 @@ def update_outputs_array(outputs, value_mapping):
     
     return updated_outputs, modifications
 
-def run_single_task_and_update(task_file_path):
+def run_single_task_and_update(task_file_path, journal_dir=None, minimal_diff=True):
     """
     Run a task.json. If actual output differs from expected (and is not an error),
-    UPDATE the file in-place.
+    UPDATE the file in-place. The write is atomic, and when journal_dir is
+    given the original content is journaled so the run can be rolled back.
+    With minimal_diff only the changed values are patched into the original
+    text; a result identical to the file on disk is not written at all.
+    Returns (status, message, bytes_written)
     
     Includes logic to:
     1. Propagate 'commit_sha' from outputs to subsequent arguments
@@ -170,7 +168,8 @@ def run_single_task_and_update(task_file_path):
     """
     try:
         with open(task_file_path, 'r', encoding='utf-8') as f:
-            task_data = json.load(f)
+            original_text = f.read()
+        task_data = json.loads(original_text)
         
         environment = task_data.get("env")
         interface = task_data.get("interface_num")
@@ -181,7 +180,7 @@ def run_single_task_and_update(task_file_path):
             with redirect_stdout(f_io), redirect_stderr(f_io):
                 env_interface(environment=environment, interface=interface)
         except Exception as e:
-            return "Failed", f"Env Init Error: {str(e)}"
+            return "Failed", f"Env Init Error: {str(e)}", 0
         
         actions = task_data.get("task", {}).get("actions", [])
         file_modified = False
@@ -208,7 +207,7 @@ def run_single_task_and_update(task_file_path):
                 with redirect_stdout(f_io), redirect_stderr(f_io):
                     actual_res_container = execute_api(api_name=action_name, arguments=arguments)
             except Exception as e:
-                return "Failed", f"Action '{action_name}' raised exception: {str(e)}"
+                return "Failed", f"Action '{action_name}' raised exception: {str(e)}", 0
 
             # Extract actual result
             actual_output = actual_res_container[0] if actual_res_container and isinstance(actual_res_container, (list, tuple)) else actual_res_container
@@ -233,7 +232,7 @@ def run_single_task_and_update(task_file_path):
                 # Check if the actual result is an Error
                 if is_error_response(actual_output):
                     if not is_error_response(expected_output):
-                        return "Failed", f"Action '{action_name}' failed unexpectedly: {actual_output}"
+                        return "Failed", f"Action '{action_name}' failed unexpectedly: {actual_output}", 0
                     action["output"] = actual_output 
                     file_modified = True
 
@@ -248,7 +247,7 @@ def run_single_task_and_update(task_file_path):
                 
                 else:
                     if expected_output is not None:
-                         return "Failed", f"Action '{action_name}' returned None, expected {expected_output}"
+                         return "Failed", f"Action '{action_name}' returned None, expected {expected_output}", 0
 
         # --- 4. UPDATE OUTPUTS ARRAY BASED ON VALUE CHANGES ---
         if file_modified and global_value_mapping:
@@ -261,75 +260,19 @@ def run_single_task_and_update(task_file_path):
 
         # Save changes if any modifications happened
         if file_modified:
-            with open(task_file_path, 'w', encoding='utf-8') as f:
-                json.dump(task_data, f, indent=2)
-            return "Updated", "File updated with new outputs"
+            written = write_task_json(task_file_path, task_data, journal_dir,
+                                      original_text if minimal_diff else None)
+            if written:
+                return "Updated", "File updated with new outputs", written
             
-        return "Success", None
+        return "Success", None, 0
         
     except FileNotFoundError:
-        return "Failed", "File not found"
+        return "Failed", "File not found", 0
     except json.JSONDecodeError:
-        return "Failed", "Invalid JSON"
+        return "Failed", "Invalid JSON", 0
     except Exception as e:
-        return "Failed", f"Unexpected error: {str(e)}"
-
-def run_all_tasks(base_path="week_11_new"):
-    print("=" * 60)
-    print(f"VALIDATING AND UPDATING TASKS IN: {base_path}")
-    print("=" * 60)
-
-    task_files = find_all_task_files(base_path)
-    
-    if not task_files:
-        print("No task.json files found.")
-        return
-    
-    print(f"Found {len(task_files)} files.\n")
-    
-    stats = {"Success": 0, "Updated": 0, "Failed": 0}
-    failures = []
-    
-    for i, task_file in enumerate(task_files):
-        print(f"[{i+1}/{len(task_files)}] {task_file} ...", end="", flush=True)
-        
-        status, msg = run_single_task_and_update(task_file)
-        
-        stats[status] += 1
-        
-        if status == "Updated":
-            print(f" -> UPDATED")
-        elif status == "Success":
-            print(f" -> OK")
-        else:
-            print(f" -> FAILED")
-            failures.append({"file": task_file, "error": msg})
-    
-    # Summary
-    print("\n" + "=" * 60)
-    print("EXECUTION SUMMARY")
-    print("=" * 60)
-    print(f"Total:     {len(task_files)}")
-    print(f"Success:   {stats['Success']}")
-    print(f"Updated:   {stats['Updated']}")
-    print(f"Failed:    {stats['Failed']}")
-    
-    if failures:
-        print("\n" + "=" * 60)
-        print("FAILURE DETAILS")
-        print("=" * 60)
-        for fail in failures:
-            print(f"File:  {fail['file']}")
-            print(f"Error: {fail['error']}")
-            print("-" * 40)
-            
-        with open("task_update_errors.log", "w") as f:
-            for fail in failures:
-                f.write(f"File: {fail['file']}\nError: {fail['error']}\n\n")
-        print("\nDetailed errors written to task_update_errors.log")
+        return "Failed", f"Unexpected error: {str(e)}", 0
 
 if __name__ == "__main__":
-    folder = "hr_admin_2"
-    if len(sys.argv) > 1:
-        folder = sys.argv[1]
-    run_all_tasks(folder)
\ No newline at end of file
+    repair_main(run_single_task_and_update)
@@ -1,16 +1,14 @@
 import os
 import json
-import glob
 import sys
 import io
 from contextlib import redirect_stdout, redirect_stderr
 from running_tasks import *
+from task_file_io import repair_main, write_task_json
+from output_provenance import ProvenanceTracker, field_aliases
 
-def find_all_task_files(base_path="week_10"):
-    """Find all task.json files."""
-    pattern = os.path.join(base_path, "**", "task.json")
-    task_files = glob.glob(pattern, recursive=True)
-    return task_files
+# Foreign-key aliases for created-ID propagation (reporter_id -> user_id, ...)
+PROVENANCE_ALIASES = field_aliases(os.path.join(os.path.dirname(os.path.abspath(__file__)), "domain_context", "schema.txt"))
 
 def strict_equal(obj1, obj2):
     """Check if two objects are equal."""
@@ -179,16 +177,36 @@ def deep_compare_and_track(old_data, new_data, path="", changes=None):
     
     return changes
 
+def index_value_mapping(value_mapping):
+    """
+    Build a numeric lookup table for value_mapping.
+    Keys are the normalized float form of every numeric mapping key, so
+    "200", 200 and 200.0 all land on the same entry. The first key (in
+    insertion order) wins, which matches the old linear scan.
+    Returns dict: {normalized_number: (original_key, new_value)}
+    """
+    numeric_index = {}
+    for map_key, map_val in value_mapping.items():
+        if map_val is None:
+            continue
+        norm_key, _ = normalize_numeric_value(map_key)
+        if isinstance(norm_key, (int, float)) and norm_key not in numeric_index:
+            numeric_index[norm_key] = (map_key, map_val)
+    return numeric_index
+
 def update_outputs_array(outputs, value_mapping):
     """
     Update the outputs array based on value_mapping.
     Handles both string and typed values, including numeric conversions.
     "200" matches with 200.0, "120" matches with 120.0, etc.
+    All three lookups are dict hits, so the pass is linear in len(outputs).
     Returns (updated_outputs, modifications_made)
     """
     if not outputs or not value_mapping:
         return outputs, []
     
+    numeric_index = index_value_mapping(value_mapping)
+    
     updated_outputs = []
     modifications = []
     
@@ -209,22 +227,13 @@ def update_outputs_array(outputs, value_mapping):
             found_replacement = True
             modifications.append(f"  Updated outputs[{idx}]: {output_val} -> {new_val} (string match)")
         
-        # Strategy 3: Numeric equivalence match
-        # Check if output_val is numerically equivalent to any key in value_mapping
+        # Strategy 3: Numeric equivalence match via the normalized index
         else:
             norm_output, output_type = normalize_numeric_value(output_val)
-            if isinstance(norm_output, (int, float)):
-                for map_key, map_val in value_mapping.items():
-                    if map_val is None:
-                        continue
-                    norm_key, _ = normalize_numeric_value(map_key)
-                    if isinstance(norm_key, (int, float)):
-                        # Check numeric equivalence
-                        if abs(float(norm_output) - float(norm_key)) < 1e-9:
-                            new_val = map_val
-                            found_replacement = True
-                            modifications.append(f"  Updated outputs[{idx}]: {output_val} -> {new_val} (numeric match: {map_key})")
-                            break
+            if isinstance(norm_output, (int, float)) and norm_output in numeric_index:
+                map_key, new_val = numeric_index[norm_output]
+                found_replacement = True
+                modifications.append(f"  Updated outputs[{idx}]: {output_val} -> {new_val} (numeric match: {map_key})")
         
         if found_replacement and new_val is not None:
             # Try to preserve the original type of the output value
@@ -247,18 +256,24 @@ def update_outputs_array(outputs, value_mapping):
     
     return updated_outputs, modifications
 
-def run_single_task_and_update(task_file_path):
+def run_single_task_and_update(task_file_path, journal_dir=None, minimal_diff=True):
     """
     Run a task.json. If actual output differs from expected (and is not an error),
-    UPDATE the file in-place.
+    UPDATE the file in-place. The write is atomic, and when journal_dir is
+    given the original content is journaled so the run can be rolled back.
+    With minimal_diff only the changed values are patched into the original
+    text; a result identical to the file on disk is not written at all.
+    Returns (status, message, bytes_written)
     
     Includes logic to:
-    1. Propagate 'commit_sha' from outputs to subsequent arguments
+    1. Propagate created IDs (commit_sha, issue_id, pull_request_id, ...) whose
+       value changed on re-run into the arguments of later actions
     2. Track value changes in outputs and update the outputs array accordingly
     """
     try:
         with open(task_file_path, 'r', encoding='utf-8') as f:
-            task_data = json.load(f)
+            original_text = f.read()
+        task_data = json.loads(original_text)
         
         environment = task_data.get("env")
         interface = task_data.get("interface_num")
@@ -269,13 +284,14 @@ def run_single_task_and_update(task_file_path):
             with redirect_stdout(f_io), redirect_stderr(f_io):
                 env_interface(environment=environment, interface=interface)
         except Exception as e:
-            return "Failed", f"Env Init Error: {str(e)}"
+            return "Failed", f"Env Init Error: {str(e)}", 0
         
         actions = task_data.get("task", {}).get("actions", [])
         file_modified = False
         
         # --- STATE VARIABLES ---
-        last_observed_commit_sha = None
+        provenance = ProvenanceTracker(PROVENANCE_ALIASES)
+        modifications = []
         # Track all value changes across all actions
         global_value_mapping = {}
 
@@ -284,11 +300,12 @@ def run_single_task_and_update(task_file_path):
             arguments = action.get("arguments", {})
             expected_output = action.get("output", None)
             
-            # --- 1. DYNAMIC ARGUMENT REPLACEMENT (commit_sha) ---
-            if last_observed_commit_sha:
-                for arg_key in list(arguments.keys()):
-                    if "sha" in arg_key.lower():
-                        arguments[arg_key] = last_observed_commit_sha
+            # --- 1. DYNAMIC ARGUMENT REPLACEMENT (created IDs) ---
+            argument_modifications = provenance.rewrite_arguments(arguments, action_name)
+            if argument_modifications:
+                modifications.append(f"actions[{i}] {action_name}:")
+                modifications.extend(argument_modifications)
+                file_modified = True
 
             # Execute API (Silently)
             actual_res_container = None
@@ -296,24 +313,14 @@ def run_single_task_and_update(task_file_path):
                 with redirect_stdout(f_io), redirect_stderr(f_io):
                     actual_res_container = execute_api(api_name=action_name, arguments=arguments)
             except Exception as e:
-                return "Failed", f"Action '{action_name}' raised exception: {str(e)}"
+                return "Failed", f"Action '{action_name}' raised exception: {str(e)}", 0
 
             # Extract actual result
             actual_output = actual_res_container[0] if actual_res_container and isinstance(actual_res_container, (list, tuple)) else actual_res_container
 
-            # --- 2. CAPTURE COMMIT_SHA FROM OUTPUT ---
-            def find_sha_recursive(data):
-                if isinstance(data, dict):
-                    if "commit_sha" in data and isinstance(data["commit_sha"], str):
-                        return data["commit_sha"]
-                    for value in data.values():
-                        found = find_sha_recursive(value)
-                        if found: return found
-                return None
-
-            found_sha = find_sha_recursive(actual_output)
-            if found_sha:
-                last_observed_commit_sha = found_sha
+            # --- 2. RECORD OUTPUT PROVENANCE ---
+            if not is_error_response(actual_output):
+                provenance.record_output(i, action_name, expected_output, actual_output)
 
             # --- 3. VALIDATION & UPDATE LOGIC ---
             if not strict_equal(actual_output, expected_output):
@@ -321,7 +328,7 @@ def run_single_task_and_update(task_file_path):
                 # Check if the actual result is an Error
                 if is_error_response(actual_output):
                     if not is_error_response(expected_output):
-                        return "Failed", f"Action '{action_name}' failed unexpectedly: {actual_output}"
+                        return "Failed", f"Action '{action_name}' failed unexpectedly: {actual_output}", 0
                     action["output"] = actual_output 
                     file_modified = True
 
@@ -336,7 +343,7 @@ def run_single_task_and_update(task_file_path):
                 
                 else:
                     if expected_output is not None:
-                         return "Failed", f"Action '{action_name}' returned None, expected {expected_output}"
+                         return "Failed", f"Action '{action_name}' returned None, expected {expected_output}", 0
 
         # --- 4. UPDATE OUTPUTS ARRAY BASED ON VALUE CHANGES ---
         if file_modified and global_value_mapping:
@@ -345,79 +352,25 @@ def run_single_task_and_update(task_file_path):
                 updated_outputs, output_modifications = update_outputs_array(outputs, global_value_mapping)
                 if output_modifications:
                     task_data["task"]["outputs"] = updated_outputs
+                    modifications.append("outputs:")
+                    modifications.extend(output_modifications)
                     # Note: file_modified is already True, so we'll save anyway
 
         # Save changes if any modifications happened
         if file_modified:
-            with open(task_file_path, 'w', encoding='utf-8') as f:
-                json.dump(task_data, f, indent=2)
-            return "Updated", "File updated with new outputs"
+            written = write_task_json(task_file_path, task_data, journal_dir,
+                                      original_text if minimal_diff else None)
+            if written:
+                return "Updated", "\n".join(["File updated with new outputs"] + modifications), written
             
-        return "Success", None
+        return "Success", None, 0
         
     except FileNotFoundError:
-        return "Failed", "File not found"
+        return "Failed", "File not found", 0
     except json.JSONDecodeError:
-        return "Failed", "Invalid JSON"
+        return "Failed", "Invalid JSON", 0
     except Exception as e:
-        return "Failed", f"Unexpected error: {str(e)}"
-
-def run_all_tasks(base_path="week_11_new"):
-    print("=" * 60)
-    print(f"VALIDATING AND UPDATING TASKS IN: {base_path}")
-    print("=" * 60)
-
-    task_files = find_all_task_files(base_path)
-    
-    if not task_files:
-        print("No task.json files found.")
-        return
-    
-    print(f"Found {len(task_files)} files.\n")
-    
-    stats = {"Success": 0, "Updated": 0, "Failed": 0}
-    failures = []
-    
-    for i, task_file in enumerate(task_files):
-        print(f"[{i+1}/{len(task_files)}] {task_file} ...", end="", flush=True)
-        
-        status, msg = run_single_task_and_update(task_file)
-        
-        stats[status] += 1
-        
-        if status == "Updated":
-            print(f" -> UPDATED")
-        elif status == "Success":
-            print(f" -> OK")
-        else:
-            print(f" -> FAILED")
-            failures.append({"file": task_file, "error": msg})
-    
-    # Summary
-    print("\n" + "=" * 60)
-    print("EXECUTION SUMMARY")
-    print("=" * 60)
-    print(f"Total:     {len(task_files)}")
-    print(f"Success:   {stats['Success']}")
-    print(f"Updated:   {stats['Updated']}")
-    print(f"Failed:    {stats['Failed']}")
-    
-    if failures:
-        print("\n" + "=" * 60)
-        print("FAILURE DETAILS")
-        print("=" * 60)
-        for fail in failures:
-            print(f"File:  {fail['file']}")
-            print(f"Error: {fail['error']}")
-            print("-" * 40)
-            
-        with open("task_update_errors.log", "w") as f:
-            for fail in failures:
-                f.write(f"File: {fail['file']}\nError: {fail['error']}\n\n")
-        print("\nDetailed errors written to task_update_errors.log")
+        return "Failed", f"Unexpected error: {str(e)}", 0
 
 if __name__ == "__main__":
-    folder = "hr_admin_2"
-    if len(sys.argv) > 1:
-        folder = sys.argv[1]
-    run_all_tasks(folder)
\ No newline at end of file
+    repair_main(run_single_task_and_update)
@@ -1,8 +1,14 @@
 import json
 import os
-import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, Any, List
 
+from id_offsets import load_offsets_artifact, offsets_from_artifact
+from id_shift_engine import IdShiftEngine
+from id_shift_ledger import IdShiftLedger, reshift_tree, reverse_tree
+from task_file_io import link_or_copy, render_task_json, write_if_changed
+
 # 1. CONFIGURATION
 # ----------------
 INPUT_ROOT_DIRECTORY = "batch_Batch_version_control_system_20260108_195536"
@@ -137,10 +143,19 @@ workflows.json,320,338,18,Found in both
 workspace_members.json,179,179,0,Found in both
 workspaces.json,32,32,0,Found in both"""
 
+# A generated offsets artifact (see id_offsets.py) replaces the embedded
+# tables above; they are only the fallback when none exists. The artifact's
+# mapping is used alone, so stale hand-kept fields never drive a shift.
+ID_OFFSETS_ARTIFACT = load_offsets_artifact()
+if ID_OFFSETS_ARTIFACT:
+    ID_FIELD_TO_TABLE_MAPPING = ID_OFFSETS_ARTIFACT['field_to_table']
+
 # 2. HELPER FUNCTIONS
 # -------------------
 
 def parse_offsets_data() -> Dict[str, Dict[str, int]]:
+    if ID_OFFSETS_ARTIFACT:
+        return offsets_from_artifact(ID_OFFSETS_ARTIFACT)
     offsets = {}
     lines = OFFSETS_DATA.strip().split('\n')
     for line in lines[1:]:
@@ -152,105 +167,60 @@ def parse_offsets_data() -> Dict[str, Dict[str, int]]:
         }
     return offsets
 
-def should_adjust_id(value: Any, folder1_records: int) -> bool:
-    if value is None: return False
-    try:
-        return int(value) > folder1_records
-    except (ValueError, TypeError):
-        return False
+def build_engine(offsets: Dict[str, Dict[str, int]] = None) -> IdShiftEngine:
+    """
+    ID-shift engine for result.json files. Tool outputs in trajectories are
+    JSON-encoded strings (like 'content'), so those are decoded and shifted too.
+    """
+    if offsets is None:
+        offsets = parse_offsets_data()
+    return IdShiftEngine(ID_FIELD_TO_TABLE_MAPPING, offsets, decode_embedded_json=True)
 
-def adjust_id_value(value: Any, offset: int) -> Any:
-    if isinstance(value, str):
-        try:
-            return str(int(value) + offset)
-        except ValueError:
-            return value
-    elif isinstance(value, int):
-        return value + offset
-    return value
+# 3. MAIN PROCESSING LOGIC
+# ------------------------
 
-def adjust_single_field(value: Any, field_name: str, all_offsets: Dict, 
-                        count_container: List[int], context: Dict = None) -> Any:
-    if value is None: return value
-    if field_name not in ID_FIELD_TO_TABLE_MAPPING: return value
-    
-    table_file = ID_FIELD_TO_TABLE_MAPPING[field_name]
-    
-    # Handle Polymorphic Context
-    if table_file is None:
-        if not context: return value
-        
-        if field_name == 'owner_id':
-            otype = context.get('owner_type')
-            table_file = 'organizations.json' if otype == 'organization' else 'users.json'
-        elif field_name == 'commentable_id':
-            ctype = context.get('commentable_type')
-            if ctype == 'issue': table_file = 'issues.json'
-            elif ctype == 'pull_request': table_file = 'pull_requests.json'
-        elif field_name == 'reference_id':
-            rtype = context.get('reference_type')
-            if rtype == 'issue': table_file = 'issues.json'
-            elif rtype == 'pull_request': table_file = 'pull_requests.json'
-            elif rtype == 'commit': table_file = 'commits.json'
-            elif rtype == 'release': table_file = 'releases.json'
-    
-    if not table_file or table_file not in all_offsets: return value
-    
-    info = all_offsets[table_file]
-    if info['offset'] != 0 and should_adjust_id(value, info['folder1_records']):
-        count_container[0] += 1
-        return adjust_id_value(value, info['offset'])
-    
-    return value
+_worker_engine = None
+
+def _init_worker():
+    """Give every pool process its own engine (and plan cache)."""
+    global _worker_engine
+    _worker_engine = build_engine()
 
-def recursive_adjust(data: Any, offsets: Dict[str, Dict[str, int]], 
-                     count_container: List[int]) -> Any:
+def process_result_file(input_file: str, output_file: str, engine: IdShiftEngine = None) -> tuple:
     """
-    Recursively walks through JSON.
-    **NEW:** Detects strings that are actually JSON objects (like 'content') 
-    and recurses into them.
+    Shift one result.json into the mirror tree. Only the shifted values are
+    patched into the original text and the output is written atomically; a
+    file with no IDs to shift is linked instead of rewritten.
+    Returns (input_file, ids_adjusted, error or None, changes)
     """
-    if isinstance(data, dict):
-        new_dict = {}
-        for key, value in data.items():
-            # 1. Handle regular Dicts/Lists
-            if isinstance(value, (dict, list)):
-                new_dict[key] = recursive_adjust(value, offsets, count_container)
-            
-            # 2. Handle Strings (Potential JSON)
-            elif isinstance(value, str):
-                # Try to parse string as JSON
-                try:
-                    parsed = json.loads(value)
-                    if isinstance(parsed, (dict, list)):
-                        # It IS a JSON string! Recurse into it.
-                        adjusted_parsed = recursive_adjust(parsed, offsets, count_container)
-                        # Re-serialize back to string
-                        new_dict[key] = json.dumps(adjusted_parsed)
-                    else:
-                        # It's a string, but not a complex object. Treat as field.
-                        new_dict[key] = adjust_single_field(value, key, offsets, count_container, context=data)
-                except (json.JSONDecodeError, TypeError):
-                    # Not JSON, process as standard field
-                    new_dict[key] = adjust_single_field(value, key, offsets, count_container, context=data)
-            
-            # 3. Handle Primitives (Ints, etc)
-            else:
-                new_dict[key] = adjust_single_field(value, key, offsets, count_container, context=data)
+    engine = engine or _worker_engine
+    try:
+        with open(input_file, 'r', encoding='utf-8') as f:
+            original_text = f.read()
+        data = json.loads(original_text)
         
-        return new_dict
-
-    elif isinstance(data, list):
-        return [recursive_adjust(item, offsets, count_container) for item in data]
-    
-    else:
-        return data
-
-# 3. MAIN PROCESSING LOGIC
-# ------------------------
+        engine.reset()
+        processed_data = engine.shift(data)
+        
+        if engine.changes:
+            write_if_changed(output_file, render_task_json(processed_data, original_text))
+        else:
+            link_or_copy(input_file, output_file)
+        return input_file, len(engine.changes), None, engine.changes
+    except Exception as e:
+        return input_file, 0, str(e), []
 
-def process_and_copy(input_root: str, output_root: str):
-    offsets = parse_offsets_data()
+def process_and_copy(input_root: str, output_root: str, workers: int = None):
+    """
+    Mirror input_root into output_root, shifting IDs in every result.json.
+    result.json files are streamed through a pool of worker processes
+    (workers=1 runs serially); other files are reflinked/hard-linked.
+    Every change is recorded in output_root/id_shift_ledger.json.
+    """
+    workers = workers or os.cpu_count() or 1
+    ledger = IdShiftLedger(output_root, "result.json", ID_FIELD_TO_TABLE_MAPPING, decode_embedded_json=True)
+    ledger.offsets = {table: info for table, info in parse_offsets_data().items() if info['offset'] != 0}
+    ledger.offsets_version = ID_OFFSETS_ARTIFACT['version'] if ID_OFFSETS_ARTIFACT else None
     files_processed = 0
     total_modifications = 0
 
@@ -261,46 +231,85 @@ def process_and_copy(input_root: str, output_root: str):
     print(f"Scanning: {input_root}")
     print(f"Output to: {output_root}\n")
 
+    jobs = []
     for dirpath, _, filenames in os.walk(input_root):
         rel_path = os.path.relpath(dirpath, input_root)
         target_dir = os.path.join(output_root, rel_path)
-        
-        if not os.path.exists(target_dir):
-            os.makedirs(target_dir)
+        os.makedirs(target_dir, exist_ok=True)
 
         if 'result.json' in filenames:
-            input_file = os.path.join(dirpath, 'result.json')
-            output_file = os.path.join(target_dir, 'result.json')
-            
-            try:
-                with open(input_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                mod_count_container = [0]
-                processed_data = recursive_adjust(data, offsets, mod_count_container)
-                
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump(processed_data, f, indent=2)
-                
-                files_processed += 1
-                total_modifications += mod_count_container[0]
-                print(f"Processed: {input_file} -> {mod_count_container[0]} IDs adjusted")
-                
-            except Exception as e:
-                print(f"Failed to process {input_file}: {e}")
+            jobs.append((os.path.join(dirpath, 'result.json'), os.path.join(target_dir, 'result.json')))
         
-        # Copy other files (task.json, etc.)
+        # Mirror other files (task.json, etc.)
         for filename in filenames:
             if filename != 'result.json':
                 src = os.path.join(dirpath, filename)
                 dst = os.path.join(target_dir, filename)
                 if not os.path.exists(dst):
-                    shutil.copy2(src, dst)
+                    link_or_copy(src, dst)
+
+    if workers == 1:
+        engine = build_engine()
+        results = (process_result_file(src, dst, engine) for src, dst in jobs)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        results = executor.map(process_result_file, [src for src, _ in jobs],
+                               [dst for _, dst in jobs], chunksize=4)
+
+    for input_file, count, error, changes in results:
+        if error:
+            print(f"Failed to process {input_file}: {error}")
+            continue
+        ledger.record(os.path.relpath(input_file, input_root), changes)
+        files_processed += 1
+        total_modifications += count
+        print(f"Processed: {input_file} -> {count} IDs adjusted")
+
+    if executor is not None:
+        executor.shutdown()
+    ledger.save()
 
     print("-" * 40)
     print(f"Complete.")
     print(f"Files Processed: {files_processed}")
     print(f"Total IDs Modified: {total_modifications}")
+    print(f"ID shift ledger: {ledger.path}")
+
+def reverse_shift(output_root: str):
+    """Put the original IDs back into a shifted output folder, using its ledger."""
+    files, values = reverse_tree(output_root)
+    print(f"Reversed {values} ID changes in {files} result files under {output_root}")
+
+def _shift_loaded_result(data: Any, engine: IdShiftEngine) -> Any:
+    return engine.shift(data)
+
+def reshift(output_root: str, version: int):
+    """Move a shifted output folder to another offsets artifact version in place."""
+    artifact = load_offsets_artifact(version=version)
+    if artifact is None:
+        print("No offsets artifact found.")
+        return
+    field_to_table = artifact['field_to_table']
+    offsets = {table: info for table, info in offsets_from_artifact(artifact).items() if info['offset'] != 0}
+    stats = reshift_tree(output_root, offsets, artifact['version'], field_to_table, _shift_loaded_result)
+    print(f"Re-shifted {output_root} to offsets v{artifact['version']:04d} ({stats['mode']}): "
+          f"{stats['values']} IDs in {stats['files']} files, {stats['bytes_written']} bytes written")
 
 if __name__ == "__main__":
-    process_and_copy(INPUT_ROOT_DIRECTORY, OUTPUT_ROOT_DIRECTORY)
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input", nargs="?", default=INPUT_ROOT_DIRECTORY)
+    parser.add_argument("output", nargs="?", default=OUTPUT_ROOT_DIRECTORY)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--reverse", action="store_true",
+                        help="undo the shift recorded in the output folder's ledger")
+    parser.add_argument("--reshift-to", type=int, metavar="VERSION", default=None,
+                        help="move the output folder to this offsets artifact version")
+    args = parser.parse_args()
+
+    if args.reverse:
+        reverse_shift(args.output)
+    elif args.reshift_to is not None:
+        reshift(args.output, args.reshift_to)
+    else:
+        process_and_copy(args.input, args.output, workers=args.workers)
\ No newline at end of file
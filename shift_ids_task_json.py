@@ -1,11 +1,15 @@
 import os
 import json
 import glob
-import shutil
-import copy
-from pathlib import Path
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, Any, List, Set
 
+from id_offsets import load_offsets_artifact, offsets_from_artifact
+from id_shift_engine import IdShiftEngine
+from id_shift_ledger import IdShiftLedger, reshift_tree, reverse_tree
+from task_file_io import link_or_copy, render_task_json, write_if_changed
+
 # Define ID field mappings based on schema
 # Format: 'field_name': 'source_table.json' (the table this ID references)
 # Includes both full names and common API parameter aliases
@@ -141,8 +145,21 @@ workflows.json,320,338,18,Found in both
 workspace_members.json,179,179,0,Found in both
 workspaces.json,32,32,0,Found in both"""
 
+# A generated offsets artifact (see id_offsets.py) replaces the embedded
+# tables above; they are only the fallback when none exists. The artifact's
+# mapping is used alone, so stale hand-kept fields never drive a shift.
+ID_OFFSETS_ARTIFACT = load_offsets_artifact()
+if ID_OFFSETS_ARTIFACT:
+    ID_FIELD_TO_TABLE_MAPPING = ID_OFFSETS_ARTIFACT['field_to_table']
+
 def parse_offsets_data() -> Dict[str, Dict[str, int]]:
-    """Parse the CSV offset data into a dictionary."""
+    """
+    Parse the offset data into a dictionary.
+    Uses the latest offsets artifact when present (folder1_records is then
+    the artifact's threshold), otherwise the embedded CSV.
+    """
+    if ID_OFFSETS_ARTIFACT:
+        return offsets_from_artifact(ID_OFFSETS_ARTIFACT)
     offsets = {}
     lines = OFFSETS_DATA.strip().split('\n')[1:]  # Skip header
     for line in lines:
@@ -156,266 +173,78 @@ def parse_offsets_data() -> Dict[str, Dict[str, int]]:
         }
     return offsets
 
-def should_adjust_id(value: Any, folder1_records: int) -> bool:
-    """Check if an ID value should be adjusted based on the criteria."""
-    if not isinstance(value, (int, str)):
-        return False
-    
-    try:
-        numeric_value = int(value)
-        # Adjust if ID is greater than the original record count
-        # This handles auto-generated IDs from the database
-        return numeric_value > folder1_records
-    except (ValueError, TypeError):
-        return False
+def build_engine(offsets: Dict[str, Dict[str, int]] = None) -> IdShiftEngine:
+    """ID-shift engine for task.json files (no embedded JSON strings)."""
+    if offsets is None:
+        offsets = parse_offsets_data()
+    return IdShiftEngine(ID_FIELD_TO_TABLE_MAPPING, offsets)
 
-def adjust_id_value(value: Any, offset: int) -> Any:
-    """Adjust an ID value by the offset, maintaining the original type."""
-    if isinstance(value, str):
-        try:
-            numeric_value = int(value)
-            return str(numeric_value + offset)
-        except ValueError:
-            return value
-    elif isinstance(value, int):
-        return value + offset
-    return value
+def find_all_task_files(base_path: str) -> List[str]:
+    """Find all task.json files in the directory structure."""
+    pattern = os.path.join(base_path, "**", "task.json")
+    return glob.glob(pattern, recursive=True)
 
-def adjust_single_field(value: Any, field_name: str, all_offsets: Dict, modifications: List[str], 
-                        id_mapping: Dict[str, str], context: Dict = None) -> Any:
+def shift_task_data(task_data: Dict[str, Any], engine: IdShiftEngine) -> List[str]:
     """
-    Adjust a single field value based on which table it references.
-    Uses ID_FIELD_TO_TABLE_MAPPING to determine the correct table.
-    For polymorphic fields like owner_id or entity_id, uses context to determine the target table.
-    Records all ID changes in id_mapping for later use with outputs array.
+    Shift IDs in a loaded task (in place) with the shared engine.
+    Action arguments and outputs are shifted with the shared engine's
+    cached plans; the outputs array follows the IDs changed there.
+    Returns the modification messages, grouped per action.
     """
-    if value is None:
-        return value
-    
-    # Convert to string for consistent mapping
-    original_str_value = str(value)
-    
-    # Check if this field has a known table mapping
-    if field_name not in ID_FIELD_TO_TABLE_MAPPING:
-        return value
-    
-    table_file = ID_FIELD_TO_TABLE_MAPPING[field_name]
-    
-    # Handle context-dependent polymorphic fields
-    if table_file is None:
-        if not context:
-            return value  # No context to resolve polymorphism
-            
-        # Resolve owner_id based on owner_type
-        if field_name == 'owner_id' and 'owner_type' in context:
-            owner_type = context['owner_type']
-            if owner_type == 'user':
-                table_file = 'users.json'
-            elif owner_type == 'organization':
-                table_file = 'organizations.json'
-            else:
-                table_file = 'users.json'
-        
-        # Resolve commentable_id based on commentable_type
-        elif field_name == 'commentable_id' and 'commentable_type' in context:
-            commentable_type = context['commentable_type']
-            if commentable_type == 'issue':
-                table_file = 'issues.json'
-            elif commentable_type == 'pull_request':
-                table_file = 'pull_requests.json'
-            else:
-                return value  # Unknown commentable_type, skip
-        
-        # Resolve reference_id based on reference_type
-        elif field_name == 'reference_id' and 'reference_type' in context:
-            reference_type = context['reference_type']
-            if reference_type == 'issue':
-                table_file = 'issues.json'
-            elif reference_type == 'pull_request':
-                table_file = 'pull_requests.json'
-            elif reference_type == 'commit':
-                table_file = 'commits.json'
-            elif reference_type == 'release':
-                table_file = 'releases.json'
-            else:
-                return value  # Unknown reference_type, skip
-
-        # ------------------------------------------------------------------
-        # NEW LOGIC: Resolve entity_id based on entity_type
-        # ------------------------------------------------------------------
-        elif field_name == 'entity_id' and 'entity_type' in context:
-            entity_type = context['entity_type']
-            # Map the entity_type string to the correct JSON file
-            if entity_type == 'label':
-                table_file = 'labels.json'
-            elif entity_type == 'issue':
-                table_file = 'issues.json'
-            elif entity_type == 'pull_request':
-                table_file = 'pull_requests.json'
-            elif entity_type == 'repository':
-                table_file = 'repositories.json'
-            elif entity_type == 'user':
-                table_file = 'users.json'
-            elif entity_type == 'commit':
-                table_file = 'commits.json'
-            elif entity_type == 'organization':
-                table_file = 'organizations.json'
-            elif entity_type == 'project':
-                table_file = 'projects.json'
-            elif entity_type == 'workspace':
-                table_file = 'workspaces.json'
-            elif entity_type == 'file':
-                table_file = 'files.json'
-            elif entity_type == 'branch':
-                table_file = 'branches.json'
-            elif entity_type == 'code_review':
-                table_file = 'code_reviews.json'
-            elif entity_type == 'comment':
-                table_file = 'comments.json'
-            elif entity_type == 'release':
-                table_file = 'releases.json'
-            elif entity_type == 'star':
-                table_file = 'stars.json'
-            elif entity_type == 'access_token':
-                table_file = 'access_tokens.json'
-                
-            else:
-                # If we encounter an unknown entity_type, we skip adjustment 
-                # to avoid corrupting data we don't understand.
-                return value
-        # ------------------------------------------------------------------
-        
-        else:
-            return value  # Polymorphic field without resolvable context
-    
-    # Check if we have offset data for this table
-    if table_file not in all_offsets:
-        return value
+    all_modifications = []
     
-    offset_info = all_offsets[table_file]
-    folder1_records = offset_info['folder1_records']
-    offset = offset_info['offset']
-    
-    if offset == 0:
-        return value
-    
-    if should_adjust_id(value, folder1_records):
-        old_value = value
-        new_value = adjust_id_value(value, offset)
-        modifications.append(f"  Adjusted {field_name}: {old_value} -> {new_value} (using {table_file})")
+    # Process actions
+    actions = task_data.get("task", {}).get("actions", [])
+    for action_idx, action in enumerate(actions):
+        action_name = action.get("name", "")
+        before = len(engine.modifications)
         
-        # Record the mapping for outputs array adjustment
-        id_mapping[original_str_value] = str(new_value)
+        # Adjust IDs in arguments and output
+        for field in ('arguments', 'output'):
+            if field in action:
+                action[field] = engine.shift(
+                    action[field], path=('task', 'actions', action_idx, field)
+                )
         
-        return new_value
-    
-    return value
-
-def adjust_ids_in_dict(data: Dict[str, Any], all_offsets: Dict, modifications: List[str], 
-                      id_mapping: Dict[str, str]) -> Dict[str, Any]:
-    """
-    Recursively adjust IDs in a dictionary based on ALL table offsets.
-    Each field is only adjusted once based on its primary table.
-    Handles context-dependent polymorphic fields like owner_id.
-    Records all ID changes in id_mapping.
-    """
-    adjusted_data = {}
-    
-    for key, value in data.items():
-        if isinstance(value, dict):
-            adjusted_data[key] = adjust_ids_in_dict(value, all_offsets, modifications, id_mapping)
-        elif isinstance(value, list):
-            adjusted_data[key] = [
-                adjust_ids_in_dict(item, all_offsets, modifications, id_mapping)
-                if isinstance(item, dict) else item
-                for item in value
-            ]
-        else:
-            # Try to adjust this field, passing the current dict as context
-            adjusted_data[key] = adjust_single_field(value, key, all_offsets, modifications, 
-                                                     id_mapping, context=data)
-    
-    return adjusted_data
-
-def adjust_outputs_array(outputs: List[str], id_mapping: Dict[str, str], modifications: List[str]) -> List[str]:
-    """
-    Adjust IDs in the outputs array based on the id_mapping from action processing.
-    If an output ID was changed during action processing, apply the same change here.
-    """
-    adjusted_outputs = []
-    
-    for idx, value in enumerate(outputs):
-        str_value = str(value)
+        action_modifications = engine.modifications[before:]
+        if action_modifications:
+            all_modifications.append(f"Action {action_idx} ({action_name}):")
+            all_modifications.extend(action_modifications)
+    
+    # Process outputs array using the IDs changed in the actions
+    if 'task' in task_data and 'outputs' in task_data['task']:
+        before = len(engine.modifications)
+        task_data['task']['outputs'] = engine.shift_outputs(task_data['task']['outputs'])
+        outputs_modifications = engine.modifications[before:]
         
-        if str_value in id_mapping:
-            new_value = id_mapping[str_value]
-            modifications.append(f"  Adjusted outputs[{idx}]: {value} -> {new_value} (matched from actions)")
-            adjusted_outputs.append(new_value)
-        else:
-            adjusted_outputs.append(value)
+        if outputs_modifications:
+            all_modifications.append("Outputs array:")
+            all_modifications.extend(outputs_modifications)
     
-    return adjusted_outputs
+    return all_modifications
 
-def find_all_task_files(base_path: str) -> List[str]:
-    """Find all task.json files in the directory structure."""
-    pattern = os.path.join(base_path, "**", "task.json")
-    return glob.glob(pattern, recursive=True)
+def _shift_loaded_task(task_data: Dict[str, Any], engine: IdShiftEngine) -> Dict[str, Any]:
+    shift_task_data(task_data, engine)
+    return task_data
 
-def process_task_file(task_file_path: str, offsets: Dict[str, Dict[str, int]], 
-                      output_base_path: str, input_base_path: str) -> tuple:
+def process_task_file(task_file_path: str, engine: IdShiftEngine, 
+                      output_base_path: str, input_base_path: str, minimal_diff: bool = True) -> tuple:
     """
-    Process a single task.json file and adjust IDs based on offsets.
-    Returns (success: bool, modifications_count: int, error_message: str or None, modifications: list)
+    Process a single task.json file and adjust IDs with the shared engine.
+    With minimal_diff the output keeps the input's formatting and only the
+    shifted values are patched in; an output file that already holds the
+    same bytes is not rewritten.
+    Returns (success: bool, modifications_count: int, error_message: str or None,
+             modifications: list, bytes_written: int, changes: list)
     """
     try:
         # Read the task file
         with open(task_file_path, 'r', encoding='utf-8') as f:
-            task_data = json.load(f)
-        
-        all_modifications = []
-        # Track all ID mappings from old to new values
-        id_mapping = {}
-        
-        # Process actions
-        actions = task_data.get("task", {}).get("actions", [])
-        for action_idx, action in enumerate(actions):
-            action_name = action.get("name", "")
-            action_modifications = []
-            
-            # Adjust IDs in arguments
-            if 'arguments' in action:
-                action['arguments'] = adjust_ids_in_dict(
-                    action['arguments'], 
-                    offsets,
-                    action_modifications,
-                    id_mapping
-                )
-            
-            # Adjust IDs in output
-            if 'output' in action:
-                action['output'] = adjust_ids_in_dict(
-                    action['output'], 
-                    offsets,
-                    action_modifications,
-                    id_mapping
-                )
-            
-            if action_modifications:
-                all_modifications.append(f"Action {action_idx} ({action_name}):")
-                all_modifications.extend(action_modifications)
+            original_text = f.read()
+        task_data = json.loads(original_text)
         
-        # Process outputs array using the id_mapping built from actions
-        if 'task' in task_data and 'outputs' in task_data['task']:
-            outputs_modifications = []
-            task_data['task']['outputs'] = adjust_outputs_array(
-                task_data['task']['outputs'],
-                id_mapping,
-                outputs_modifications
-            )
-            
-            if outputs_modifications:
-                all_modifications.append("Outputs array:")
-                all_modifications.extend(outputs_modifications)
+        engine.reset()
+        all_modifications = shift_task_data(task_data, engine)
         
         # Create output file path with same hierarchy
         relative_path = os.path.relpath(task_file_path, input_base_path)
@@ -424,30 +253,55 @@ def process_task_file(task_file_path: str, offsets: Dict[str, Dict[str, int]],
         # Create output directory if needed
         os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
         
-        # Write adjusted task file
-        with open(output_file_path, 'w', encoding='utf-8') as f:
-            json.dump(task_data, f, indent=2)
+        # Write adjusted task file (atomically); unchanged files are linked
+        if minimal_diff and not engine.changes:
+            link_or_copy(task_file_path, output_file_path)
+            bytes_written = 0
+        else:
+            content = render_task_json(task_data, original_text if minimal_diff else None)
+            bytes_written = write_if_changed(output_file_path, content)
         
-        return True, len(all_modifications), None, all_modifications
+        return True, len(all_modifications), None, all_modifications, bytes_written, engine.changes
         
     except Exception as e:
         # Copy the original file unchanged to output folder
         try:
             relative_path = os.path.relpath(task_file_path, input_base_path)
             output_file_path = os.path.join(output_base_path, relative_path)
-            os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
-            shutil.copy2(task_file_path, output_file_path)
+            link_or_copy(task_file_path, output_file_path)
         except Exception as copy_error:
-            return False, 0, f"Processing error: {str(e)}, Copy error: {str(copy_error)}", []
+            return False, 0, f"Processing error: {str(e)}, Copy error: {str(copy_error)}", [], 0, []
         
-        return False, 0, str(e), []
+        return False, 0, str(e), [], 0, []
+
+_worker_engine = None
+
+def _init_worker():
+    """Give every pool process its own engine (and plan cache)."""
+    global _worker_engine
+    _worker_engine = build_engine()
 
-def adjust_all_tasks(input_base_path: str, output_base_path: str):
+def _process_task_file_worker(task_file_path: str, output_base_path: str, input_base_path: str,
+                              minimal_diff: bool) -> tuple:
+    return process_task_file(task_file_path, _worker_engine, output_base_path,
+                             input_base_path, minimal_diff)
+
+def adjust_all_tasks(input_base_path: str, output_base_path: str, minimal_diff: bool = True,
+                     workers: int = None):
     """
     Process all task.json files and adjust IDs based on offsets.
+    Files are streamed through a pool of worker processes (workers=1 runs
+    serially in this process); results come back in input order.
+    minimal_diff=False re-serializes whole files instead of patching spans.
+    Every change is recorded in the output's id_shift_ledger.json, so the
+    run can be reversed or moved to a newer offsets version later.
     """
     print("Parsing offset data...")
-    offsets = parse_offsets_data()
+    engine = build_engine()
+    workers = workers or os.cpu_count() or 1
+    ledger = IdShiftLedger(output_base_path, "task.json", ID_FIELD_TO_TABLE_MAPPING)
+    ledger.offsets = {table: info for table, info in parse_offsets_data().items() if info['offset'] != 0}
+    ledger.offsets_version = ID_OFFSETS_ARTIFACT['version'] if ID_OFFSETS_ARTIFACT else None
     
     print(f"Finding task files in {input_base_path}...")
     task_files = find_all_task_files(input_base_path)
@@ -465,12 +319,27 @@ def adjust_all_tasks(input_base_path: str, output_base_path: str):
     successful_tasks = []
     failed_tasks = []
     total_modifications = 0
+    total_bytes_written = 0
     
     # Process each task file
-    for idx, task_file in enumerate(task_files, 1):
-        success, mod_count, error_message, modifications = process_task_file(
-            task_file, offsets, output_base_path, input_base_path
+    if workers == 1:
+        results = (
+            process_task_file(task_file, engine, output_base_path, input_base_path, minimal_diff)
+            for task_file in task_files
+        )
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        results = executor.map(
+            _process_task_file_worker, task_files,
+            [output_base_path] * len(task_files), [input_base_path] * len(task_files),
+            [minimal_diff] * len(task_files), chunksize=8
         )
+    
+    for idx, (task_file, result) in enumerate(zip(task_files, results), 1):
+        success, mod_count, error_message, modifications, bytes_written, changes = result
+        total_bytes_written += bytes_written
+        ledger.record(os.path.relpath(task_file, input_base_path), changes)
         
         if success:
             successful_tasks.append({
@@ -488,6 +357,11 @@ def adjust_all_tasks(input_base_path: str, output_base_path: str):
         if idx % 10 == 0:
             print(f"Processed {idx}/{len(task_files)} tasks...")
     
+    if executor is not None:
+        executor.shutdown()
+    
+    ledger.save()
+    
     # Write detailed log
     log_file = os.path.join(output_base_path, "adjustment_log.txt")
     with open(log_file, 'w', encoding='utf-8') as f:
@@ -496,7 +370,8 @@ def adjust_all_tasks(input_base_path: str, output_base_path: str):
         f.write(f"Total tasks processed: {len(task_files)}\n")
         f.write(f"Successful: {len(successful_tasks)}\n")
         f.write(f"Failed: {len(failed_tasks)}\n")
-        f.write(f"Total ID adjustments: {total_modifications}\n\n")
+        f.write(f"Total ID adjustments: {total_modifications}\n")
+        f.write(f"Bytes written: {total_bytes_written}\n\n")
         
         if failed_tasks:
             f.write("FAILED TASKS:\n")
@@ -531,8 +406,10 @@ def adjust_all_tasks(input_base_path: str, output_base_path: str):
     print(f"Successful: {len(successful_tasks)}")
     print(f"Failed: {len(failed_tasks)}")
     print(f"Total ID adjustments: {total_modifications}")
+    print(f"Bytes written: {total_bytes_written}")
     print(f"\nOutput directory: {output_base_path}")
     print(f"Detailed log: {log_file}")
+    print(f"ID shift ledger: {ledger.path}")
     
     if failed_tasks:
         print(f"\nFailed tasks: {len(failed_tasks)}")
@@ -549,9 +426,40 @@ def adjust_all_tasks(input_base_path: str, output_base_path: str):
         if len(tasks_with_mods) > 5:
             print(f"  ... and {len(tasks_with_mods) - 5} more")
 
+def reverse_shift(output_base_path: str):
+    """Put the original IDs back into a shifted output folder, using its ledger."""
+    files, values = reverse_tree(output_base_path)
+    print(f"Reversed {values} ID changes in {files} task files under {output_base_path}")
+
+def reshift(output_base_path: str, version: int):
+    """Move a shifted output folder to another offsets artifact version in place."""
+    artifact = load_offsets_artifact(version=version)
+    if artifact is None:
+        print("No offsets artifact found.")
+        return
+    field_to_table = artifact['field_to_table']
+    offsets = {table: info for table, info in offsets_from_artifact(artifact).items() if info['offset'] != 0}
+    stats = reshift_tree(output_base_path, offsets, artifact['version'], field_to_table, _shift_loaded_task)
+    print(f"Re-shifted {output_base_path} to offsets v{artifact['version']:04d} ({stats['mode']}): "
+          f"{stats['values']} IDs in {stats['files']} files, {stats['bytes_written']} bytes written")
+
 if __name__ == "__main__":
-    # Example usage
-    input_folder = "batch_Batch_version_control_system_20260108_195536"
-    output_folder = "batch_Batch_version_control_system_20260108_195536_adjusted"
-    
-    adjust_all_tasks(input_folder, output_folder)
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input", nargs="?", default="batch_Batch_version_control_system_20260108_195536")
+    parser.add_argument("output", nargs="?", default="batch_Batch_version_control_system_20260108_195536_adjusted")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--full-rewrite", action="store_true",
+                        help="re-serialize whole files instead of patching changed values")
+    parser.add_argument("--reverse", action="store_true",
+                        help="undo the shift recorded in the output folder's ledger")
+    parser.add_argument("--reshift-to", type=int, metavar="VERSION", default=None,
+                        help="move the output folder to this offsets artifact version")
+    args = parser.parse_args()
+    
+    if args.reverse:
+        reverse_shift(args.output)
+    elif args.reshift_to is not None:
+        reshift(args.output, args.reshift_to)
+    else:
+        adjust_all_tasks(args.input, args.output, minimal_diff=not args.full_rewrite,
+                         workers=args.workers)
@@ -2,6 +2,21 @@
 const APIs = new Map();
 let actionCounter = 0;
 
+function setAPIs(functionsInfo) {
+    // Clear existing APIs
+    APIs.clear();
+    
+    // Populate APIs from response
+    for (const func of functionsInfo) {
+        APIs.set(func.name, {
+            description: func.description,
+            parameters: func.parameters,
+            required: func.required
+        });
+    }
+    console.log('APIs:', APIs);
+}
+
 async function handleGo() {
     const environment = document.getElementById('environment').value.trim();
     const interface = document.getElementById('interface').value;
@@ -19,41 +34,55 @@ async function handleGo() {
     console.log('Environment:', environment);
     console.log('Interface:', interface);
     
+    // functions_info is cached per interface and revalidated by ETag
+    const cacheKey = `functions_info:${environment}:${interface}`;
+    let cached = null;
+    try {
+        cached = JSON.parse(localStorage.getItem(cacheKey));
+    } catch (e) {
+        cached = null;
+    }
+    
     try {
+        const headers = {
+            'Content-Type': 'application/json'
+        };
+        if (cached && cached.etag) {
+            headers['If-None-Match'] = cached.etag;
+        }
         const response = await fetch('/choose_env_interface', {
             method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
+            headers: headers,
             body: JSON.stringify({
                 environment: environment,
                 interface: interface
             })
         });
 
-        if (!response.ok) {
+        let data;
+        if (response.status === 304 && cached) {
+            data = { status: 'success', functions_info: cached.functions_info };
+        } else if (!response.ok) {
             showWrongMessage('Failed to select Environment and Interface.');
             console.error('Error details:', await response.json());
             return;
+        } else {
+            data = await response.json();
+            const etag = response.headers.get('ETag');
+            if (etag && data.status === 'success') {
+                try {
+                    localStorage.setItem(cacheKey, JSON.stringify({ etag: etag, functions_info: data.functions_info }));
+                } catch (e) {
+                    // Storage full or disabled: just don't cache
+                }
+            }
         }
-
-        const data = await response.json();
+        
         if (data.status === 'success') {
             showCorrectMessage('Environment and Interface selected successfully!');
             console.log('Response:', data);
             
-            // Clear existing APIs
-            APIs.clear();
-            
-            // Populate APIs from response
-            for (const func of data.functions_info) {
-                APIs.set(func.name, {
-                    description: func.description,
-                    parameters: func.parameters,
-                    required: func.required
-                });
-            }
-            console.log('APIs:', APIs);
+            setAPIs(data.functions_info);
         } else {
             showWrongMessage('Failed to select Environment and Interface.');
         }
@@ -91,29 +120,11 @@ async function runAllActions() {
     runAllBtn.textContent = '⏳ Running All Actions...';
     runAllBtn.disabled = true;
     
-    let successCount = 0;
-    let errorCount = 0;
-    
     try {
-        for (let i = 0; i < actionElements.length; i++) {
-            const actionEl = actionElements[i];
-            const actionId = actionEl.id;
-            
-            showCorrectMessage(`Executing Action ${i + 1} of ${actionElements.length}...`);
-            
-            try {
-                await executeAPI(actionId);
-                successCount++;
-            } catch (error) {
-                console.error(`Error executing action ${i + 1}:`, error);
-                errorCount++;
-            }
-            
-            // Wait 1 seconds before next action (except for the last one)
-            if (i < actionElements.length - 1) {
-                await new Promise(resolve => setTimeout(resolve, 1000));
-            }
-        }
+        showCorrectMessage(`Executing ${actionElements.length} actions...`);
+        const actionIds = Array.from(actionElements).map(actionEl => actionEl.id);
+        // Start from fresh environment data (step 0)
+        const { successCount, errorCount } = await runActionsBatch(actionIds, 0);
         
         // Show final summary
         if (errorCount === 0) {
@@ -132,6 +143,72 @@ async function runAllActions() {
     }
 }
 
+// Run the given actions, in order, in a single batch request and render
+// every response as it arrives. Actions with missing required fields are
+// counted as errors and not sent. With startStep, the server first
+// rewinds to the state after that many actions.
+async function runActionsBatch(actionIds, startStep) {
+    const batch = [];
+    let errorCount = 0;
+    
+    actionIds.forEach(actionId => {
+        const request = collectActionRequest(actionId);
+        if (!request) {
+            errorCount++;
+            return;
+        }
+        batch.push({ actionId: actionId, request: request });
+        renderActionPending(actionId);
+    });
+    
+    if (batch.length === 0) {
+        return { successCount: 0, errorCount: errorCount };
+    }
+    
+    let successCount = 0;
+    const handleResult = (result, index) => {
+        const ok = result.status_code === 200;
+        renderActionResponse(batch[index].actionId, ok, result.response);
+        if (ok) {
+            successCount++;
+        } else {
+            errorCount++;
+        }
+    };
+    
+    let received = 0;
+    try {
+        const body = JSON.stringify({
+            actions: batch.map(item => item.request),
+            start_step: startStep
+        });
+        if (window.ReadableStream && window.TextDecoder) {
+            // Render each action as soon as the server streams its result
+            received = await streamActionResults(body, (result) => {
+                handleResult(result, result.index);
+            });
+        } else {
+            const response = await fetch('/execute_actions', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: body
+            });
+            const data = await response.json();
+            if (!response.ok) {
+                throw new Error(data.message || 'Batch execution failed');
+            }
+            data.results.forEach(handleResult);
+            received = data.results.length;
+        }
+    } catch (error) {
+        batch.slice(received).forEach(item => renderNetworkError(item.actionId, error));
+        errorCount += batch.length - received;
+    }
+    return { successCount: successCount, errorCount: errorCount };
+}
+
 function addAction() {
     if (APIs.size === 0) {
         showWrongMessage('Please select an environment and interface first by clicking GO.');
@@ -197,12 +274,42 @@ function addAction() {
     return [actionId, actionDiv];
 }
 
-function removeAction(actionId) {
+async function removeAction(actionId) {
+    const index = actionIndex(actionId);
     const actionDiv = document.getElementById(actionId);
     actionCounter--;
     if (actionDiv) {
         actionDiv.remove();
     }
+    
+    // Keep the server's action journal in line with the list: drop the
+    // removed step and re-run the executed actions that were below it.
+    if (index < 0) {
+        return;
+    }
+    try {
+        const response = await fetch('/rewind', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ step: index })
+        });
+        if (!response.ok) {
+            return;
+        }
+        const state = await response.json();
+        if (state.total_steps > index + 1) {
+            const laterIds = Array.from(document.querySelectorAll('.api-action'))
+                .slice(index, state.total_steps - 1)
+                .map(el => el.id);
+            if (laterIds.length > 0) {
+                await runActionsBatch(laterIds);
+            }
+        }
+    } catch (error) {
+        console.error('Error updating the action journal:', error);
+    }
 }
 
 function selectAPI(actionId, apiKey) {
@@ -257,15 +364,58 @@ function selectAPI(actionId, apiKey) {
     executeDiv.style.display = 'block';
 }
 
-async function executeAPI(actionId) {
-    const environment = document.getElementById('environment').value.trim();
+// POST to /execute_actions_stream and call onResult for every
+// server-sent "action" event as it arrives. Returns how many arrived.
+async function streamActionResults(body, onResult) {
+    const response = await fetch('/execute_actions_stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: body
+    });
+    if (!response.ok) {
+        const data = await response.json();
+        throw new Error(data.message || 'Batch execution failed');
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let received = 0;
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let eventName = 'message';
+            let data = '';
+            frame.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) eventName = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            if (eventName === 'action') {
+                onResult(JSON.parse(data));
+                received++;
+            }
+        }
+    }
+    return received;
+}
+
+// Read an action's selected API and parameters from the form.
+// Returns null (after flagging the problem) when it cannot be run.
+function collectActionRequest(actionId) {
     const actionDiv = document.getElementById(actionId);
     const selectedRadio = actionDiv.querySelector('input[type="radio"]:checked');
     const selectedAPI = selectedRadio ? selectedRadio.value : null;
                 
     if (!selectedAPI) {
         showWrongMessage('Please select an API first.');
-        return;
+        return null;
     }
     
     // Collect parameters
@@ -288,18 +438,93 @@ async function executeAPI(actionId) {
     
     if (hasError) {
         showWrongMessage('Please fill in all required fields.');
+        return null;
+    }
+    
+    return {
+        api_name: selectedAPI,
+        parameters: parameters,
+        environment: document.getElementById('environment').value.trim()
+    };
+}
+
+function renderActionPending(actionId) {
+    const responseDiv = document.getElementById(`${actionId}_response`);
+    responseDiv.innerHTML = '<div class="response-header">Executing API...</div>';
+    responseDiv.className = 'api-response show';
+}
+
+function fixNewlines(obj) {
+    if (typeof obj === 'string') {
+        return obj.replace(/\\n/g, '\n');
+    }
+    if (Array.isArray(obj)) {
+        return obj.map(fixNewlines);
+    }
+    if (obj && typeof obj === 'object') {
+        const fixed = {};
+        for (let key in obj) {
+            fixed[key] = fixNewlines(obj[key]);
+        }
+        return fixed;
+    }
+    return obj;
+}
+
+function renderActionResponse(actionId, ok, result) {
+    const responseDiv = document.getElementById(`${actionId}_response`);
+    if (ok) {
+        responseDiv.className = 'api-response show success';
+        responseDiv.innerHTML = `
+            <div class="response-header">✅ Success</div>
+            <div class="response-content"><pre></pre></div>
+        `;
+        // Set the JSON content as text to preserve literals
+        
+        // Process the data to convert literal \n to actual newlines
+
+        const fixedResult = fixNewlines(result);
+        responseDiv.querySelector('pre').textContent = JSON.stringify(fixedResult, null, 2);
+    } else {
+        responseDiv.className = 'api-response show error';
+        responseDiv.innerHTML = `
+            <div class="response-header">❌ Error</div>
+            <div class="response-content">${JSON.stringify(result, null, 2)}</div>
+        `;
+    }
+}
+
+function renderNetworkError(actionId, error) {
+    const responseDiv = document.getElementById(`${actionId}_response`);
+    responseDiv.className = 'api-response show error';
+    responseDiv.innerHTML = `
+        <div class="response-header">❌ Network Error</div>
+        <div class="response-content">Failed to connect to the server: ${error.message}</div>
+    `;
+}
+
+function actionIndex(actionId) {
+    return Array.from(document.querySelectorAll('.api-action')).findIndex(el => el.id === actionId);
+}
+
+async function executeAPI(actionId) {
+    const request = collectActionRequest(actionId);
+    if (!request) {
         return;
     }
+    // Run as step k of the task: the server rewinds to the state after
+    // the actions above this one instead of replaying everything.
+    const step = actionIndex(actionId);
+    request.step = step;
     
     // Show loading state
+    const actionDiv = document.getElementById(actionId);
     const executeButton = actionDiv.querySelector('.execute-button');
     const originalText = executeButton.textContent;
     executeButton.textContent = '⏳ Executing...';
     executeButton.disabled = true;
     
-    const responseDiv = document.getElementById(`${actionId}_response`);
-    responseDiv.innerHTML = '<div class="response-header">Executing API...</div>';
-    responseDiv.className = 'api-response show';
+    renderActionPending(actionId);
     
     try {
         const response = await fetch('/execute_api', {
@@ -307,58 +532,32 @@ async function executeAPI(actionId) {
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify({
-                api_name: selectedAPI,
-                parameters: parameters,
-                environment: environment
-            })
+            body: JSON.stringify(request)
         });
         
         const result = await response.json();
-        
-        function fixNewlines(obj) {
-            if (typeof obj === 'string') {
-                return obj.replace(/\\n/g, '\n');
-            }
-            if (Array.isArray(obj)) {
-                return obj.map(fixNewlines);
-            }
-            if (obj && typeof obj === 'object') {
-                const fixed = {};
-                for (let key in obj) {
-                    fixed[key] = fixNewlines(obj[key]);
-                }
-                return fixed;
-            }
-            return obj;
-        }
+        renderActionResponse(actionId, response.ok, result);
         if (response.ok) {
-            responseDiv.className = 'api-response show success';
-            responseDiv.innerHTML = `
-                <div class="response-header">✅ Success</div>
-                <div class="response-content"><pre></pre></div>
-            `;
-            // Set the JSON content as text to preserve literals
-            
-            // Process the data to convert literal \n to actual newlines
-
-            const fixedResult = fixNewlines(result);
-            responseDiv.querySelector('pre').textContent = JSON.stringify(fixedResult, null, 2);
             showCorrectMessage('API executed successfully!');
         } else {
-            responseDiv.className = 'api-response show error';
-            responseDiv.innerHTML = `
-                <div class="response-header">❌ Error</div>
-                <div class="response-content">${JSON.stringify(result, null, 2)}</div>
-            `;
             showWrongMessage('API execution failed. Check the response for details.');
         }
+        
+        // Re-executing an earlier action dropped the later steps on the
+        // server: run the actions below it again, in one batch.
+        if (parseInt(response.headers.get('X-Dropped-Steps') || '0') > 0) {
+            const laterIds = Array.from(document.querySelectorAll('.api-action'))
+                .slice(step + 1)
+                .map(el => el.id);
+            if (laterIds.length > 0) {
+                const { successCount, errorCount } = await runActionsBatch(laterIds);
+                if (errorCount > 0) {
+                    showWrongMessage(`Re-ran ${laterIds.length} later actions: ${successCount} successful, ${errorCount} failed.`);
+                }
+            }
+        }
     } catch (error) {
-        responseDiv.className = 'api-response show error';
-        responseDiv.innerHTML = `
-            <div class="response-header">❌ Network Error</div>
-            <div class="response-content">Failed to connect to the server: ${error.message}</div>
-        `;
+        renderNetworkError(actionId, error);
         showWrongMessage('Network error occurred while executing the API.');
     } finally {
         executeButton.textContent = originalText;
@@ -536,50 +735,7 @@ function importActions() {
                 }
 
                 console.log('Imported actions:', obj);
-                // const added = new Set();
-                let imported_actions = obj.actions;
-                let actions_interface = obj.interface_num;
-                if (!obj.actions || !Array.isArray(obj.actions)) {
-                    imported_actions = obj.task.actions;
-                    // actions_interface = obj.task.interface_num;
-                }
-
-                var interface_selected = document.getElementsByClassName("form-select")[0];
-                var interface_selected_text = interface_selected.options[interface_selected.selectedIndex].text;
-                interface_selected_text = interface_selected_text.split(' ')[1];
-                console.log(interface_selected_text, actions_interface);
-                if (actions_interface && parseInt(actions_interface) !== parseInt(interface_selected_text)) {
-                    showWrongMessage(`The imported actions are for the interface: ${actions_interface} whereas the environment is using interface: ${interface_selected_text}. Please select the correct interface first.`);
-                    return;
-                }
-
-                imported_actions.forEach(action => {
-                    // if (added.has(action.name)) return;
-                    // added.add(action.name);
-                    [actionID, actionDiv] = addAction();
-                    if (actionID === null || actionDiv === null) return;
-                    const radioButton = actionDiv.querySelector(`input[type="radio"][value="${action.name}"]`);
-                    if (radioButton) {
-                        radioButton.checked = true;
-                    }
-                    selectAPI(actionID, action.name);
-                    actionDiv.querySelectorAll('.parameter-input').forEach(input => {
-                        const paramName = input.dataset.param;
-                        let value = action.arguments[paramName];
-                        if (value !== undefined) {
-                            // Check if value is a non-null object (but not an array or Date)
-                            if (typeof value === 'object' && value !== null && !Array.isArray(value)) {
-                                try {
-                                    value = JSON.stringify(value);
-                                } catch (e) {
-                                    console.warn(`Failed to stringify value for ${paramName}`, e);
-                                }
-                            }
-                            input.value = value;
-                        }
-                    });
-                    // console.log('Action ID:', actionID);
-                });
+                importTask(obj);
             } catch (error) {
                 console.error('Error importing actions:', error);
                 showWrongMessage('Failed to import actions. Please check the file format.');
@@ -589,6 +745,83 @@ function importActions() {
     };
 }
 
+// Send the task to the server, which sets up the environment and replays
+// every action; then build the action rows and render all outputs at once.
+async function importTask(obj) {
+    const existingCount = document.querySelectorAll('.api-action').length;
+    const request = {
+        ...obj,
+        environment: document.getElementById('environment').value.trim() || undefined,
+        interface: document.getElementById('interface').value || undefined,
+        start_step: existingCount
+    };
+    
+    let data;
+    try {
+        const response = await fetch('/import_task', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify(request)
+        });
+        data = await response.json();
+        if (!response.ok) {
+            showWrongMessage(data.message || 'Failed to import the task.');
+            return;
+        }
+    } catch (error) {
+        console.error('Error importing task:', error);
+        showWrongMessage('Network error occurred while importing the task.');
+        return;
+    }
+    
+    if (APIs.size === 0) {
+        setAPIs(data.functions_info);
+    }
+    
+    // start_step 0: the server opened a fresh environment, so the rows
+    // already on the page no longer match its history
+    if (data.start_step === 0) {
+        document.querySelectorAll('.api-action').forEach(actionDiv => actionDiv.remove());
+        actionCounter = 0;
+    }
+    
+    const importedActions = Array.isArray(obj.actions) ? obj.actions : obj.task.actions;
+    data.results.forEach((result, index) => {
+        const [actionID, actionDiv] = addAction();
+        if (actionID === null || actionDiv === null) return;
+        const radioButton = actionDiv.querySelector(`input[type="radio"][value="${result.name}"]`);
+        if (radioButton) {
+            radioButton.checked = true;
+        }
+        selectAPI(actionID, result.name);
+        const action = importedActions[index];
+        actionDiv.querySelectorAll('.parameter-input').forEach(input => {
+            const paramName = input.dataset.param;
+            let value = (action.arguments || {})[paramName];
+            if (value !== undefined) {
+                // Check if value is a non-null object (but not an array or Date)
+                if (typeof value === 'object' && value !== null && !Array.isArray(value)) {
+                    try {
+                        value = JSON.stringify(value);
+                    } catch (e) {
+                        console.warn(`Failed to stringify value for ${paramName}`, e);
+                    }
+                }
+                input.value = value;
+            }
+        });
+        renderActionResponse(actionID, result.status_code === 200, result.response);
+    });
+    
+    if (data.error_count === 0) {
+        showCorrectMessage(`Imported and executed ${data.success_count} actions.`);
+    } else {
+        showWrongMessage(`Imported actions: ${data.success_count} successful, ${data.error_count} failed.`);
+    }
+}
+
 function getTaskActions(){
     const actions = [];
     const actionElements = document.querySelectorAll('.api-action');
@@ -658,10 +891,22 @@ function getTaskActions(){
     return actions;
 }
 
-function exportActions() {
-    actions = getTaskActions();
+async function exportActions() {
+    // The server keeps every executed action with its arguments and
+    // output; fall back to reading the page if it cannot answer.
+    let exportData;
+    try {
+        const response = await fetch('/export_task');
+        if (response.ok) {
+            exportData = await response.json();
+        }
+    } catch (error) {
+        console.error('Error exporting task:', error);
+    }
+    if (!exportData) {
+        exportData = { actions: getTaskActions() };
+    }
     
-    const exportData = { actions: actions };
     const blob = new Blob([JSON.stringify(exportData, null, 2)], { type: 'application/json' });
     const url = URL.createObjectURL(blob);
     const a = document.createElement('a');
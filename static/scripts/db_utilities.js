@@ -749,6 +749,95 @@ async function extract_policy_schema_handling(){
 }
 
 
+// Read-only, paginated view of a table of the selected environment.
+// options: { page, page_size, fields: [...], filters: {...}, sort: 'field' | '-field' }
+async function browseTable(table, options = {}) {
+    const response = await fetch('/browse_table', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ table: table, ...options })
+    });
+    return await response.json();
+}
+
+async function browse_table_handling(){
+    const data = await browseTable(null);
+    if (data.status !== 'success') {
+        alert(data.message || 'Select an environment and interface first.');
+        return;
+    }
+
+    document.getElementById('content').style.display = 'block';
+    document.getElementById('content').innerHTML = '';
+    document.getElementById('content').innerHTML = `
+        <h2 id="content-header">Browse Tables</h2>
+        <h3 class="content-subheader">Table</h3>
+        <select id="browse-table"></select>
+
+        <h3 class="content-subheader">Fields (comma separated, empty for all)</h3>
+        <input id="browse-fields" type="text" style="width: 100%;">
+
+        <h3 class="content-subheader">Filters (JSON, e.g. {"status": "open", "created_at": {"gte": "2024-01-01"}})</h3>
+        <textarea id="browse-filters"></textarea>
+
+        <h3 class="content-subheader">Sort (field, or -field for descending)</h3>
+        <input id="browse-sort" type="text" style="width: 100%;">
+
+        <div style="display: flex; justify-content: center; align-items: center; margin-top: 1rem;">
+            <button id="browse-prev" onclick="browseTablePage(-1)" style="margin: 1rem; padding: 0.5rem 1rem; background: #667eea; color: white; border: none; border-radius: 8px; cursor: pointer;">Previous</button>
+            <button id="browse-go" onclick="browseTablePage(0)" style="margin: 1rem; padding: 0.5rem 1rem; background: #667eea; color: white; border: none; border-radius: 8px; cursor: pointer;">Browse</button>
+            <button id="browse-next" onclick="browseTablePage(1)" style="margin: 1rem; padding: 0.5rem 1rem; background: #667eea; color: white; border: none; border-radius: 8px; cursor: pointer;">Next</button>
+        </div>
+        <div id="browse-summary"></div>
+        <pre id="browse-results"></pre>
+    `;
+
+    const select = document.getElementById('browse-table');
+    for (const [table, count] of Object.entries(data.tables)) {
+        const option = document.createElement('option');
+        option.value = table;
+        option.textContent = count === null ? table : `${table} (${count})`;
+        select.appendChild(option);
+    }
+    browseTablePage.page = 1;
+}
+
+async function browseTablePage(direction){
+    const table = document.getElementById('browse-table').value;
+    const fields = document.getElementById('browse-fields').value
+        .split(',').map(field => field.trim()).filter(field => field);
+    const filtersText = document.getElementById('browse-filters').value.trim();
+    let filters = {};
+    if (filtersText) {
+        try {
+            filters = JSON.parse(filtersText);
+        } catch (e) {
+            alert('Filters must be valid JSON.');
+            return;
+        }
+    }
+    const page = direction === 0 ? 1 : Math.max(1, (browseTablePage.page || 1) + direction);
+
+    const data = await browseTable(table, {
+        page: page,
+        page_size: 50,
+        fields: fields.length ? fields : undefined,
+        filters: filters,
+        sort: document.getElementById('browse-sort').value.trim() || undefined
+    });
+    if (data.status !== 'success') {
+        alert(data.message || 'Failed to browse the table.');
+        return;
+    }
+    browseTablePage.page = data.page;
+    document.getElementById('browse-summary').textContent =
+        `Page ${data.page} of ${data.total_pages} (${data.total} matching records)`;
+    document.getElementById('browse-results').textContent = JSON.stringify(data.records, null, 2);
+}
+
+
 document.addEventListener('DOMContentLoaded', function() {
     // Add click handlers for utility cards
     const cards = document.querySelectorAll('.analytics-card');
@@ -776,6 +865,8 @@ document.addEventListener('DOMContentLoaded', function() {
                     tune_policy_handling();
                 } else if (utility === 'policy-validator') {
                     policy_validator_handling();
+                } else if (utility === 'browse-table') {
+                    browse_table_handling();
                 }
             } else {
                 console.warn('No utility data found for this card.');
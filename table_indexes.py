@@ -0,0 +1,184 @@
+"""
+Lazy per-table indexes over a session's data, for read-only browsing.
+
+For a table, rows() is the list of (record id, record) pairs; for a field,
+the sorted index is [(sort key, row position)] and the hash index maps
+each value to its row positions. All are built on first use and dropped
+for a table when an action changes it (invalidate()), so browsing a large
+table filters, sorts and slices positions and only the requested page of
+records is ever serialized.
+
+Filters: {field: value} for equality, or {field: {"gte"|"gt"|"lte"|"lt"|
+"ne"|"in"|"contains": value, ...}}. Sort: "field" or "-field".
+"""
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from action_deltas import record_id
+from tracked_data import LazyTrackedDict
+
+RANGE_OPS = ('gt', 'gte', 'lt', 'lte')
+
+
+def sort_key(value: Any) -> Tuple:
+    """Orders mixed values: missing/None, booleans, numbers, strings, others."""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, str):
+        return (3, value)
+    return (4, repr(value))
+
+
+def _hashable(value: Any) -> Any:
+    return value if isinstance(value, (str, int, float, bool, type(None))) else repr(value)
+
+
+def _field(record: Any, field: str) -> Any:
+    return record.get(field) if isinstance(record, dict) else None
+
+
+class TableIndexes:
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        self._rows: Dict[str, List[Tuple[Any, Any]]] = {}
+        self._sorted: Dict[Tuple[str, str], List[Tuple[Tuple, int]]] = {}
+        self._hashed: Dict[Tuple[str, str], Dict[Any, List[int]]] = {}
+
+    def invalidate(self, tables: Optional[Iterable[str]] = None):
+        """Drop the indexes of tables (all when None)."""
+        if tables is None:
+            self._rows.clear()
+            self._sorted.clear()
+            self._hashed.clear()
+            return
+        for table in set(tables):
+            self._rows.pop(table, None)
+            for cache in (self._sorted, self._hashed):
+                for key in [key for key in cache if key[0] == table]:
+                    del cache[key]
+
+    def tables(self) -> Dict[str, Optional[int]]:
+        """Record count per table; None for tables the session has not loaded yet."""
+        counts = {}
+        for table, records in dict.items(self.data):
+            if isinstance(records, (dict, list)):
+                counts[table] = len(records)
+            elif isinstance(self.data, LazyTrackedDict) and not self.data.is_loaded(table):
+                counts[table] = None
+        return counts
+
+    def rows(self, table: str) -> List[Tuple[Any, Any]]:
+        rows = self._rows.get(table)
+        if rows is None:
+            records = self.data[table]
+            if isinstance(records, dict):
+                rows = list(records.items())
+            else:
+                rows = [(record_id(record, position), record) for position, record in enumerate(records)]
+            self._rows[table] = rows
+        return rows
+
+    def sorted_index(self, table: str, field: str) -> List[Tuple[Tuple, int]]:
+        index = self._sorted.get((table, field))
+        if index is None:
+            index = sorted((sort_key(_field(record, field)), position)
+                           for position, (_, record) in enumerate(self.rows(table)))
+            self._sorted[(table, field)] = index
+        return index
+
+    def hash_index(self, table: str, field: str) -> Dict[Any, List[int]]:
+        index = self._hashed.get((table, field))
+        if index is None:
+            index = {}
+            for position, (_, record) in enumerate(self.rows(table)):
+                index.setdefault(_hashable(_field(record, field)), []).append(position)
+            self._hashed[(table, field)] = index
+        return index
+
+    def _range(self, table: str, field: str, conditions: Dict[str, Any]) -> Set[int]:
+        index = self.sorted_index(table, field)
+        low, high = 0, len(index)
+        if 'gte' in conditions:
+            low = max(low, bisect_left(index, (sort_key(conditions['gte']),)))
+        if 'gt' in conditions:
+            low = max(low, bisect_right(index, (sort_key(conditions['gt']), float('inf'))))
+        if 'lte' in conditions:
+            high = min(high, bisect_right(index, (sort_key(conditions['lte']), float('inf'))))
+        if 'lt' in conditions:
+            high = min(high, bisect_left(index, (sort_key(conditions['lt']),)))
+        return {position for _, position in index[low:high]}
+
+    def select(self, table: str, filters: Dict[str, Any]) -> Optional[Set[int]]:
+        """Row positions matching every filter (None when there are no filters)."""
+        selected: Optional[Set[int]] = None
+        for field, condition in (filters or {}).items():
+            if not isinstance(condition, dict):
+                condition = {'eq': condition}
+            matches: Optional[Set[int]] = None
+            if 'eq' in condition:
+                matches = set(self.hash_index(table, field).get(_hashable(condition['eq']), ()))
+            if 'in' in condition:
+                index = self.hash_index(table, field)
+                found = {position for value in condition['in'] for position in index.get(_hashable(value), ())}
+                matches = found if matches is None else matches & found
+            ranges = {op: value for op, value in condition.items() if op in RANGE_OPS}
+            if ranges:
+                found = self._range(table, field, ranges)
+                matches = found if matches is None else matches & found
+            if matches is None:
+                matches = set(range(len(self.rows(table))))
+            if 'ne' in condition:
+                matches -= set(self.hash_index(table, field).get(_hashable(condition['ne']), ()))
+            if 'contains' in condition:
+                needle = str(condition['contains']).lower()
+                rows = self.rows(table)
+                matches = {position for position in matches
+                           if needle in str(_field(rows[position][1], field)).lower()}
+            selected = matches if selected is None else selected & matches
+        return selected
+
+    def browse(self, table: str, filters: Optional[Dict[str, Any]] = None, sort: Optional[str] = None,
+               fields: Optional[List[str]] = None, page: int = 1, page_size: int = 50) -> Dict[str, Any]:
+        """One page of a table, filtered, sorted and projected."""
+        rows = self.rows(table)
+        selected = self.select(table, filters or {})
+        total = len(rows) if selected is None else len(selected)
+        page_size = max(1, min(int(page_size), 1000))
+        total_pages = max(1, -(-total // page_size))
+        page = min(max(1, int(page)), total_pages)
+        start, end = (page - 1) * page_size, page * page_size
+
+        if sort:
+            descending = sort.startswith('-')
+            field = sort.lstrip('-+')
+            if selected is not None and len(selected) < len(rows) // 4:
+                order = sorted(selected, key=lambda position: (sort_key(_field(rows[position][1], field)), position),
+                               reverse=descending)
+            else:
+                index = self.sorted_index(table, field)
+                ordered = (position for _, position in (reversed(index) if descending else index))
+                order = [position for position in ordered if selected is None or position in selected]
+            positions = order[start:end]
+        elif selected is None:
+            positions = range(start, min(end, len(rows)))
+        else:
+            positions = sorted(selected)[start:end]
+
+        records = []
+        for position in positions:
+            rid, record = rows[position]
+            if fields and isinstance(record, dict):
+                record = {field: record.get(field) for field in fields}
+            records.append({'id': rid, 'record': record})
+        return {
+            'table': table,
+            'page': page,
+            'page_size': page_size,
+            'total': total,
+            'total_pages': total_pages,
+            'records': records,
+        }
@@ -0,0 +1,388 @@
+"""
+Safe file writing helpers for the batch task scripts.
+
+- atomic_write_text / atomic_write_json write to a temp file in the target
+  directory and os.replace() it over the destination, so a crash never
+  leaves a truncated task.json behind.
+- RepairJournal keeps a backup of every file a repair run overwrites,
+  together with its original and new SHA-256, so the whole run can be
+  rolled back later.
+- write_task_json can patch only the changed value spans of the original
+  text (see json_patch.py) and skips the write when nothing changed.
+- link_or_copy mirrors an unchanged file by reflink or hard link when the
+  filesystem allows it, falling back to a normal copy.
+- run_all_tasks / rollback_run / repair_main are the parallel, journaled
+  batch driver and command line shared by the replace_with_correct_output
+  scripts; each script passes its own per-task function.
+"""
+import os
+import glob
+import json
+import shutil
+import hashlib
+import argparse
+import tempfile
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from json_patch import render_minimal_diff
+
+try:
+    import fcntl
+except ImportError:  # Windows: no reflinks, link_or_copy falls through
+    fcntl = None
+
+
+def sha256_bytes(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a file's content, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def atomic_write_bytes(path: str, content: bytes) -> int:
+    """
+    Write content to path atomically (temp file + rename).
+    Keeps the permissions of an existing destination file.
+    Returns the number of bytes written.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=os.path.basename(path), dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        else:
+            # mkstemp creates 0600; give new files the usual umask-based mode
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return len(content)
+
+
+def atomic_write_text(path: str, text: str, encoding: str = 'utf-8') -> int:
+    return atomic_write_bytes(path, text.encode(encoding))
+
+
+def atomic_write_json(path: str, data: Any, indent: int = 2) -> int:
+    return atomic_write_text(path, json.dumps(data, indent=indent))
+
+
+def default_journal_dir(prefix: str = "repair_journal") -> str:
+    return f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+
+class RepairJournal:
+    """
+    On-disk journal of a repair run.
+
+    Layout:
+        <journal_dir>/backups/<original_sha256>   original file content
+        <journal_dir>/entries/<sha256(path)>.json  {path, original_sha256, new_sha256}
+
+    Every worker process writes its own entry files, so no coordination
+    is needed between processes. Backups are content-addressed, so two
+    identical originals share one backup.
+    """
+
+    def __init__(self, journal_dir: str):
+        self.journal_dir = journal_dir
+        self.backups_dir = os.path.join(journal_dir, "backups")
+        self.entries_dir = os.path.join(journal_dir, "entries")
+
+    def _entry_path(self, path: str) -> str:
+        key = sha256_bytes(os.path.abspath(path).encode('utf-8'))
+        return os.path.join(self.entries_dir, f"{key}.json")
+
+    def backup(self, path: str, content: Optional[bytes] = None) -> str:
+        """Store the current content of path. Returns its SHA-256."""
+        if content is None:
+            with open(path, 'rb') as f:
+                content = f.read()
+        original_sha = sha256_bytes(content)
+        backup_path = os.path.join(self.backups_dir, original_sha)
+        if not os.path.exists(backup_path):
+            atomic_write_bytes(backup_path, content)
+        return original_sha
+
+    def record(self, path: str, original_sha: str, new_sha: str):
+        # Keep the first original if a path is repaired twice in one run,
+        # so rollback always goes back to the pre-run state.
+        entry_path = self._entry_path(path)
+        if os.path.exists(entry_path):
+            with open(entry_path, 'r', encoding='utf-8') as f:
+                original_sha = json.load(f)['original_sha256']
+        atomic_write_json(entry_path, {
+            'path': os.path.abspath(path),
+            'original_sha256': original_sha,
+            'new_sha256': new_sha,
+        })
+
+    def write(self, path: str, content: bytes) -> int:
+        """Back up path, atomically replace it with content and journal the change."""
+        original_sha = self.backup(path)
+        written = atomic_write_bytes(path, content)
+        self.record(path, original_sha, sha256_bytes(content))
+        return written
+
+    def entries(self) -> List[Dict[str, str]]:
+        if not os.path.isdir(self.entries_dir):
+            return []
+        entries = []
+        for name in sorted(os.listdir(self.entries_dir)):
+            if name.endswith(".json"):
+                with open(os.path.join(self.entries_dir, name), 'r', encoding='utf-8') as f:
+                    entries.append(json.load(f))
+        return entries
+
+    def rollback(self) -> Tuple[List[str], List[Dict[str, str]]]:
+        """
+        Restore every journaled file whose current content is still what
+        the repair run wrote. Files edited since then are left alone and
+        reported as conflicts.
+        Returns (restored_paths, conflicts)
+        """
+        restored = []
+        conflicts = []
+        for entry in self.entries():
+            path = entry['path']
+            current_sha = file_sha256(path) if os.path.exists(path) else None
+            if current_sha == entry['original_sha256']:
+                continue
+            if current_sha != entry['new_sha256']:
+                conflicts.append({'path': path, 'reason': 'modified after repair run'})
+                continue
+            backup_path = os.path.join(self.backups_dir, entry['original_sha256'])
+            with open(backup_path, 'rb') as f:
+                atomic_write_bytes(path, f.read())
+            restored.append(path)
+        return restored, conflicts
+
+
+def _holds(path: str, content: bytes) -> bool:
+    """Whether path already holds exactly these bytes."""
+    try:
+        if os.path.getsize(path) == len(content):
+            with open(path, 'rb') as f:
+                return f.read() == content
+    except OSError:
+        pass
+    return False
+
+
+def write_if_changed(path: str, content: bytes) -> int:
+    """
+    Atomically write content unless path already holds exactly these
+    bytes. Returns bytes written (0 when the file was left untouched).
+    """
+    if _holds(path, content):
+        return 0
+    return atomic_write_bytes(path, content)
+
+
+FICLONE = 0x40049409  # linux/fs.h: share extents copy-on-write (btrfs, xfs)
+
+
+def _reflink(src: str, dst: str) -> bool:
+    if fcntl is None:
+        return False
+    try:
+        with open(src, 'rb') as src_f, open(dst, 'wb') as dst_f:
+            fcntl.ioctl(dst_f.fileno(), FICLONE, src_f.fileno())
+        return True
+    except OSError:
+        if os.path.exists(dst):
+            os.remove(dst)
+        return False
+
+
+def link_or_copy(src: str, dst: str) -> str:
+    """
+    Mirror src at dst without rewriting its bytes when possible.
+    Tries a reflink (independent copy sharing extents), then a hard link
+    (same inode; safe because every writer here replaces files atomically
+    instead of editing them in place), then a plain copy.
+    Returns the method used: 'existing', 'reflink', 'hardlink' or 'copy'.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+    if os.path.exists(dst):
+        if os.path.samefile(src, dst):
+            return 'existing'
+        os.remove(dst)
+    if _reflink(src, dst):
+        shutil.copystat(src, dst)
+        return 'reflink'
+    try:
+        os.link(src, dst)
+        return 'hardlink'
+    except OSError:
+        shutil.copy2(src, dst)
+        return 'copy'
+
+
+def render_task_json(data: Any, original_text: Optional[str] = None) -> bytes:
+    """
+    Serialize a task. With original_text, only changed values are spliced
+    into the original formatting; otherwise it is a full indent=2 dump.
+    """
+    if original_text is None:
+        return json.dumps(data, indent=2).encode('utf-8')
+    old_data = json.loads(original_text)
+    return render_minimal_diff(original_text, old_data, data).encode('utf-8')
+
+
+def write_task_json(path: str, data: Any, journal_dir: Optional[str] = None,
+                    original_text: Optional[str] = None) -> int:
+    """
+    Atomically rewrite a task file, journaling the original when a
+    journal directory is given. Pass the text the file was loaded from as
+    original_text to patch only changed spans. Byte-identical results are
+    not written at all. Returns bytes written.
+    """
+    content = render_task_json(data, original_text)
+    if original_text is not None and content == original_text.encode('utf-8'):
+        return 0
+    if journal_dir:
+        if _holds(path, content):
+            return 0
+        return RepairJournal(journal_dir).write(path, content)
+    return write_if_changed(path, content)
+
+
+def find_task_files(base_path: str) -> List[str]:
+    """Every task.json under base_path."""
+    return glob.glob(os.path.join(base_path, "**", "task.json"), recursive=True)
+
+
+def run_all_tasks(run_task: Callable[[str, Optional[str], bool], Tuple[str, Optional[str], int]],
+                  base_path: str = "week_11_new", workers: Optional[int] = None,
+                  journal_dir: Optional[str] = None, minimal_diff: bool = True):
+    """
+    Repair every task.json under base_path with
+    run_task(task_file, journal_dir, minimal_diff) -> (status, message, bytes_written).
+    Tasks run in a pool of worker processes (each has its own running_tasks
+    session), so run_task must be a module-level function; workers=1 runs
+    them serially in this process. Every overwritten file is journaled in
+    journal_dir for rollback. minimal_diff=False re-serializes whole files
+    instead of patching spans. Extra lines of an Updated message are
+    printed under the file.
+    """
+    print("=" * 60)
+    print(f"VALIDATING AND UPDATING TASKS IN: {base_path}")
+    print("=" * 60)
+
+    task_files = find_task_files(base_path)
+
+    if not task_files:
+        print("No task.json files found.")
+        return
+
+    if journal_dir is None:
+        journal_dir = default_journal_dir()
+    workers = workers or os.cpu_count() or 1
+
+    print(f"Found {len(task_files)} files. Workers: {workers}\n")
+
+    stats = {"Success": 0, "Updated": 0, "Failed": 0}
+    failures = []
+    bytes_written = [0]
+
+    def report(done, task_file, status, msg, written):
+        stats[status] += 1
+        bytes_written[0] += written
+        if status == "Updated":
+            print(f"[{done}/{len(task_files)}] {task_file} -> UPDATED")
+            for line in (msg or "").splitlines()[1:]:
+                print(f"    {line}")
+        elif status == "Success":
+            print(f"[{done}/{len(task_files)}] {task_file} -> OK")
+        else:
+            print(f"[{done}/{len(task_files)}] {task_file} -> FAILED")
+            failures.append({"file": task_file, "error": msg})
+
+    if workers == 1:
+        for i, task_file in enumerate(task_files):
+            status, msg, written = run_task(task_file, journal_dir, minimal_diff)
+            report(i + 1, task_file, status, msg, written)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(run_task, task_file, journal_dir, minimal_diff): task_file
+                for task_file in task_files
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                task_file = futures[future]
+                try:
+                    status, msg, written = future.result()
+                except Exception as e:
+                    status, msg, written = "Failed", f"Worker error: {str(e)}", 0
+                report(done, task_file, status, msg, written)
+
+    # Summary
+    print("\n" + "=" * 60)
+    print("EXECUTION SUMMARY")
+    print("=" * 60)
+    print(f"Total:     {len(task_files)}")
+    print(f"Success:   {stats['Success']}")
+    print(f"Updated:   {stats['Updated']}")
+    print(f"Failed:    {stats['Failed']}")
+    print(f"Written:   {bytes_written[0]} bytes")
+    if stats['Updated']:
+        print(f"Journal:   {journal_dir} (undo with --rollback {journal_dir})")
+
+    if failures:
+        print("\n" + "=" * 60)
+        print("FAILURE DETAILS")
+        print("=" * 60)
+        for fail in failures:
+            print(f"File:  {fail['file']}")
+            print(f"Error: {fail['error']}")
+            print("-" * 40)
+
+        with open("task_update_errors.log", "w") as f:
+            for fail in failures:
+                f.write(f"File: {fail['file']}\nError: {fail['error']}\n\n")
+        print("\nDetailed errors written to task_update_errors.log")
+
+
+def rollback_run(journal_dir: str):
+    """Restore every file a repair run overwrote (unless edited since)."""
+    restored, conflicts = RepairJournal(journal_dir).rollback()
+    print(f"Restored {len(restored)} files from {journal_dir}")
+    for conflict in conflicts:
+        print(f"  Skipped {conflict['path']}: {conflict['reason']}")
+
+
+def repair_main(run_task: Callable[[str, Optional[str], bool], Tuple[str, Optional[str], int]],
+                default_folder: str = "hr_admin_2"):
+    """Command line of the repair scripts: run over a folder, or --rollback a run."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("folder", nargs="?", default=default_folder)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--journal-dir", default=None)
+    parser.add_argument("--rollback", metavar="JOURNAL_DIR", default=None)
+    parser.add_argument("--full-rewrite", action="store_true",
+                        help="re-serialize whole files instead of patching changed values")
+    args = parser.parse_args()
+
+    if args.rollback:
+        rollback_run(args.rollback)
+    else:
+        run_all_tasks(run_task, args.folder, workers=args.workers, journal_dir=args.journal_dir,
+                      minimal_diff=not args.full_rewrite)
@@ -1,8 +1,8 @@
 # main.py
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, Response, stream_with_context
 import os
 import json
-from task_runner import find_all_task_files, run_single_task, run_all_tasks, get_available_interfaces
+from task_runner import find_all_task_files, run_single_task, run_all_tasks, iter_run_all_tasks, get_available_interfaces
 
 app = Flask(__name__)
 app.secret_key = "supersecretkey"
@@ -223,6 +223,26 @@ def run_all():
     return redirect(url_for("summary"))
 
 
+@app.route("/run_all_stream")
+def run_all_stream():
+    """
+    Run all JSON test files, streaming each result as a server-sent event
+    (event: start / task / summary) the moment it is produced.
+    """
+    envs_path = session.get('envs_path', 'envs')
+    selected_interface = session.get('selected_interface', None)
+    search_path = os.path.join(BASE_PATH, selected_interface) if selected_interface else BASE_PATH
+
+    def generate():
+        for event in iter_run_all_tasks(search_path, envs_path=envs_path):
+            if event["event"] == "task":
+                event["path"] = os.path.relpath(event["file"], BASE_PATH)
+            yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 @app.route("/summary")
 def summary():
     """View summary of all test results"""
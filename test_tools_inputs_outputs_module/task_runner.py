@@ -147,9 +147,13 @@ def run_single_task(task_file_path, envs_path="envs"):
         clear_session()
 
 
-def run_all_tasks(base_path="tools_regression_tests", output_dir="tools_test_output", envs_path="envs"):
+def iter_run_all_tasks(base_path="tools_regression_tests", output_dir="tools_test_output", envs_path="envs"):
     """
-    Run all test files and generate comprehensive reports
+    Run all test files, yielding an event as soon as each one finishes:
+        {"event": "start", "total_tasks": n}
+        {"event": "task", "index": i, "file", "name", "success", "error", "actions_count"}
+        {"event": "summary", "summary": {...}}   (always last)
+    Results and summary.json are written exactly as run_all_tasks does.
     """
     # Clean and create output directory
     if os.path.exists(output_dir):
@@ -160,13 +164,15 @@ def run_all_tasks(base_path="tools_regression_tests", output_dir="tools_test_out
     task_files = find_all_task_files(base_path)
     
     if not task_files:
-        return {
+        yield {"event": "start", "total_tasks": 0}
+        yield {"event": "summary", "summary": {
             "total_tasks": 0,
             "passed": 0,
             "failed": 0,
             "pass_rate": "0%",
             "test_results": []
-        }
+        }}
+        return
     
     # Summary statistics
     summary = {
@@ -179,6 +185,7 @@ def run_all_tasks(base_path="tools_regression_tests", output_dir="tools_test_out
     }
     
     print(f"\n🧪 Running {len(task_files)} test tasks...\n")
+    yield {"event": "start", "total_tasks": len(task_files)}
     
     # Run each task
     for idx, task_file in enumerate(task_files, 1):
@@ -201,13 +208,15 @@ def run_all_tasks(base_path="tools_regression_tests", output_dir="tools_test_out
             json.dump(result, f, indent=2)
         
         # Add to summary
-        summary["test_results"].append({
+        test_result = {
             "file": task_file,
             "name": task_name,
             "success": success,
             "error": result.get("error"),
             "actions_count": len(result.get("actions", []))
-        })
+        }
+        summary["test_results"].append(test_result)
+        yield {"event": "task", "index": idx, **test_result}
     
     # Finalize summary
     summary["end_time"] = datetime.now().isoformat()
@@ -229,4 +238,15 @@ def run_all_tasks(base_path="tools_regression_tests", output_dir="tools_test_out
     print("="*60)
     print(f"\n📁 Results saved to: {output_dir}/")
     
-    return summary
\ No newline at end of file
+    yield {"event": "summary", "summary": summary}
+
+
+def run_all_tasks(base_path="tools_regression_tests", output_dir="tools_test_output", envs_path="envs"):
+    """
+    Run all test files and generate comprehensive reports
+    """
+    summary = None
+    for event in iter_run_all_tasks(base_path, output_dir, envs_path):
+        if event["event"] == "summary":
+            summary = event["summary"]
+    return summary
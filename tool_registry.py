@@ -0,0 +1,114 @@
+"""
+In-process registry of compiled tool interfaces for app.py.
+
+Every envs/<env>/tools/interface_<n> directory is compiled once into a
+Tools class (the same exec-based class running_tasks.create_tools_class
+builds) and kept in memory, keyed by (environment, interface, source hash).
+Sessions hold a reference to their compiled interface, so executing a tool
+is just the method call: nothing is written to tools.py or reloaded, and
+two sessions on different interfaces never see each other's tools.
+Editing a tool file changes the source hash, so the next selection
+compiles the new version. Each tool's argument coercion plan
+(argument_coercion.py) is compiled with it.
+"""
+import os
+import hashlib
+import threading
+from typing import Any, Dict, List, Tuple
+
+from argument_coercion import Converter, compile_plan
+from metrics import CACHE_REQUESTS, TOOL_COMPILE_SECONDS
+from running_tasks import create_tools_class, extract_file_info
+
+ENVS_PATH = "envs"
+
+
+class CompiledInterface:
+    def __init__(self, environment: str, interface: Any, source_hash: str,
+                 functions_info: List[Dict[str, Any]], tools_class: type):
+        self.environment = environment
+        self.interface = interface
+        self.source_hash = source_hash
+        self.functions_info = functions_info
+        self.tools_class = tools_class
+        self.tools = tools_class()
+        # tool name -> {parameter: converter}
+        self.coercion_plans: Dict[str, Dict[str, Converter]] = {
+            info['name']: compile_plan(info.get('parameters'))
+            for info in functions_info if isinstance(info, dict) and info.get('name')
+        }
+
+    def coercion_plan(self, api_name: str) -> Dict[str, Converter]:
+        """Plan for a tool, by name or by its "<name>_invoke" method."""
+        if api_name.endswith("_invoke"):
+            api_name = api_name[:-len("_invoke")]
+        return self.coercion_plans.get(api_name, {})
+
+    def has_api(self, api_name: str) -> bool:
+        return hasattr(self.tools, api_name)
+
+    def call(self, api_name: str, data: Dict[str, Any], arguments: Dict[str, Any]) -> Any:
+        return getattr(self.tools, api_name)(data=data, **arguments)
+
+
+class ToolRegistry:
+    def __init__(self, envs_path: str = ENVS_PATH):
+        self.envs_path = envs_path
+        self._lock = threading.Lock()
+        self._compiled: Dict[Tuple[str, str, str], CompiledInterface] = {}
+
+    def interface_path(self, environment: str, interface: Any) -> str:
+        return f"{self.envs_path}/{environment}/tools/interface_{interface}"
+
+    def _read_sources(self, environment: str, interface: Any) -> Tuple[str, List[Tuple[str, str]]]:
+        interface_path = self.interface_path(environment, interface)
+        digest = hashlib.sha256()
+        sources = []
+        for api_file in sorted(os.listdir(interface_path)):
+            if api_file.endswith(".py") and not api_file.startswith("__"):
+                file_path = os.path.join(interface_path, api_file)
+                with open(file_path, "rb") as file:
+                    content = file.read()
+                digest.update(api_file.encode('utf-8') + b"\0" + content + b"\0")
+                sources.append((api_file, file_path))
+        return digest.hexdigest(), sources
+
+    def get(self, environment: str, interface: Any) -> CompiledInterface:
+        """The compiled interface for the current tool sources (compiled on first use)."""
+        source_hash, sources = self._read_sources(environment, interface)
+        key = (environment, str(interface), source_hash)
+        compiled = self._compiled.get(key)
+        CACHE_REQUESTS.inc(cache='tools', result='hit' if compiled else 'miss')
+        if compiled is None:
+            with TOOL_COMPILE_SECONDS.time(environment=environment, interface=interface):
+                compiled = self._compile(environment, interface, source_hash, sources)
+            with self._lock:
+                # Drop older builds of the same interface
+                for old_key in [k for k in self._compiled if k[:2] == key[:2]]:
+                    del self._compiled[old_key]
+                self._compiled[key] = compiled
+        return compiled
+
+    def count(self) -> int:
+        """Number of compiled interfaces held in memory."""
+        with self._lock:
+            return len(self._compiled)
+
+    def _compile(self, environment: str, interface: Any, source_hash: str,
+                 sources: List[Tuple[str, str]]) -> CompiledInterface:
+        invoke_methods = []
+        functions_info = []
+        imports_set = set()
+        for api_file, file_path in sources:
+            try:
+                function_info, invoke_method, imports = extract_file_info(file_path)
+                imports_set.update(imports)
+                invoke_method = invoke_method.replace("invoke", function_info.get('name', 'invoke')+"_invoke")
+                invoke_methods.append(invoke_method)
+                functions_info.append(function_info)
+            except SyntaxError as e:
+                print(f"Syntax error in {api_file}: {e}")
+            except Exception as e:
+                print(f"Error processing {api_file}: {e}")
+        tools_class = create_tools_class(imports_set, invoke_methods)
+        return CompiledInterface(environment, interface, source_hash, functions_info, tools_class)
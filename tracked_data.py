@@ -0,0 +1,383 @@
+"""
+Change-tracked environment data for app.py.
+
+A live environment's tables are loaded as TrackedDict / TrackedList
+containers. Tools use them like plain dicts and lists; every mutation
+records the previous value of the touched key (or the previous contents
+of the touched list), once per action, in a Journal. So after each
+action we hold only what it changed, and all other records stay shared
+between steps.
+
+ActionHistory keeps one change set per executed action. Undoing a step
+puts the recorded values back and keeps the values it replaced, so the
+step can be redone. Rewinding to step k undoes or redoes steps until
+exactly k actions are applied.
+
+Only the tracked containers journal changes. A tool that stores a new
+plain dict can keep mutating its own reference until the action ends;
+the whole key is restored on undo. At the end of the action the new
+value is converted to tracked containers.
+"""
+import json
+import copy
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+_MISSING = object()
+
+# (container, key, previous value); key is None for a whole-list entry
+Entry = Tuple[Any, Any, Any]
+
+
+class Journal:
+    def __init__(self):
+        self.entries: Optional[List[Entry]] = None
+        self._seen = set()
+
+    @property
+    def active(self) -> bool:
+        return self.entries is not None
+
+    def begin(self):
+        self.entries = []
+        self._seen = set()
+
+    def end(self) -> List[Entry]:
+        """Stop recording; convert new plain values and return the change set."""
+        entries, self.entries = self.entries or [], None
+        self._seen = set()
+        for container, key, _ in entries:
+            if key is None:
+                for idx, item in enumerate(container):
+                    if type(item) in (dict, list):
+                        list.__setitem__(container, idx, track(item, self))
+            elif key in container and type(container[key]) in (dict, list):
+                dict.__setitem__(container, key, track(dict.__getitem__(container, key), self))
+        return entries
+
+    def note_key(self, container: dict, key: Any):
+        if self.entries is None:
+            return
+        marker = (id(container), key)
+        if marker not in self._seen:
+            self._seen.add(marker)
+            self.entries.append((container, key, dict.get(container, key, _MISSING)))
+
+    def note_list(self, container: list):
+        if self.entries is None:
+            return
+        marker = (id(container), None)
+        if marker not in self._seen:
+            self._seen.add(marker)
+            self.entries.append((container, None, list(container)))
+
+
+def revert(entries: List[Entry]) -> List[Entry]:
+    """
+    Restore every entry's previous value. Returns the entries that undo
+    this (the values that were replaced), ready to be reverted in turn.
+    """
+    inverse = []
+    for container, key, previous in reversed(entries):
+        if key is None:
+            inverse.append((container, None, list(container)))
+            list.__setitem__(container, slice(None), previous)
+        else:
+            inverse.append((container, key, dict.get(container, key, _MISSING)))
+            if previous is _MISSING:
+                dict.pop(container, key, None)
+            else:
+                dict.__setitem__(container, key, previous)
+    return inverse
+
+
+class TrackedDict(dict):
+    __slots__ = ('_journal',)
+
+    def __init__(self, journal: Journal, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self._journal = journal
+
+    def __setitem__(self, key, value):
+        self._journal.note_key(self, key)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        self._journal.note_key(self, key)
+        dict.__delitem__(self, key)
+
+    def pop(self, key, *default):
+        if key in self:
+            self._journal.note_key(self, key)
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        if self:
+            self._journal.note_key(self, next(reversed(self)))
+        return dict.popitem(self)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self._journal.note_key(self, key)
+        return dict.setdefault(self, key, default)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def clear(self):
+        for key in list(self):
+            self._journal.note_key(self, key)
+        dict.clear(self)
+
+    # Copies are plain containers; they must not write to the journal.
+    def copy(self):
+        return dict(self)
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return {copy.deepcopy(key, memo): copy.deepcopy(value, memo) for key, value in self.items()}
+
+    def __reduce_ex__(self, protocol):
+        return (dict, (dict(self),))
+
+
+class TrackedList(list):
+    __slots__ = ('_journal',)
+
+    def __init__(self, journal: Journal, *args):
+        list.__init__(self, *args)
+        self._journal = journal
+
+    def _note(self):
+        self._journal.note_list(self)
+
+    def __setitem__(self, index, value):
+        self._note()
+        list.__setitem__(self, index, value)
+
+    def __delitem__(self, index):
+        self._note()
+        list.__delitem__(self, index)
+
+    def __iadd__(self, other):
+        self._note()
+        return list.__iadd__(self, other)
+
+    def __imul__(self, count):
+        self._note()
+        return list.__imul__(self, count)
+
+    def append(self, value):
+        self._note()
+        list.append(self, value)
+
+    def extend(self, values):
+        self._note()
+        list.extend(self, values)
+
+    def insert(self, index, value):
+        self._note()
+        list.insert(self, index, value)
+
+    def remove(self, value):
+        self._note()
+        list.remove(self, value)
+
+    def pop(self, *index):
+        self._note()
+        return list.pop(self, *index)
+
+    def clear(self):
+        self._note()
+        list.clear(self)
+
+    def sort(self, *args, **kwargs):
+        self._note()
+        list.sort(self, *args, **kwargs)
+
+    def reverse(self):
+        self._note()
+        list.reverse(self)
+
+    def copy(self):
+        return list(self)
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return [copy.deepcopy(item, memo) for item in self]
+
+    def __reduce_ex__(self, protocol):
+        return (list, (list(self),))
+
+
+# Value of a LazyTrackedDict key that has not been loaded yet
+UNLOADED = object()
+
+
+class LazyTrackedDict(TrackedDict):
+    """
+    A TrackedDict whose values are loaded on first access: keys are set
+    to UNLOADED and loader(key) supplies the value, then on_load(key,
+    value) is called. Loading is not a change, so it is not journaled;
+    restoring UNLOADED on undo just means "load it again".
+    """
+    __slots__ = ('_loader', 'on_load')
+
+    def __init__(self, journal: Journal, loader: Callable[[Any], Any], keys: Iterable[Any]):
+        TrackedDict.__init__(self, journal, ((key, UNLOADED) for key in keys))
+        self._loader = loader
+        self.on_load: Optional[Callable[[Any, Any], None]] = None
+
+    def is_loaded(self, key) -> bool:
+        return dict.get(self, key, UNLOADED) is not UNLOADED
+
+    def _value(self, key, value):
+        if value is UNLOADED:
+            value = self._loader(key)
+            dict.__setitem__(self, key, value)
+            if self.on_load is not None:
+                self.on_load(key, value)
+        return value
+
+    def __getitem__(self, key):
+        return self._value(key, dict.__getitem__(self, key))
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def pop(self, key, *default):
+        if key in self:
+            self[key]
+        return TrackedDict.pop(self, key, *default)
+
+    def popitem(self):
+        if self:
+            self[next(reversed(self))]
+        return TrackedDict.popitem(self)
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        return TrackedDict.setdefault(self, key, default)
+
+    def values(self):
+        self._load_all()
+        return dict.values(self)
+
+    def items(self):
+        self._load_all()
+        return dict.items(self)
+
+    def _load_all(self):
+        for key, value in list(dict.items(self)):
+            self._value(key, value)
+
+    def __eq__(self, other):
+        self._load_all()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        self._load_all()
+        return dict.__repr__(self)
+
+    def copy(self):
+        self._load_all()
+        return dict(self)
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        self._load_all()
+        return TrackedDict.__deepcopy__(self, memo)
+
+    def __reduce_ex__(self, protocol):
+        return (dict, (self.copy(),))
+
+
+def track(value: Any, journal: Journal) -> Any:
+    """Tracked copy of a plain dict/list tree (tracked parts are reused)."""
+    if isinstance(value, (TrackedDict, TrackedList)):
+        return value
+    if isinstance(value, dict):
+        return TrackedDict(journal, ((key, track(item, journal)) for key, item in value.items()))
+    if isinstance(value, list):
+        return TrackedList(journal, (track(item, journal) for item in value))
+    return value
+
+
+def loads_tracked(raw: Any, journal: Journal) -> Any:
+    """json.loads straight into tracked containers."""
+    def pairs_hook(pairs):
+        return TrackedDict(journal, (
+            (key, track(value, journal) if type(value) is list else value) for key, value in pairs
+        ))
+    return track(json.loads(raw, object_pairs_hook=pairs_hook), journal)
+
+
+class ActionHistory:
+    """
+    steps[i] is {'api_name', 'parameters', 'changes', 'delta', 'arguments',
+    'output', 'tools'} for the i-th action (arguments as the tool received
+    them, output '' when it failed, tools the interface it ran with);
+    position is how many of them are currently applied. Steps past the
+    position are the redo stack until a new action is recorded.
+    """
+
+    def __init__(self, journal: Journal):
+        self.journal = journal
+        self.steps: List[Dict[str, Any]] = []
+        self.position = 0
+
+    def record(self, api_name: str, parameters: Dict[str, Any], changes: List[Entry],
+               delta: Optional[List[Dict[str, Any]]] = None, arguments: Optional[Dict[str, Any]] = None,
+               output: Any = '', tools: Any = None) -> int:
+        """Append an executed action at the current position. Returns its step index."""
+        del self.steps[self.position:]
+        self.steps.append({'api_name': api_name, 'parameters': parameters, 'changes': changes,
+                           'delta': delta or [],
+                           'arguments': parameters if arguments is None else arguments,
+                           'output': output, 'tools': tools})
+        self.position = len(self.steps)
+        return self.position - 1
+
+    def undo(self) -> bool:
+        if self.position == 0:
+            return False
+        self.position -= 1
+        step = self.steps[self.position]
+        step['changes'] = revert(step['changes'])
+        return True
+
+    def redo(self) -> bool:
+        if self.position == len(self.steps):
+            return False
+        step = self.steps[self.position]
+        step['changes'] = revert(step['changes'])
+        self.position += 1
+        return True
+
+    def rewind(self, step: int) -> int:
+        """Undo/redo until `step` actions are applied (clamped). Returns the position."""
+        step = max(0, min(step, len(self.steps)))
+        while self.position > step:
+            self.undo()
+        while self.position < step:
+            self.redo()
+        return self.position
+
+    def state(self) -> Dict[str, int]:
+        return {'step': self.position, 'total_steps': len(self.steps)}
@@ -0,0 +1,98 @@
+"""
+Optional background warm-up for app.py.
+
+Discovers every envs/<env>/tools/interface_<n> and, in a thread pool,
+reads each environment's baseline data (and measures one loaded copy)
+and compiles each interface's tools, so the first /choose_env_interface
+for any of them is served from memory. The server answers requests
+while this runs; readiness is reported through state().
+"""
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from environment_store import EnvironmentStore
+from tool_registry import ToolRegistry
+
+INTERFACE_PREFIX = "interface_"
+
+
+def discover(envs_path: str) -> List[Tuple[str, List[str]]]:
+    """[(environment, [interface, ...])] for every environment with data."""
+    found = []
+    if not os.path.isdir(envs_path):
+        return found
+    for environment in sorted(os.listdir(envs_path)):
+        if not os.path.isdir(os.path.join(envs_path, environment, "data")):
+            continue
+        tools_path = os.path.join(envs_path, environment, "tools")
+        interfaces = []
+        if os.path.isdir(tools_path):
+            interfaces = sorted(
+                name[len(INTERFACE_PREFIX):] for name in os.listdir(tools_path)
+                if name.startswith(INTERFACE_PREFIX) and os.path.isdir(os.path.join(tools_path, name))
+            )
+        found.append((environment, interfaces))
+    return found
+
+
+class WarmUp:
+    def __init__(self, environments: EnvironmentStore, tool_registry: ToolRegistry):
+        self.environments = environments
+        self.tool_registry = tool_registry
+        self._lock = threading.Lock()
+        self.started = None
+        self.finished = None
+        self.total = 0
+        self.done = 0
+        self.errors: List[str] = []
+
+    @property
+    def ready(self) -> bool:
+        """True when no warm-up was started, or it has finished."""
+        return self.started is None or self.finished is not None
+
+    def start(self, workers: int = 4):
+        """Queue every environment and interface; returns immediately."""
+        jobs = []
+        for environment, interfaces in discover(self.environments.envs_path):
+            jobs.append((self.environments.warm, (environment,), environment))
+            for interface in interfaces:
+                jobs.append((self.tool_registry.get, (environment, interface),
+                             f"{environment}/{INTERFACE_PREFIX}{interface}"))
+        self.started = time.time()
+        self.total = len(jobs)
+        if not jobs:
+            self.finished = self.started
+            return
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="warm-up")
+        for function, args, name in jobs:
+            executor.submit(self._run, function, args, name)
+        # Worker threads finish the queue; nothing waits on them
+        executor.shutdown(wait=False)
+
+    def _run(self, function, args, name: str):
+        try:
+            function(*args)
+        except Exception as e:
+            print(f"Warm-up of {name} failed: {e}")
+            with self._lock:
+                self.errors.append(f"{name}: {e}")
+        with self._lock:
+            self.done += 1
+            if self.done == self.total:
+                self.finished = time.time()
+
+    def state(self) -> Dict[str, Any]:
+        if self.started is None:
+            return {'enabled': False}
+        end = self.finished or time.time()
+        return {
+            'enabled': True,
+            'done': self.done,
+            'total': self.total,
+            'seconds': round(end - self.started, 2),
+            'errors': list(self.errors),
+        }